@@ -0,0 +1,32 @@
+"""add links.long_url_fp
+
+Revision ID: 5d0c6b2e9a41
+Revises: 469139943c7f
+Create Date: 2026-10-17 10:12:31.418205
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5d0c6b2e9a41"
+down_revision: str | Sequence[str] | None = "469139943c7f"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("links", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("long_url_fp", sa.String(length=40), nullable=True))
+        batch_op.create_index("ix_links_long_url_fp", ["long_url_fp"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("links", schema=None) as batch_op:
+        batch_op.drop_index("ix_links_long_url_fp")
+        batch_op.drop_column("long_url_fp")
@@ -0,0 +1,60 @@
+"""backfill links.long_url_fp, drop ix_links_long_like
+
+Revision ID: 8b3e1f7a2c90
+Revises: 5d0c6b2e9a41
+Create Date: 2026-10-17 11:40:05.209716
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+from urlcutter.normalization import _url_fingerprint
+
+# revision identifiers, used by Alembic.
+revision: str = "8b3e1f7a2c90"
+down_revision: str | Sequence[str] | None = "5d0c6b2e9a41"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+BATCH_SIZE = 1000
+
+
+def _fingerprint_or_none(long_url: str) -> str | None:
+    # тот же отпечаток, что пишет приложение; мусорные URL оставляем NULL
+    try:
+        return _url_fingerprint(long_url)
+    except ValueError:
+        return None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    select_batch = sa.text(
+        "SELECT id, long_url FROM links WHERE long_url_fp IS NULL AND id > :last_id ORDER BY id LIMIT :limit"
+    )
+    update_fp = sa.text("UPDATE links SET long_url_fp = :fp WHERE id = :id")
+
+    # Пачками по id: память и длина транзакции не растут с размером истории
+    last_id = 0
+    while True:
+        rows = bind.execute(select_batch, {"last_id": last_id, "limit": BATCH_SIZE}).all()
+        if not rows:
+            break
+        params = [{"id": r.id, "fp": fp} for r in rows if (fp := _fingerprint_or_none(r.long_url))]
+        if params:
+            bind.execute(update_fp, params)
+        last_id = rows[-1].id
+
+    # Равенство теперь ищется по long_url_fp; B-tree по 2048-символьному long_url не нужен
+    with op.batch_alter_table("links", schema=None) as batch_op:
+        batch_op.drop_index("ix_links_long_like")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("links", schema=None) as batch_op:
+        batch_op.create_index("ix_links_long_like", ["long_url"], unique=False)
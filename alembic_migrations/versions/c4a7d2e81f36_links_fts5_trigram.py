@@ -0,0 +1,30 @@
+"""links_fts: FTS5 trigram index for history search
+
+Revision ID: c4a7d2e81f36
+Revises: 8b3e1f7a2c90
+Create Date: 2026-10-17 13:05:47.662310
+
+"""
+
+from collections.abc import Sequence
+
+from alembic import op
+
+from urlcutter.db.fts import create_fts, drop_fts
+
+# revision identifiers, used by Alembic.
+revision: str = "c4a7d2e81f36"
+down_revision: str | Sequence[str] | None = "8b3e1f7a2c90"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # без FTS5/trigram в сборке SQLite поиск просто остаётся на LIKE
+    create_fts(op.get_bind(), rebuild=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    drop_fts(op.get_bind())
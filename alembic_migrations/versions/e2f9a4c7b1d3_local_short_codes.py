@@ -0,0 +1,40 @@
+"""links.short_code + code_counters for the local shortener
+
+Revision ID: e2f9a4c7b1d3
+Revises: c4a7d2e81f36
+Create Date: 2026-10-17 16:40:12.905113
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e2f9a4c7b1d3"
+down_revision: str | Sequence[str] | None = "c4a7d2e81f36"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "code_counters",
+        sa.Column("name", sa.String(length=32), nullable=False),
+        sa.Column("next_value", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    # ADD COLUMN без пересборки таблицы: FTS-триггеры на links остаются на месте
+    with op.batch_alter_table("links", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("short_code", sa.String(length=16), nullable=True))
+        batch_op.create_index("ux_links_short_code", ["short_code"], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # не batch: пересборка links снесла бы FTS-триггеры; DROP COLUMN есть в SQLite 3.35+
+    op.drop_index("ux_links_short_code", table_name="links")
+    op.drop_column("links", "short_code")
+    op.drop_table("code_counters")
@@ -0,0 +1,74 @@
+from urlcutter.db.repo.history_sql import _encode_cursor
+from urlcutter.db.repo.schemas import CursorSpec, ExportSpec, HistoryFilters, LinkRecord, PageSpec, SortSpec
+
+SORT = SortSpec(field="created_at", direction="desc")
+
+
+def bench_list_first_page(benchmark, history):
+    benchmark(history.list, HistoryFilters(), SORT, PageSpec(page=1, page_size=50))
+
+
+def bench_list_deep_offset_page(benchmark, history, history_db):
+    _, rows = history_db
+    last = max(1, rows // 50)
+    benchmark(history.list, HistoryFilters(), SORT, PageSpec(page=last, page_size=50))
+
+
+def bench_list_deep_keyset_page(benchmark, history):
+    # та же глубина, что и у deep_offset: курсор на 50-й с конца записи
+    oldest = history.list(HistoryFilters(), SortSpec(direction="asc"), CursorSpec(page_size=50, total="skip")).items
+    token = _encode_cursor(oldest[-1].created_at_utc, oldest[-1].id)
+    benchmark(history.list, HistoryFilters(), SORT, CursorSpec(after=token, page_size=50))
+
+
+def bench_list_search_substring(benchmark, history):
+    benchmark(history.list, HistoryFilters(query="articles/12"), SORT, PageSpec(page=1, page_size=50))
+
+
+def bench_list_search_fts(benchmark, history):
+    filters = HistoryFilters(query="articles/12", search_mode="fts")
+    benchmark(history.list, filters, SORT, PageSpec(page=1, page_size=50))
+
+
+def bench_add(benchmark, history):
+    counter = iter(range(10**9))
+
+    def add():
+        i = next(counter)
+        history.add(
+            LinkRecord(
+                id=None,
+                long_url=f"https://bench-add.example/{i}",
+                short_url=f"https://tinyurl.com/add{i}",
+                service="tinyurl",
+                created_at_utc=None,
+            )
+        )
+
+    benchmark(add)
+
+
+def bench_add_many(benchmark, history):
+    # 1000 записей одним вызовом: пачки по DEFAULT_ADD_BATCH, транзакция на пачку
+    counter = iter(range(10**9))
+
+    def add_many():
+        base = next(counter) * 1000
+        history.add_many(
+            LinkRecord(
+                id=None,
+                long_url=f"https://bench-bulk.example/{base + i}",
+                short_url=f"https://tinyurl.com/bulk{base + i}",
+                service="tinyurl",
+                created_at_utc=None,
+            )
+            for i in range(1000)
+        )
+
+    benchmark(add_many)
+
+
+def bench_export_csv(benchmark, history):
+    spec = ExportSpec(filters=HistoryFilters(), sort=SORT, locale="en", filename_suggestion="bench.csv")
+    # полная выгрузка дорогая — меряем несколько раундов без прогрева
+    benchmark.pedantic(history.export_csv, args=(spec,), rounds=3, iterations=1)
@@ -0,0 +1,17 @@
+from urlcutter.normalization import _url_fingerprint, normalize_url
+
+URLS = [
+    "example.com",
+    "HTTPS://WWW.Example.COM:443/Path/?b=2&a=1#frag",
+    "http://пример.рф/путь?q=тест",
+    "https://shop.example.net/cart?utm_source=x&utm_medium=y&item=42&item=43",
+    "https://example.com/" + "a" * 500,
+]
+
+
+def bench_normalize_url(benchmark):
+    benchmark(lambda: [normalize_url(u) for u in URLS])
+
+
+def bench_url_fingerprint(benchmark):
+    benchmark(lambda: [_url_fingerprint(u) for u in URLS])
@@ -0,0 +1,24 @@
+from urlcutter import protection
+
+
+def bench_rate_limit_allow(benchmark):
+    # часы «стоят» в одной минуте, окно каждый раз чистим — меряем сам путь решения
+    def run():
+        protection._reset_state()
+        for _ in range(protection.CLIENT_RPM_LIMIT + 5):
+            protection.rate_limit_allow(now_fn=lambda: 1_000.0)
+
+    benchmark(run)
+    protection._reset_state()
+
+
+def bench_rate_limit_allow_high_rpm(benchmark):
+    # батч-режим: 5000 rpm, стоимость вызова не должна зависеть от лимита
+    limiter = protection.RateLimiter(5000, clock=lambda: 1_000.0)
+
+    def run():
+        limiter.reset()
+        for _ in range(5005):
+            limiter.allow()
+
+    benchmark(run)
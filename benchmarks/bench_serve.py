@@ -0,0 +1,86 @@
+"""Redirect server under load from a local keep-alive, pipelining load generator.
+
+Сервер — отдельный процесс (фикстура redirect_server), генератор — asyncio в процессе pytest.
+Пропускная способность пишется в extra_info["rps"]; отдельно, без pytest:
+    python benchmarks/bench_serve.py 127.0.0.1 8080 c1 c2 c3
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import time
+
+LOAD_CONNECTIONS = 32
+LOAD_REQUESTS = 50_000  # за раунд, на все соединения
+PIPELINE_DEPTH = 16
+
+
+async def _client(host: str, port: int, paths: list[bytes], n: int, depth: int) -> int:
+    reader, writer = await asyncio.open_connection(host, port)
+    redirects = 0
+    try:
+        for start in range(0, n, depth):
+            batch = [paths[(start + i) % len(paths)] for i in range(min(depth, n - start))]
+            writer.write(b"".join(b"GET /" + p + b" HTTP/1.1\r\nHost: bench\r\n\r\n" for p in batch))
+            for _ in batch:
+                head = await reader.readuntil(b"\r\n\r\n")
+                redirects += head.startswith((b"HTTP/1.1 301", b"HTTP/1.1 302"))
+                if b"Content-Length: 9" in head:  # тело 404
+                    await reader.readexactly(9)
+    finally:
+        writer.close()
+    return redirects
+
+
+async def load(  # noqa: PLR0913
+    host: str,
+    port: int,
+    codes: list[str],
+    *,
+    requests: int = LOAD_REQUESTS,
+    connections: int = LOAD_CONNECTIONS,
+    depth: int = PIPELINE_DEPTH,
+) -> tuple[float, int]:
+    """Fire `requests` GETs over `connections` keep-alive connections; returns (rps, redirects)."""
+    paths = [c.encode("ascii") for c in codes]
+    per_conn = requests // connections
+    t0 = time.perf_counter()
+    results = await asyncio.gather(
+        *(_client(host, port, paths[i::connections] or paths, per_conn, depth) for i in range(connections))
+    )
+    elapsed = time.perf_counter() - t0
+    return per_conn * connections / elapsed, sum(results)
+
+
+def _run_load(benchmark, host, port, codes, **kw):
+    rps: list[float] = []
+
+    def run():
+        value, redirects = asyncio.run(load(host, port, codes, **kw))
+        rps.append(value)
+        return redirects
+
+    redirects = benchmark.pedantic(run, rounds=3, warmup_rounds=1)
+    benchmark.extra_info["rps"] = round(max(rps))
+    return redirects
+
+
+def bench_serve_hot_codes(benchmark, redirect_server):
+    # горячий набор: 1000 кодов, после прогрева всё из LRU
+    host, port, codes = redirect_server
+    redirects = _run_load(benchmark, host, port, codes[:1000])
+    assert redirects == LOAD_REQUESTS // LOAD_CONNECTIONS * LOAD_CONNECTIONS
+
+
+def bench_serve_unknown_codes(benchmark, redirect_server):
+    # несуществующие коды: после первого промаха отвечает негативный кэш
+    host, port, _ = redirect_server
+    redirects = _run_load(benchmark, host, port, [f"zz{i}" for i in range(1000)])
+    assert redirects == 0
+
+
+if __name__ == "__main__":  # pragma: no cover
+    _host, _port, *_codes = sys.argv[1:]
+    _rps, _ = asyncio.run(load(_host, int(_port), _codes or ["1"]))
+    print(f"{_rps:,.0f} req/s")
@@ -0,0 +1,6 @@
+from urlcutter.shorteners import shorten_via_tinyurl_core
+
+
+def bench_shorten_via_tinyurl_core(benchmark, fake_tinyurl):
+    result = benchmark(shorten_via_tinyurl_core, "https://example.com/some/long/path?x=1", 5)
+    assert result == "https://tinyurl.com/bench"
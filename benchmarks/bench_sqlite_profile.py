@@ -0,0 +1,76 @@
+"""History workload with and without the SQLite profile from urlcutter.db.engine.
+
+"stock" — поведение SQLite по умолчанию (rollback journal, synchronous=FULL, кэш 2 МиБ),
+"tuned" — SQLITE_PRAGMA_DEFAULTS. Каждый профиль работает на своей копии БД:
+journal_mode хранится в файле.
+"""
+
+import shutil
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from urlcutter.db.engine import install_sqlite_profile, sqlite_pragmas
+from urlcutter.db.repo import history_sql
+from urlcutter.db.repo.schemas import ExportSpec, HistoryFilters, LinkRecord, PageSpec, SortSpec
+
+PROFILES = {
+    "stock": {"journal_mode": "DELETE", "synchronous": "FULL"},
+    "tuned": None,  # sqlite_pragmas() из окружения
+}
+
+
+@pytest.fixture(params=list(PROFILES))
+def profiled_history(request, history_db, tmp_path, monkeypatch):
+    src_engine, _ = history_db
+    path = tmp_path / f"{request.param}.db"
+    shutil.copyfile(src_engine.url.database, path)
+
+    pragmas = PROFILES[request.param]
+    eng = install_sqlite_profile(create_engine(f"sqlite:///{path.as_posix()}"), pragmas or sqlite_pragmas())
+    Session = sessionmaker(bind=eng, autoflush=False)
+
+    @contextmanager
+    def _session():
+        s = Session()
+        try:
+            yield s
+            s.commit()
+        except Exception:
+            s.rollback()
+            raise
+        finally:
+            s.close()
+
+    monkeypatch.setattr(history_sql, "get_session", _session)
+    yield history_sql.SqlAlchemyHistoryService()
+    eng.dispose()
+
+
+def bench_profile_add(benchmark, profiled_history):
+    counter = iter(range(10**9))
+
+    def add():
+        i = next(counter)
+        profiled_history.add(
+            LinkRecord(
+                id=None,
+                long_url=f"https://profile.example/{i}",
+                short_url=f"https://tinyurl.com/p{i}",
+                service="tinyurl",
+                created_at_utc=None,
+            )
+        )
+
+    benchmark(add)
+
+
+def bench_profile_list_search(benchmark, profiled_history):
+    benchmark(profiled_history.list, HistoryFilters(query="articles/12"), SortSpec(), PageSpec(page=1, page_size=50))
+
+
+def bench_profile_export(benchmark, profiled_history):
+    spec = ExportSpec(filters=HistoryFilters(), sort=SortSpec(), locale="en", filename_suggestion="p.csv")
+    benchmark.pedantic(profiled_history.export_csv, args=(spec,), rounds=3, iterations=1)
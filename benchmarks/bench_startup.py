@@ -0,0 +1,51 @@
+"""Cold-start import cost, measured with `python -X importtime` in a fresh interpreter.
+
+Бюджеты — кумулятивное время импорта в мс; flet из бюджета handlers вычитается
+(без него окна нет). Для медленных машин: URLCUTTER_IMPORT_BUDGET_SCALE=2.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+BUDGET_SCALE = float(os.getenv("URLCUTTER_IMPORT_BUDGET_SCALE", "1"))
+
+# модуль -> (бюджет мс, что вычесть из замера)
+IMPORT_BUDGETS_MS = {
+    "urlcutter": (60, ()),
+    "lite_upgrade": (120, ()),
+    "urlcutter.handlers": (200, ("flet",)),
+}
+
+
+def _run(args):
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    return subprocess.run([sys.executable, *args], env=env, capture_output=True, text=True, check=True)
+
+
+def import_profile(module: str) -> dict[str, int]:
+    """Кумулятивное время импорта (мкс) для каждого модуля из вывода -X importtime."""
+    stderr = _run(["-X", "importtime", "-c", f"import {module}"]).stderr
+    out: dict[str, int] = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line.removeprefix("import time:").split("|"))
+        out[name] = int(cumulative)
+    return out
+
+
+@pytest.mark.parametrize("module", list(IMPORT_BUDGETS_MS))
+def bench_import_time(benchmark, module):
+    budget_ms, excluded = IMPORT_BUDGETS_MS[module]
+    benchmark.pedantic(_run, args=(["-c", f"import {module}"],), rounds=5, iterations=1)
+
+    profile = import_profile(module)
+    spent_ms = (profile[module] - sum(profile.get(m, 0) for m in excluded)) / 1000
+    top = sorted(((us, name) for name, us in profile.items() if name.count(".") == 0), reverse=True)[:5]
+    benchmark.extra_info.update({"import_ms": round(spent_ms, 1), "top": [f"{n}={us // 1000}ms" for us, n in top]})
+    assert spent_ms <= budget_ms * BUDGET_SCALE, f"import {module}: {spent_ms:.0f} ms > budget {budget_ms} ms; {top}"
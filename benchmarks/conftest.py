@@ -0,0 +1,163 @@
+"""Fixtures for the benchmark suite: populated history DBs and a local fake TinyURL server.
+
+Размеры истории задаются через URLCUTTER_BENCH_ROWS (через запятую), по умолчанию 10k:
+    URLCUTTER_BENCH_ROWS=10000,100000,1000000 python -m pytest -c benchmarks/pytest.ini
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from urlcutter import shorteners
+from urlcutter.db.models import Base, Link
+from urlcutter.db.repo import history_sql
+from urlcutter.db.repo.local_codes import encode_base62
+from urlcutter.normalization import _url_fingerprint
+
+BENCH_ROWS = [int(n) for n in os.getenv("URLCUTTER_BENCH_ROWS", "10000").split(",") if n.strip()]
+INSERT_CHUNK = 50_000
+SERVE_CODES = 10_000  # кодов в БД редирект-сервера
+SERVICES = ("tinyurl", "isgd", "dagd", "clckru")
+T0 = datetime(2024, 1, 1)
+
+
+def _rows(start: int, stop: int):
+    for i in range(start, stop):
+        long_url = f"https://example{i % 97}.com/articles/{i}?utm_source=bench&ref={i % 13}"
+        yield {
+            "long_url": long_url,
+            "long_url_fp": _url_fingerprint(long_url),
+            "short_url": f"https://tinyurl.com/b{i:07d}",
+            "service": SERVICES[i % len(SERVICES)],
+            "created_at": T0 + timedelta(seconds=i),
+            "copy_count": i % 5,
+        }
+
+
+@pytest.fixture(scope="session", params=BENCH_ROWS, ids=lambda n: f"{n // 1000}k")
+def history_db(request, tmp_path_factory):
+    """(engine, rows): файл SQLite со схемой приложения и `rows` записями; строится один раз на размер."""
+    n = request.param
+    path = tmp_path_factory.mktemp("bench") / f"history_{n}.db"
+    engine = create_engine(f"sqlite:///{path.as_posix()}", future=True)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for start in range(0, n, INSERT_CHUNK):
+            conn.execute(insert(Link), list(_rows(start, min(n, start + INSERT_CHUNK))))
+    yield engine, n
+    engine.dispose()
+
+
+@pytest.fixture
+def history(history_db, monkeypatch):
+    """SqlAlchemyHistoryService поверх history_db."""
+    engine, _ = history_db
+    Session = sessionmaker(bind=engine, autoflush=False, future=True)
+
+    @contextmanager
+    def _session():
+        s = Session()
+        try:
+            yield s
+            s.commit()
+        except Exception:
+            s.rollback()
+            raise
+        finally:
+            s.close()
+
+    monkeypatch.setattr(history_sql, "get_session", _session)
+    return history_sql.SqlAlchemyHistoryService()
+
+
+class _TinyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # иначе заголовки и тело уходят двумя пакетами и ловят delayed ACK
+
+    def do_GET(self):
+        body = b"https://tinyurl.com/bench"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="session")
+def fake_tinyurl():
+    """Локальный keep-alive сервер с ответом TinyURL; shorteners настроен на него."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _TinyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{server.server_address[1]}/api-create.php"
+    shorteners.configure_http(api_url=api_url)
+    yield api_url
+    shorteners.configure_http(api_url=shorteners.TINYURL_API_URL)
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(scope="session")
+def serve_db(tmp_path_factory):
+    """(path, codes): history.db с SERVE_CODES локальными кодами для редирект-сервера."""
+    path = tmp_path_factory.mktemp("serve") / "history.db"
+    engine = create_engine(f"sqlite:///{path.as_posix()}", future=True)
+    Base.metadata.create_all(engine)
+    codes = [encode_base62(i) for i in range(1, SERVE_CODES + 1)]
+    rows = [
+        {
+            "long_url": f"https://example.com/articles/{i}",
+            "short_url": f"http://127.0.0.1/{code}",
+            "short_code": code,
+            "service": "local",
+            "created_at": T0,
+            "copy_count": 0,
+        }
+        for i, code in enumerate(codes)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(Link), rows)
+    engine.dispose()
+    return path, codes
+
+
+@pytest.fixture(scope="session")
+def redirect_server(serve_db):
+    """(host, port, codes): `python -m urlcutter.serve` в отдельном процессе — одно ядро, свой GIL."""
+    path, codes = serve_db
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "urlcutter.serve", "--db", str(path), "--port", str(port)],
+        env={**os.environ, "PYTHONPATH": root},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 15
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            break
+        except OSError:
+            if proc.poll() is not None or time.monotonic() > deadline:
+                proc.kill()
+                raise RuntimeError("urlcutter.serve did not start") from None
+            time.sleep(0.05)
+    yield "127.0.0.1", port, codes
+    proc.terminate()
+    proc.wait(timeout=10)
@@ -3,14 +3,11 @@ from __future__ import annotations
 
 import inspect
 import os
-from concurrent.futures import ThreadPoolExecutor
 from concurrent.futures import TimeoutError as _TimeoutError
 from types import SimpleNamespace
 
-import pyshorteners
-
-import urlcutter.patches.fix_alembic_version  # noqa: F401
 from urlcutter import shorten_via_tinyurl_core as _shorten_core
+from urlcutter._lazy import lazy_import
 from urlcutter.logging_utils import setup_logging
 from urlcutter.normalization import _url_fingerprint, normalize_url
 from urlcutter.protection import (
@@ -19,6 +16,8 @@ from urlcutter.protection import (
     CIRCUIT_COOLDOWN_SEC,
     CIRCUIT_FAIL_THRESHOLD,
     CLIENT_RPM_LIMIT,
+    CONNECTIVITY_PROBE_URL,
+    CONNECTIVITY_TIMEOUT,
     RATE_LIMIT_WINDOW_SEC,
     AppState,
     _get_state,
@@ -31,6 +30,9 @@ from urlcutter.protection import (
 )
 from urlcutter.protection import internet_ok as _internet_ok_core
 
+# pyshorteners (и requests под ним) исполняется при первом обращении к атрибуту
+pyshorteners = lazy_import("pyshorteners")
+
 # Публичные атрибуты для тестов:
 FutTimeout = _TimeoutError
 
@@ -54,6 +56,8 @@ __all__ = [
     "CIRCUIT_FAIL_THRESHOLD",
     "CLIENT_RPM_LIMIT",
     "RATE_LIMIT_WINDOW_SEC",
+    "CONNECTIVITY_PROBE_URL",
+    "CONNECTIVITY_TIMEOUT",
     "internet_ok",
 ]
 
@@ -63,8 +67,7 @@ REQUEST_TIMEOUT = 8.0
 RETRIES = 1
 
 # ---- Ограничения и защита от капов удалённых сервисов ----
-CONNECTIVITY_PROBE_URL = "https://www.google.com/generate_204"
-CONNECTIVITY_TIMEOUT = 2.0  # короткий таймаут для проверки сети
+# CONNECTIVITY_PROBE_URL / CONNECTIVITY_TIMEOUT живут в urlcutter.protection (см. ConnectivityProbe)
 
 # ---- Логирование ----
 LOG_ENABLED = True
@@ -75,8 +78,8 @@ LOG_BACKUPS = 3
 
 
 # публичная функция, которую дергают тесты
-def internet_ok(logger):
-    return _internet_ok_core(logger, AppState_cls=AppState)
+def internet_ok(logger, *, state: AppState | None = None, probe=None):
+    return _internet_ok_core(logger, state=state, probe=probe)
 
 
 def shorten_via_tinyurl(
@@ -88,13 +91,13 @@ def shorten_via_tinyurl(
     _pool_factory=None,
 ) -> str:
     shortener_factory = _shortener_factory or pyshorteners.Shortener
-    pool_factory = _pool_factory or ThreadPoolExecutor
+    # _pool_factory=None — общий пул с настоящим дедлайном; явная фабрика — `with factory(max_workers=1)`
     return _shorten_core(
         url,
         timeout,
         _get=_get,
         _shortener_factory=shortener_factory,
-        _pool_factory=pool_factory,
+        _pool_factory=_pool_factory,
     )
 
 
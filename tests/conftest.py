@@ -1,10 +1,15 @@
+import socket
+import threading
 from concurrent.futures import TimeoutError
 from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
 
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+from urlcutter import protection, shorteners
 from urlcutter.db.models import Base
 from urlcutter.db.repo import history_sql
 
@@ -131,6 +136,14 @@ def fake_pool_capturing_timeout_factory():
     return _factory
 
 
+# Ни один тест не пишет в настоящий каталог данных пользователя (history.db, кэш head и т. п.)
+@pytest.fixture(autouse=True)
+def isolated_data_dir(monkeypatch, tmp_path):
+    data_dir = tmp_path / "urlcutter-data"
+    monkeypatch.setenv("URLCUTTER_DATA_DIR", str(data_dir))
+    return data_dir
+
+
 @pytest.fixture(scope="function")
 def db_session():
     """Создаёт чистую in-memory SQLite БД для каждого теста."""
@@ -153,3 +166,60 @@ def patch_get_session(monkeypatch, db_session):
         yield db_session
 
     monkeypatch.setattr(history_sql, "get_session", fake_get_session)
+
+
+# Тесты не ходят в сеть: общая проба связи всегда «онлайн», без сокетов
+@pytest.fixture(autouse=True)
+def offline_safe_probe(monkeypatch):
+    probe = protection.ConnectivityProbe(connect=lambda addr, timeout: socket.socket())
+    monkeypatch.setitem(protection._probe_state, "probe", probe)
+    return probe
+
+
+# Локальный «TinyURL»: отвечает на /api-create.php?url=... и считает TCP-соединения
+@pytest.fixture
+def tinyurl_stub():
+    stats = {"requests": 0, "connections": 0, "delay": 0.0, "status": 200, "headers": {}}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def setup(self):
+            super().setup()
+            with lock:
+                stats["connections"] += 1
+
+        def do_GET(self):
+            with lock:
+                stats["requests"] += 1
+            if stats["delay"]:
+                threading.Event().wait(stats["delay"])
+            parts = urlsplit(self.path)
+            long_url = parse_qs(parts.query).get("url", [""])[0]
+            body = f"https://tinyurl.com/{abs(hash(long_url)) % 10**8}" if stats["status"] == 200 else "error"
+            data = body.encode()
+            self.send_response(stats["status"])
+            for k, v in stats["headers"].items():
+                self.send_header(k, v)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *a):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+
+    stats["api_url"] = f"http://127.0.0.1:{server.server_port}/api-create.php"
+    shorteners.configure_http(api_url=stats["api_url"])
+    try:
+        yield stats
+    finally:
+        shorteners.configure_http(api_url=shorteners.TINYURL_API_URL)
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,123 @@
+import asyncio
+import time
+
+import pytest
+
+from urlcutter.shorteners import aclose_async_client, ashorten, ashorten_many, get_async_client
+
+
+class DummyResp:
+    def __init__(self, status_code=200, text=""):
+        self.status_code = status_code
+        self.text = text
+
+
+class FakeClient:
+    # httpx-подобный клиент: задержка и ответ по URL-параметру
+    def __init__(self, delays=None, status=200):
+        self.delays = delays or {}
+        self.status = status
+        self.inflight = 0
+        self.max_inflight = 0
+        self.cancelled = 0
+
+    async def get(self, url, timeout=None):
+        self.inflight += 1
+        self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            key = url.rsplit("%2F", 1)[-1]
+            await asyncio.sleep(self.delays.get(key, 0.0))
+            return DummyResp(self.status, f"https://tinyurl.com/{key}")
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.inflight -= 1
+
+
+async def _collect(agen):
+    return [item async for item in agen]
+
+
+def test_ashorten_success():
+    out = asyncio.run(ashorten("https://example.com/a", client=FakeClient()))
+    assert out == "https://tinyurl.com/a"
+
+
+def test_ashorten_invalid_input_raises_before_request():
+    with pytest.raises(ValueError):
+        asyncio.run(ashorten("ftp://nope", client=FakeClient()))
+
+
+def test_ashorten_http_error():
+    with pytest.raises(RuntimeError):
+        asyncio.run(ashorten("https://example.com/a", client=FakeClient(status=503)))
+
+
+def test_ashorten_deadline_is_enforced():
+    client = FakeClient(delays={"slow": 5.0})
+
+    t0 = time.monotonic()
+    with pytest.raises(TimeoutError):
+        asyncio.run(ashorten("https://example.com/slow", timeout=0.1, client=client))
+
+    assert time.monotonic() - t0 < 1.0
+    assert client.cancelled == 1
+
+
+def test_ashorten_many_bounded_and_in_completion_order():
+    client = FakeClient(delays={"0": 0.2})
+    urls = [f"https://example.com/{i}" for i in range(10)]
+
+    out = asyncio.run(_collect(ashorten_many(urls, concurrency=3, client=client)))
+
+    assert len(out) == 10
+    assert out[-1][0] == "https://example.com/0"
+    assert client.max_inflight <= 3
+
+
+def test_ashorten_many_per_item_errors():
+    client = FakeClient(delays={"slow": 5.0})
+    urls = ["https://example.com/ok", "https://example.com/slow", "bad url"]
+
+    out = dict(asyncio.run(_collect(ashorten_many(urls, timeout=0.1, client=client))))
+
+    assert out["https://example.com/ok"] == "https://tinyurl.com/ok"
+    assert isinstance(out["https://example.com/slow"], TimeoutError)
+    assert isinstance(out["bad url"], ValueError)
+
+
+def test_ashorten_many_close_cancels_inflight():
+    client = FakeClient(delays={"1": 5.0, "2": 5.0})
+
+    async def scenario():
+        agen = ashorten_many(["https://example.com/0", "https://example.com/1", "https://example.com/2"], client=client)
+        first = await agen.__anext__()
+        await agen.aclose()
+        # aclose() возвращается, когда отменённые запросы уже доработали
+        return first, client.inflight, client.cancelled
+
+    first, inflight, cancelled = asyncio.run(scenario())
+    assert first[0] == "https://example.com/0"
+    assert (inflight, cancelled) == (0, 2)
+
+
+def test_ashorten_many_rejects_bad_concurrency():
+    # сразу при вызове, без итерации и без цикла событий
+    with pytest.raises(ValueError):
+        ashorten_many(["https://example.com"], concurrency=0, client=FakeClient())
+
+
+def test_ashorten_against_local_server_shares_one_client(tinyurl_stub):
+    async def scenario():
+        urls = [f"https://example.com/{i}" for i in range(20)]
+        out = await _collect(ashorten_many(urls, concurrency=5, timeout=2))
+        same = get_async_client() is get_async_client()
+        await aclose_async_client()
+        return out, same
+
+    out, same = asyncio.run(scenario())
+
+    assert same
+    assert all(isinstance(v, str) for _, v in out)
+    assert tinyurl_stub["connections"] <= 5
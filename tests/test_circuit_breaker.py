@@ -0,0 +1,137 @@
+import pytest
+
+from urlcutter import protection
+from urlcutter.protection import CircuitBreaker, breaker_for
+
+
+class Clock:
+    def __init__(self, t=1_000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    protection._reset_state()
+    yield
+    protection._reset_state()
+
+
+def tripped(clock, **kwargs):
+    br = CircuitBreaker(fail_threshold=2, cooldown=10, clock=clock, **kwargs)
+    br.record_failure()
+    br.record_failure()
+    return br
+
+
+def test_closed_until_threshold():
+    br = CircuitBreaker(fail_threshold=3, cooldown=10, clock=Clock())
+
+    br.record_failure()
+    br.record_failure()
+    assert br.state() == CircuitBreaker.CLOSED
+    assert br.allow()
+
+    br.record_failure()
+    assert br.state() == CircuitBreaker.OPEN
+    assert not br.allow()
+    assert br.cooldown_left() == pytest.approx(10)
+
+
+def test_half_open_lets_limited_probes_through():
+    clock = Clock()
+    br = tripped(clock, half_open_probes=2)
+
+    clock.t += 10
+    assert br.state() == CircuitBreaker.HALF_OPEN
+    assert [br.allow() for _ in range(5)] == [True, True, False, False, False]
+
+
+def test_probe_success_closes():
+    clock = Clock()
+    br = tripped(clock)
+    clock.t += 10
+
+    assert br.allow()
+    br.record_success()
+
+    assert br.state() == CircuitBreaker.CLOSED
+    assert br.trips == 0
+    assert all(br.allow() for _ in range(10))
+
+
+def test_probe_failure_reopens_with_exponential_backoff():
+    clock = Clock()
+    br = tripped(clock, backoff=2, max_cooldown=35)
+    cooldowns = []
+
+    for _ in range(4):
+        cooldowns.append(br.cooldown_left())
+        clock.t += br.cooldown_left()
+        assert br.allow()  # проба
+        br.record_failure()
+
+    assert cooldowns == [10, 20, 35, 35]
+    assert br.state() == CircuitBreaker.OPEN
+
+
+def test_abandoned_probe_slot_is_released():
+    clock = Clock()
+    br = tripped(clock)
+    clock.t += 10
+
+    assert br.allow()  # пробу взяли, но не отчитались
+    assert not br.allow()
+    clock.t += 10
+    assert br.allow()
+
+
+def test_late_failures_while_open_do_not_extend_cooldown():
+    clock = Clock()
+    br = tripped(clock)
+    clock.t += 4
+
+    br.record_failure()
+
+    assert br.cooldown_left() == pytest.approx(6)
+
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError):
+        CircuitBreaker(fail_threshold=0)
+    with pytest.raises(ValueError):
+        CircuitBreaker(backoff=0.5)
+
+
+def test_breakers_are_per_provider():
+    tiny = breaker_for("TinyURL", fail_threshold=1)
+    tiny.record_failure()
+
+    assert breaker_for("tinyurl") is tiny
+    assert not tiny.allow()
+    assert breaker_for("is.gd").allow()
+
+
+def test_reset_state_drops_provider_breakers():
+    first = breaker_for("tinyurl")
+    protection._reset_state()
+
+    assert breaker_for("tinyurl") is not first
+
+
+def test_module_api_half_open_admits_one_probe():
+    clock = Clock()
+    for _ in range(protection.CB_FAIL_THRESHOLD):
+        protection.record_failure(now_fn=clock)
+
+    clock.t += protection.CB_COOLDOWN_SEC
+    assert not protection.circuit_blocked(now_fn=clock)
+    assert not protection.circuit_blocked(now_fn=clock)  # спросить — не значит занять слот
+    assert protection.circuit_allow(now_fn=clock)
+    assert protection.circuit_blocked(now_fn=clock)
+    assert not protection.circuit_allow(now_fn=clock)
+
+    protection.record_success(now_fn=clock)
+    assert not protection.circuit_blocked(now_fn=clock)
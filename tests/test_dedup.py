@@ -0,0 +1,107 @@
+import pytest
+
+from urlcutter.db.repo.dedup import ShortLinkCache
+from urlcutter.db.repo.errors import ValidationError
+from urlcutter.db.repo.history_sql import SqlAlchemyHistoryService
+from urlcutter.db.repo.schemas import LinkRecord
+from urlcutter.normalization import _url_fingerprint
+
+
+def rec(long_url, short_url, id=None):
+    return LinkRecord(id=id, long_url=long_url, short_url=short_url, service="tinyurl", created_at_utc=None)
+
+
+class CountingHistory:
+    # Обёртка, считающая обращения к БД
+    def __init__(self, inner):
+        self.inner = inner
+        self.lookups = 0
+
+    def find_by_fingerprint(self, fp, exclude_service=None):
+        self.lookups += 1
+        return self.inner.find_by_fingerprint(fp, exclude_service)
+
+
+def test_add_stores_fingerprint_and_find_by_it(db_session):
+    svc = SqlAlchemyHistoryService()
+    stored = svc.add(rec("https://Example.com:443/a?b=2&a=1#x", "https://tinyurl.com/abc"))
+
+    found = svc.find_by_fingerprint(_url_fingerprint("https://example.com/a?a=1&b=2"))
+
+    assert found is not None
+    assert found.id == stored.id
+    assert found.short_url == "https://tinyurl.com/abc"
+
+
+def test_find_by_fingerprint_miss_and_validation(db_session):
+    svc = SqlAlchemyHistoryService()
+    assert svc.find_by_fingerprint("0" * 40) is None
+    with pytest.raises(ValidationError):
+        svc.find_by_fingerprint("")
+
+
+def test_cache_falls_back_to_db_then_serves_from_memory(db_session):
+    svc = SqlAlchemyHistoryService()
+    svc.add(rec("https://example.com/page", "https://tinyurl.com/p1"))
+    history = CountingHistory(svc)
+    cache = ShortLinkCache(history)
+
+    first = cache.lookup("https://EXAMPLE.com/page")
+    second = cache.lookup("https://example.com/page")
+
+    assert first.short_url == second.short_url == "https://tinyurl.com/p1"
+    assert history.lookups == 1  # второй раз — из LRU
+
+
+def test_cache_miss_and_invalid_url(db_session):
+    cache = ShortLinkCache(SqlAlchemyHistoryService())
+    assert cache.lookup("https://never-seen.example") is None
+    assert cache.lookup("ftp://bad") is None
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ShortLinkCache(maxsize=2)
+    cache.remember("https://a.com", rec("https://a.com", "https://t/a"))
+    cache.remember("https://b.com", rec("https://b.com", "https://t/b"))
+    cache.lookup("https://a.com")  # a — свежий
+    cache.remember("https://c.com", rec("https://c.com", "https://t/c"))
+
+    assert len(cache) == 2
+    assert cache.lookup("https://b.com") is None
+    assert cache.lookup("https://a.com").short_url == "https://t/a"
+
+
+def test_exclude_service_skips_local_rows_in_db_and_lru(db_session):
+    svc = SqlAlchemyHistoryService()
+    fp = _url_fingerprint("https://example.com/x")
+    svc.add(rec("https://example.com/x", "https://tinyurl.com/x"))
+    local = svc.add(
+        LinkRecord(
+            id=None,
+            long_url="https://example.com/x",
+            short_url="http://127.0.0.1:8080/1",
+            service="local",
+            created_at_utc=None,
+        )
+    )
+    cache = ShortLinkCache(svc)
+
+    assert svc.find_by_fingerprint(fp).id == local.id
+    assert svc.find_by_fingerprint(fp, exclude_service="local").short_url == "https://tinyurl.com/x"
+    assert cache.lookup("https://example.com/x").service == "local"
+    assert cache.lookup("https://example.com/x", exclude_service="local").short_url == "https://tinyurl.com/x"
+
+
+def test_cache_rejects_bad_size():
+    with pytest.raises(ValueError):
+        ShortLinkCache(maxsize=0)
+
+
+def test_find_by_long_url_uses_normalized_equality(db_session):
+    svc = SqlAlchemyHistoryService()
+    svc.add(rec("https://example.com/x?b=1&a=2", "https://tinyurl.com/x"))
+
+    assert svc.find_by_long_url("HTTPS://example.com:443/x?a=2&b=1").short_url == "https://tinyurl.com/x"
+    assert svc.find_by_long_url("https://example.com/y") is None
+    with pytest.raises(ValidationError):
+        svc.find_by_long_url("ftp://nope")
@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def run(code: str, tmp_path):
+    env = {**os.environ, "URLCUTTER_DATA_DIR": str(tmp_path / "data"), "PYTHONPATH": str(ROOT)}
+    return subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(code)], env=env, capture_output=True, text=True, check=False
+    )
+
+
+def test_import_does_not_touch_disk_or_build_engine(tmp_path):
+    res = run(
+        """
+        import os, sys
+        from urlcutter.db import engine
+        assert "engine" not in vars(engine) and "SessionLocal" not in vars(engine)
+        print(os.path.exists(os.environ["URLCUTTER_DATA_DIR"]))
+        """,
+        tmp_path,
+    )
+    assert res.returncode == 0, res.stderr
+    assert res.stdout.strip() == "False"
+
+
+def test_first_session_builds_engine_once(tmp_path):
+    res = run(
+        """
+        from sqlalchemy import text
+        from urlcutter.db import engine
+        with engine.get_session() as s:
+            s.execute(text("CREATE TABLE t (x)"))
+        first = engine.engine
+        with engine.get_session() as s:
+            assert s.execute(text("SELECT count(*) FROM t")).scalar_one() == 0
+        assert engine.engine is first
+        print(engine._SQLITE_URL)
+        """,
+        tmp_path,
+    )
+    assert res.returncode == 0, res.stderr
+    assert res.stdout.strip().endswith("data/history.db")
+    assert (tmp_path / "data" / "history.db").exists()
+
+
+def test_preset_url_does_not_create_data_dir(tmp_path):
+    res = run(
+        """
+        import os
+        from sqlalchemy import text
+        from urlcutter.db import engine
+        engine._SQLITE_URL = "sqlite://"
+        with engine.get_session() as s:
+            assert s.execute(text("SELECT 1")).scalar_one() == 1
+        print(os.path.exists(os.environ["URLCUTTER_DATA_DIR"]))
+        """,
+        tmp_path,
+    )
+    assert res.returncode == 0, res.stderr
+    assert res.stdout.strip() == "False"
@@ -4,8 +4,13 @@ from datetime import UTC, datetime
 
 import flet as ft
 import pytest
+from sqlalchemy import text
 
+import urlcutter.handlers as H
+from urlcutter import shorteners
+from urlcutter.errors import ProviderError, ProviderUnavailableError, RateLimitedError
 from urlcutter.handlers import Handlers, _safe_fp
+from urlcutter.retry import RetryPolicy
 
 
 class FakeLogger:
@@ -63,6 +68,9 @@ class FakeState:
     def circuit_blocked(self):
         return self._blocked
 
+    def circuit_allow(self):
+        return not self._blocked
+
     def cooldown_left(self):
         return 42
 
@@ -227,6 +235,33 @@ def test_on_shorten_success(monkeypatch):
     assert h._last_history_id == 42
 
 
+def test_on_shorten_reuses_known_link_without_network(monkeypatch):
+    page = FakePage()
+    field_in = FakeField("https://example.com/again")
+    field_out = FakeField()
+    state = FakeState()
+    h = Handlers(page, FakeLogger(), state, field_in, field_out, FakeField())
+
+    calls = []
+
+    def fake_shorten(url, timeout):
+        calls.append(url)
+        return "https://tiny.one/again"
+
+    monkeypatch.setattr("urlcutter.handlers.shorten_via_tinyurl", fake_shorten)
+
+    h.on_shorten(None)
+    first_id = h._last_history_id
+    field_out.value = ""
+    field_in.value = "https://EXAMPLE.com/again#top"  # тот же URL после normalize_url
+    h.on_shorten(None)
+
+    assert calls == ["https://example.com/again"]
+    assert field_out.value == "https://tiny.one/again"
+    assert h._last_history_id == first_id
+    assert state.success == 1
+
+
 def test_on_shorten_timeout(monkeypatch):
     page = FakePage()
     field_in = FakeField("https://example.com")
@@ -539,3 +574,228 @@ def test_on_minimize_changes_flag():
 
     h.on_minimize(None)
     assert page.window.minimized is True
+
+
+def test_on_shorten_retries_rate_limit_then_succeeds(monkeypatch):
+    page = FakePage()
+    state = FakeState()
+    h = Handlers(page, FakeLogger(), state, FakeField("https://example.com/retry"), FakeField(), FakeField())
+    monkeypatch.setattr(H, "SHORTEN_RETRY_POLICY", RetryPolicy(attempts=3, base_delay=0.0, deadline=5))
+
+    timeouts = []
+
+    def fake_shorten(url, timeout):
+        timeouts.append(timeout)
+        if len(timeouts) == 1:
+            raise RateLimitedError("429", retry_after=0.01)
+        return "https://tiny.one/retry"
+
+    monkeypatch.setattr("urlcutter.handlers.shorten_via_tinyurl", fake_shorten)
+
+    h.on_shorten(None)
+
+    assert len(timeouts) == 2
+    assert all(0 < t <= H.REQUEST_TIMEOUT for t in timeouts)
+    assert state.success == 1 and state.failure == 0
+    assert h.short_url_field.value == "https://tiny.one/retry"
+
+
+def test_on_shorten_does_not_retry_client_errors(monkeypatch):
+    page = FakePage()
+    state = FakeState()
+    h = Handlers(page, FakeLogger(), state, FakeField("https://example.com/404"), FakeField(), FakeField())
+    calls = []
+
+    def fake_shorten(url, timeout):
+        calls.append(url)
+        raise ProviderError("TinyURL HTTP 404", status=404)
+
+    monkeypatch.setattr("urlcutter.handlers.shorten_via_tinyurl", fake_shorten)
+
+    h.on_shorten(None)
+
+    assert len(calls) == 1
+    assert state.failure == 1
+    assert any("Failed to shorten" in getattr(ctrl.content, "value", "") for ctrl in page.overlay)
+
+
+@pytest.mark.parametrize(
+    ("cause", "invalidated"),
+    [(ConnectionError("refused"), True), (None, False)],
+)
+def test_on_shorten_network_failure_resets_connectivity_probe(monkeypatch, offline_safe_probe, cause, invalidated):
+    monkeypatch.setattr(H, "SHORTEN_RETRY_POLICY", RetryPolicy(attempts=1))
+
+    def fake_shorten(url, timeout):
+        if cause is None:
+            raise ProviderError("TinyURL HTTP 404", status=404)
+        raise ProviderUnavailableError(f"TinyURL request failed: {cause}") from cause
+
+    monkeypatch.setattr("urlcutter.handlers.shorten_via_tinyurl", fake_shorten)
+    h = Handlers(FakePage(), FakeLogger(), FakeState(), FakeField("https://example.com/net"), FakeField(), FakeField())
+
+    h.on_shorten(None)
+
+    assert (offline_safe_probe._ok is None) is invalidated
+
+
+def test_on_shorten_records_provider_chosen_by_router(monkeypatch):
+    page = FakePage()
+    state = FakeState()
+    monkeypatch.setenv("URLCUTTER_PROVIDERS", "tinyurl,fake")
+    monkeypatch.setitem(
+        shorteners._providers, "fake", shorteners.FunctionProvider("fake", lambda url, timeout: "https://fake.test/1")
+    )
+    monkeypatch.setattr(H, "SHORTEN_RETRY_POLICY", RetryPolicy(attempts=1))
+
+    def tinyurl_down(url, timeout):
+        raise ProviderError("TinyURL HTTP 503", status=503)
+
+    monkeypatch.setattr("urlcutter.handlers.shorten_via_tinyurl", tinyurl_down)
+    h = Handlers(page, FakeLogger(), state, FakeField("https://example.com/routed"), FakeField(), FakeField())
+    added = []
+    monkeypatch.setattr(h.history, "add", lambda rec: added.append(rec) or type("S", (), {"id": 1})())
+
+    h.on_shorten(None)
+
+    assert h.short_url_field.value == "https://fake.test/1"
+    assert [r.service for r in added] == ["fake"]
+
+
+def test_on_shorten_offline_falls_back_to_local_provider(monkeypatch, db_session):
+    from contextlib import contextmanager
+
+    from urlcutter.db.repo import local_codes
+
+    @contextmanager
+    def fake_get_session():
+        yield db_session
+
+    monkeypatch.setattr(local_codes, "get_session", fake_get_session)
+    monkeypatch.setenv("URLCUTTER_PROVIDERS", "tinyurl,local")
+    monkeypatch.setitem(
+        shorteners._providers, "local", shorteners.LocalProvider(local_codes.LocalCodeStore("https://s.test"))
+    )
+    monkeypatch.setattr("urlcutter.handlers.internet_ok", lambda logger: False)
+
+    def tinyurl_must_not_run(url, timeout):
+        raise AssertionError("offline: remote provider must not be called")
+
+    monkeypatch.setattr("urlcutter.handlers.shorten_via_tinyurl", tinyurl_must_not_run)
+    page = FakePage()
+    h = Handlers(page, FakeLogger(), FakeState(), FakeField("https://example.com/offline"), FakeField(), FakeField())
+
+    h.on_shorten(None)
+
+    assert h.short_url_field.value.startswith("https://s.test/")
+    # одна строка в links: её записал local, history.add не дублирует
+    assert h.history.find_by_fingerprint(H._url_fingerprint("https://example.com/offline")).id == h._last_history_id
+    assert db_session.execute(text("SELECT COUNT(*) FROM links")).scalar() == 1
+
+
+def test_on_shorten_back_online_skips_local_link(monkeypatch, db_session):
+    from contextlib import contextmanager
+
+    from urlcutter.db.repo import local_codes
+
+    @contextmanager
+    def fake_get_session():
+        yield db_session
+
+    monkeypatch.setattr(local_codes, "get_session", fake_get_session)
+    monkeypatch.setenv("URLCUTTER_PROVIDERS", "tinyurl,local")
+    monkeypatch.setitem(
+        shorteners._providers, "local", shorteners.LocalProvider(local_codes.LocalCodeStore("https://s.test"))
+    )
+    online = {"ok": False}
+    monkeypatch.setattr("urlcutter.handlers.internet_ok", lambda logger: online["ok"])
+    calls = []
+
+    def fake_tinyurl(url, timeout):
+        calls.append(url)
+        return "https://tinyurl.com/net"
+
+    monkeypatch.setattr("urlcutter.handlers.shorten_via_tinyurl", fake_tinyurl)
+    page = FakePage()
+    h = Handlers(page, FakeLogger(), FakeState(), FakeField("https://example.com/later"), FakeField(), FakeField())
+
+    h.on_shorten(None)  # офлайн — локальный код
+    assert h.short_url_field.value.startswith("https://s.test/")
+    assert calls == []
+
+    online["ok"] = True
+    h.on_shorten(None)  # связь вернулась — локальная ссылка не переиспользуется
+
+    assert calls == ["https://example.com/later"]
+    assert h.short_url_field.value == "https://tinyurl.com/net"
+
+    h.on_shorten(None)  # а сетевая — переиспользуется
+    assert len(calls) == 1
+    assert h.short_url_field.value == "https://tinyurl.com/net"
+
+
+def _use_local_store(monkeypatch, db_session):
+    from contextlib import contextmanager
+
+    from urlcutter.db.repo import local_codes
+
+    @contextmanager
+    def fake_get_session():
+        yield db_session
+
+    monkeypatch.setattr(local_codes, "get_session", fake_get_session)
+    monkeypatch.setenv("URLCUTTER_PROVIDERS", "tinyurl,local")
+    monkeypatch.setitem(
+        shorteners._providers, "local", shorteners.LocalProvider(local_codes.LocalCodeStore("https://s.test"))
+    )
+
+
+def test_open_breaker_does_not_block_offline_local_path(monkeypatch, db_session):
+    _use_local_store(monkeypatch, db_session)
+    monkeypatch.setattr("urlcutter.handlers.internet_ok", lambda logger: False)
+    state = FakeState(blocked=True, allow=False)  # TinyURL остывает, лимит исчерпан
+    h = Handlers(FakePage(), FakeLogger(), state, FakeField("https://example.com/cool"), FakeField(), FakeField())
+
+    h.on_shorten(None)
+
+    assert h.short_url_field.value.startswith("https://s.test/")
+    # удалённый предохранитель local не трогает: ни закрытия, ни новых ошибок
+    assert (state.success, state.failure) == (0, 0)
+
+
+def test_online_router_prefers_network_provider_over_local(monkeypatch, db_session):
+    _use_local_store(monkeypatch, db_session)
+    monkeypatch.setattr("urlcutter.handlers.shorten_via_tinyurl", lambda url, timeout: "https://tinyurl.com/on")
+    h = Handlers(FakePage(), FakeLogger(), FakeState(), FakeField(), FakeField(), FakeField())
+
+    assert [p.name for p in h.router.providers] == ["tinyurl"]
+    assert [p.name for p in h.offline_router.providers] == ["local"]
+    for i in range(5):
+        h.url_input_field.value = f"https://example.com/on/{i}"
+        h.on_shorten(None)
+        assert h.short_url_field.value == "https://tinyurl.com/on"
+
+
+def test_half_open_probe_slot_survives_rate_limited_attempt(monkeypatch):
+    from urlcutter.protection import AppState, CircuitBreaker
+
+    clock = {"t": 0.0}
+    state = AppState()
+    state.breaker = CircuitBreaker(fail_threshold=1, cooldown=10, clock=lambda: clock["t"])
+    state.record_failure()
+    clock["t"] = 10.0  # cooldown прошёл — half-open
+    allowed = iter([False, True])
+    monkeypatch.setattr(state, "rate_limit_allow", lambda logger: next(allowed))
+    monkeypatch.setattr("urlcutter.handlers.shorten_via_tinyurl", lambda url, timeout: "https://tiny.one/probe")
+    page = FakePage()
+    h = Handlers(page, FakeLogger(), state, FakeField("https://example.com/probe"), FakeField(), FakeField())
+    monkeypatch.setattr(h.history, "add", lambda rec: type("S", (), {"id": 1})())
+
+    h.on_shorten(None)  # отбит локальным rate-limit — слот пробы не тронут
+    assert h.short_url_field.value != "https://tiny.one/probe"
+    assert not state.circuit_blocked()
+
+    h.on_shorten(None)  # следующий запрос и есть проба
+
+    assert h.short_url_field.value == "https://tiny.one/probe"
+    assert state.breaker.state() == CircuitBreaker.CLOSED
@@ -14,6 +14,9 @@ class FakeState:
     def circuit_blocked(self):
         return self._blocked
 
+    def circuit_allow(self):
+        return not self._blocked
+
     def rate_limit_allow(self, _logger=None):
         return self._allow
 
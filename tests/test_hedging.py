@@ -0,0 +1,214 @@
+import threading
+import time
+
+import pytest
+
+from urlcutter import shorteners
+from urlcutter.errors import ProviderUnavailableError
+from urlcutter.protection import CircuitBreaker
+from urlcutter.shorteners import ProviderRouter, hedge_percentile_from_env
+
+
+class Sleepy:
+    """Провайдер с настоящей задержкой; `release` отпускает зависший вызов."""
+
+    def __init__(self, name, delay=0.0, error=None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+        self.release = threading.Event()
+
+    def shorten(self, url, timeout=None):
+        self.calls += 1
+        self.release.wait(self.delay)
+        if self.error is not None:
+            raise self.error
+        return f"https://{self.name}.test/x"
+
+
+@pytest.fixture
+def providers():
+    made = []
+
+    def make(*args, **kw):
+        p = Sleepy(*args, **kw)
+        made.append(p)
+        return p
+
+    yield make
+    for p in made:
+        p.release.set()
+
+
+def make_router(*providers, **kw):
+    kw.setdefault("explore_every", 0)
+    kw.setdefault("hedge_percentile", 0.95)
+    kw.setdefault("hedge_default_delay", 0.05)
+    return ProviderRouter(providers, **kw)
+
+
+def test_stalled_primary_is_hedged_and_hedge_wins(providers):
+    primary = providers("primary", delay=5.0)
+    backup = providers("backup")
+    router = make_router(primary, backup)
+
+    t0 = time.monotonic()
+    short, name = router.shorten("https://example.com", timeout=3)
+
+    assert (short, name) == ("https://backup.test/x", "backup")
+    assert time.monotonic() - t0 < 1.0
+    m = router.hedge_metrics()
+    assert (m["requests"], m["hedged"], m["hedge_wins"]) == (1, 1, 1)
+    assert m["win_rate"] == 1.0
+    # проигравший не записан как ошибка, но его латентность учтена
+    assert router.stats("primary")["error_rate"] == 0
+    assert router.stats("primary")["latency"] > 0
+
+
+def test_fast_primary_does_not_fire_hedge(providers):
+    primary = providers("primary")
+    backup = providers("backup")
+    router = make_router(primary, backup, hedge_default_delay=1.0)
+
+    for _ in range(5):
+        router.shorten("https://example.com", timeout=3)
+
+    # каждый запрос ушёл ровно одному провайдеру
+    assert primary.calls + backup.calls == 5
+    m = router.hedge_metrics()
+    assert (m["requests"], m["hedged"], m["fire_rate"]) == (5, 0, 0.0)
+
+
+def test_primary_can_still_win_after_hedge_fires(providers):
+    primary = providers("primary", delay=0.15)
+    backup = providers("backup", delay=5.0)
+    router = make_router(primary, backup)
+
+    assert router.shorten("https://example.com", timeout=3)[1] == "primary"
+
+    m = router.hedge_metrics()
+    assert (m["hedged"], m["hedge_wins"]) == (1, 0)
+    assert backup.calls == 1
+
+
+def test_failed_primary_fails_over_without_waiting_for_hedge(providers):
+    primary = providers("primary", error=ProviderUnavailableError("503", provider="primary"))
+    backup = providers("backup")
+    router = make_router(primary, backup, hedge_default_delay=5.0)
+
+    t0 = time.monotonic()
+    assert router.shorten("https://example.com", timeout=3)[1] == "backup"
+
+    assert time.monotonic() - t0 < 1.0
+    assert router.hedge_metrics()["hedged"] == 0
+    assert router.stats("primary")["error_rate"] > 0
+
+
+def test_bad_input_is_not_hedged(providers):
+    primary = providers("primary", error=ValueError("bad url"))
+    backup = providers("backup")
+    router = make_router(primary, backup)
+
+    with pytest.raises(ValueError):
+        router.shorten("nope", timeout=3)
+
+    assert backup.calls == 0
+
+
+def test_deadline_bounds_hedged_call(providers):
+    router = make_router(providers("a", delay=5.0), providers("b", delay=5.0))
+
+    t0 = time.monotonic()
+    with pytest.raises(TimeoutError):
+        router.shorten("https://example.com", timeout=0.3)
+
+    assert time.monotonic() - t0 < 1.0
+
+
+def test_hedge_delay_follows_latency_percentile():
+    router = make_router(Sleepy("a"), Sleepy("b"), hedge_percentile=0.9, hedge_default_delay=2.0)
+    assert router.hedge_delay("a") == 2.0  # мало замеров
+
+    for i in range(1, 21):
+        router._record("a", i / 10, None)
+
+    assert router.hedge_delay("a") == pytest.approx(1.8)
+    # ошибки в перцентиль не попадают
+    router._record("a", 100.0, RuntimeError("boom"))
+    assert router.hedge_delay("a") == pytest.approx(1.8)
+
+
+def test_hedging_is_off_by_default():
+    router = ProviderRouter([Sleepy("a"), Sleepy("b")])
+    assert router.hedge_percentile is None
+    with pytest.raises(ValueError):
+        ProviderRouter([Sleepy("a")], hedge_percentile=1.5)
+
+
+@pytest.mark.parametrize(
+    ("raw", "expected"),
+    [("", None), ("95", 0.95), ("0.99", 0.99), ("p90", 0.9), ("75%", 0.75)],
+)
+def test_hedge_percentile_from_env(raw, expected):
+    got = hedge_percentile_from_env({shorteners.HEDGE_ENV: raw})
+    assert got == (None if expected is None else pytest.approx(expected))
+
+
+@pytest.mark.parametrize("raw", ["fast", "0", "100", "-5"])
+def test_hedge_percentile_from_env_rejects_garbage(raw):
+    with pytest.raises(ValueError):
+        hedge_percentile_from_env({shorteners.HEDGE_ENV: raw})
+
+
+def test_no_busy_wait_when_hedge_cannot_launch(providers, monkeypatch):
+    primary = providers("primary", delay=0.5)
+    backup = providers("backup")
+    router = make_router(primary, backup, breaker_factory=lambda: CircuitBreaker(fail_threshold=1, cooldown=60))
+    router._stats["backup"].breaker.record_failure()  # хеджировать некуда
+    calls = []
+    real_wait = shorteners.wait
+
+    def counting_wait(*a, **kw):
+        calls.append(kw.get("timeout"))
+        return real_wait(*a, **kw)
+
+    monkeypatch.setattr(shorteners, "wait", counting_wait)
+
+    assert router.shorten("https://example.com", timeout=3) == ("https://primary.test/x", "primary")
+    assert len(calls) <= 3
+    assert backup.calls == 0
+    assert router.hedge_metrics()["hedged"] == 0
+
+
+def test_hedge_legs_use_their_own_pool(providers):
+    primary = providers("primary", delay=5.0)
+    backup = providers("backup")
+    router = make_router(primary, backup)
+    calls_before, hedges_before = shorteners.abandoned_calls(), shorteners.abandoned_hedges()
+
+    assert router.shorten("https://example.com", timeout=3)[1] == "backup"
+
+    # проигравший primary висит в пуле хеджей, а не в общем call/batch-учёте
+    assert shorteners.abandoned_hedges() == hedges_before + 1
+    assert shorteners.abandoned_calls() == calls_before
+    assert shorteners._hedges["pool"] is not shorteners._batch["pool"]
+    primary.release.set()
+    deadline = time.monotonic() + 2
+    while shorteners.abandoned_hedges() > hedges_before and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert shorteners.abandoned_hedges() == hedges_before
+
+
+def test_failed_hedge_is_still_counted_and_deadline_wins(providers):
+    primary = providers("primary", delay=5.0)
+    backup = providers("backup", error=ProviderUnavailableError("503", provider="backup"))
+    router = make_router(primary, backup)
+
+    with pytest.raises(TimeoutError):
+        router.shorten("https://example.com", timeout=0.3)
+
+    m = router.hedge_metrics()
+    assert (m["requests"], m["hedged"], m["hedge_wins"]) == (1, 1, 0)
+    assert m["fire_rate"] == 1.0
+    assert m["win_rate"] == 0.0
@@ -0,0 +1,80 @@
+from contextlib import contextmanager
+from datetime import UTC, datetime
+
+import pytest
+from sqlalchemy import select
+
+from urlcutter.db.models import Link
+from urlcutter.db.repo import history_sql
+from urlcutter.db.repo.errors import ValidationError
+from urlcutter.db.repo.history_sql import SqlAlchemyHistoryService
+from urlcutter.db.repo.schemas import CursorSpec, HistoryFilters, LinkRecord, SortSpec
+
+
+def rec(i, created_at_utc=None, service="tinyurl"):
+    return LinkRecord(
+        id=None,
+        long_url=f"https://example.com/{i}",
+        short_url=f"https://tinyurl.com/{i}",
+        service=service,
+        created_at_utc=created_at_utc,
+    )
+
+
+def test_add_many_returns_stored_records_in_order(db_session):
+    svc = SqlAlchemyHistoryService()
+
+    stored = svc.add_many((rec(i) for i in range(7)), batch_size=3)
+
+    assert [r.long_url for r in stored] == [f"https://example.com/{i}" for i in range(7)]
+    ids = [r.id for r in stored]
+    assert ids == sorted(ids) and len(set(ids)) == 7
+    assert all(r.created_at_utc is not None for r in stored)
+
+    rows = db_session.execute(select(Link.id, Link.short_url, Link.long_url_fp).order_by(Link.id)).all()
+    assert [(r.id, r.short_url) for r in rows] == [(s.id, s.short_url) for s in stored]
+    assert all(r.long_url_fp for r in rows)
+
+
+def test_add_many_one_session_per_batch(db_session, monkeypatch):
+    svc = SqlAlchemyHistoryService()
+    opened = []
+
+    @contextmanager
+    def counting_session():
+        opened.append(1)
+        yield db_session
+
+    monkeypatch.setattr(history_sql, "get_session", counting_session)
+
+    svc.add_many([rec(i) for i in range(10)], batch_size=4)
+
+    assert len(opened) == 3  # 4 + 4 + 2
+
+
+def test_add_many_keeps_given_timestamps(db_session):
+    svc = SqlAlchemyHistoryService()
+    ts = datetime(2020, 5, 1, 10, 30, tzinfo=UTC)
+
+    (stored,) = svc.add_many([rec(1, created_at_utc=ts)])
+
+    assert stored.created_at_utc == ts.replace(tzinfo=None)
+    assert db_session.get(Link, stored.id).created_at == ts.replace(tzinfo=None)
+
+
+def test_add_many_invalidates_cached_total(db_session):
+    svc = SqlAlchemyHistoryService()
+    svc.add_many([rec(1)])
+    assert svc.list(HistoryFilters(), SortSpec(), CursorSpec()).total == 1
+
+    svc.add_many([rec(2), rec(3)])
+
+    assert svc.list(HistoryFilters(), SortSpec(), CursorSpec()).total == 3
+
+
+def test_add_many_validates_records(db_session):
+    svc = SqlAlchemyHistoryService()
+    with pytest.raises(ValidationError):
+        svc.add_many([rec(1), rec(2, service="")])
+    with pytest.raises(ValidationError):
+        svc.add_many([rec(1)], batch_size=0)
@@ -0,0 +1,161 @@
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+
+import flet as ft
+import pytest
+
+from urlcutter.db.models import Link
+from urlcutter.db.repo.history_sql import SqlAlchemyHistoryService
+from urlcutter.db.repo.schemas import CursorSpec, HistoryFilters, PageSpec
+from urlcutter.ui.history import view
+from urlcutter.ui.history.data_source import HistoryDataSource
+from urlcutter.ui.history.history_handlers import HistoryContext, apply_filters, reset_filters
+
+T0 = datetime(2025, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def service(db_session):
+    for i in range(23):
+        db_session.add(
+            Link(
+                long_url=f"https://example.com/page/{i}",
+                short_url=f"https://tinyurl.com/s{i}",
+                service="tinyurl" if i % 3 else "isgd",
+                created_at=T0 + timedelta(days=i),
+            )
+        )
+    db_session.commit()
+    return SqlAlchemyHistoryService()
+
+
+def spy_specs(service, monkeypatch):
+    seen = []
+    real = service.list
+
+    def _list(filters, sort, page):
+        seen.append(page)
+        return real(filters, sort, page)
+
+    monkeypatch.setattr(service, "list", _list)
+    return seen
+
+
+def test_fetch_pages_forward_with_cursors(service, monkeypatch):
+    src = HistoryDataSource(service)
+    seen = spy_specs(service, monkeypatch)
+
+    rows1, total = src.fetch(1, 10)
+    rows2, _ = src.fetch(2, 10)
+    rows3, _ = src.fetch(3, 10)
+
+    assert total == 23
+    assert [len(r) for r in (rows1, rows2, rows3)] == [10, 10, 3]
+    assert rows1[0]["short_url"] == "https://tinyurl.com/s22"  # новые сверху
+    assert rows1[0]["created_at_local"] == "2025-01-23 12:00"
+    assert all(isinstance(p, CursorSpec) for p in seen)
+    assert seen[1].after is not None
+
+
+def test_fetch_unvisited_page_falls_back_to_offset(service, monkeypatch):
+    src = HistoryDataSource(service)
+    seen = spy_specs(service, monkeypatch)
+
+    rows, _ = src.fetch(3, 10)
+
+    assert isinstance(seen[0], PageSpec)
+    assert [r["short_url"] for r in rows] == [
+        "https://tinyurl.com/s2",
+        "https://tinyurl.com/s1",
+        "https://tinyurl.com/s0",
+    ]
+
+
+def test_filters_are_applied_in_the_database(service):
+    src = HistoryDataSource(service)
+    src.set_filters(HistoryFilters(query="page/1", service="tinyurl"))
+
+    rows, total = src.fetch(1, 50)
+
+    # page/1, page/10..19 → 11 строк, минус кратные 3 (isgd: 12, 15, 18)
+    assert total == 8
+    assert {r["service"] for r in rows} == {"tinyurl"}
+
+
+def test_iter_rows_streams_the_whole_selection(service):
+    src = HistoryDataSource(service)
+    src.set_filters(HistoryFilters(service="isgd"))
+
+    rows = list(src.iter_rows(chunk_size=3))
+
+    assert len(rows) == 8
+    assert len({r["id"] for r in rows}) == 8
+
+
+def find(ctrl, kind):
+    out = []
+    if isinstance(ctrl, kind):
+        out.append(ctrl)
+    for child in getattr(ctrl, "controls", None) or []:
+        out += find(child, kind)
+    if getattr(ctrl, "content", None) is not None:
+        out += find(ctrl.content, kind)
+    return out
+
+
+def test_history_screen_renders_first_page_from_source(service):
+    src = HistoryDataSource(service)
+
+    c = view.make_history_screen(source=src, on_back=lambda _: None)
+
+    table = find(c, ft.DataTable)[0]
+    assert len(table.rows) == 7  # размер страницы по умолчанию
+    labels = [t.value for t in find(c, ft.Text)]
+    assert "1 / 4" in labels
+    dropdowns = find(c, ft.Dropdown)
+    assert [o.key for o in dropdowns[0].options] == ["ALL", "isgd", "tinyurl"]
+
+
+class Ref:
+    def __init__(self, value=""):
+        self.current = type("C", (), {"value": value, "update": lambda self: None, "page": None})()
+
+
+def make_ctx(src):
+    return HistoryContext(
+        raw_items=[],
+        search_ref=Ref("PAGE/2"),
+        date_from_ref=Ref("2025-01-01"),
+        date_to_ref=Ref("2025-01-21"),
+        service_ref=Ref("ALL"),
+        render_table=MagicMock(),
+        set_filtered=MagicMock(),
+        _toast=MagicMock(),
+        _build_service_options=lambda: [],
+        page_state={"page_idx": 3, "page_size_val": 7},
+        table_column_ref=ft.Ref[ft.Column](),
+        source=src,
+    )
+
+
+def test_apply_and_reset_filters_go_to_source(service):
+    src = HistoryDataSource(service)
+    ctx = make_ctx(src)
+
+    apply_filters(None, ctx)
+
+    assert src.filters == HistoryFilters(
+        query="page/2",
+        date_from_local=T0.date(),
+        date_to_local=datetime(2025, 1, 21).date(),
+        service="ALL",
+        search_mode="fts",
+    )
+    assert ctx.page_state["page_idx"] == 1
+    ctx.set_filtered.assert_not_called()
+    ctx.render_table.assert_called_once()
+    # page/2, page/20 (21 янв.) — page/21, page/22 позже date_to
+    assert src.fetch(1, 10)[1] == 2
+
+    reset_filters(None, ctx)
+    assert src.filters == HistoryFilters()
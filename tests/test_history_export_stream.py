@@ -0,0 +1,71 @@
+import csv
+import io
+
+import pytest
+from sqlalchemy.exc import SQLAlchemyError
+
+from urlcutter.db.models import Link
+from urlcutter.db.repo import history_sql
+from urlcutter.db.repo.errors import ExportError, StorageError, ValidationError
+from urlcutter.db.repo.history_sql import SqlAlchemyHistoryService
+from urlcutter.db.repo.schemas import ExportSpec, HistoryFilters, SortSpec
+
+
+def spec(**filters):
+    return ExportSpec(filters=HistoryFilters(**filters), sort=SortSpec(), locale="en", filename_suggestion="x.csv")
+
+
+@pytest.fixture
+def svc(db_session):
+    db_session.add_all(
+        Link(long_url=f"https://example.com/{i}", short_url=f"https://tinyurl.com/{i}", service="tinyurl")
+        for i in range(25)
+    )
+    db_session.commit()
+    return SqlAlchemyHistoryService()
+
+
+def test_export_iter_streams_in_batches(svc, monkeypatch):
+    monkeypatch.setattr(history_sql, "EXPORT_YIELD_PER", 10)
+
+    chunks = list(svc.export_csv_iter(spec()))
+
+    # заголовок + 3 пачки (10 + 10 + 5)
+    assert len(chunks) == 4
+    assert chunks[0] == b"created_at_utc,service,long_url,short_url,copy_count\r\n"
+    assert [c.count(b"\n") for c in chunks[1:]] == [10, 10, 5]
+    assert b"".join(chunks) == svc.export_csv(spec())
+
+
+def test_export_to_path_and_fileobj(svc, tmp_path):
+    path = tmp_path / "out.csv"
+
+    written = svc.export_csv_to(path, spec(query="example.com/1"))
+    buf = io.BytesIO()
+    svc.export_csv_to(buf, spec(query="example.com/1"))
+
+    data = path.read_bytes()
+    assert written == len(data)
+    assert buf.getvalue() == data
+    rows = list(csv.reader(data.decode("utf-8").splitlines()))
+    assert len(rows) == 1 + 11  # 1, 10..19
+
+
+def test_export_validates_sort_before_iteration(svc):
+    bad = ExportSpec(filters=HistoryFilters(), sort=SortSpec(field="nope"), locale="en", filename_suggestion="x")
+    with pytest.raises(ValidationError):
+        svc.export_csv_iter(bad)
+
+
+def test_export_to_unwritable_path(svc, tmp_path):
+    with pytest.raises(ExportError):
+        svc.export_csv_to(tmp_path / "missing" / "out.csv", spec())
+
+
+def test_export_storage_error(svc, monkeypatch):
+    def bad_session(*args, **kwargs):
+        raise SQLAlchemyError("db fail")
+
+    monkeypatch.setattr(history_sql, "get_session", bad_session)
+    with pytest.raises(StorageError):
+        svc.export_csv(spec())
@@ -0,0 +1,75 @@
+import pytest
+from sqlalchemy import text
+
+from urlcutter.db.models import Link
+from urlcutter.db.repo.history_sql import SqlAlchemyHistoryService
+from urlcutter.db.repo.schemas import HistoryFilters, LinkRecord, PageSpec, SortSpec
+
+
+def add(svc, long_url, short_url="https://tinyurl.com/x"):
+    return svc.add(LinkRecord(id=None, long_url=long_url, short_url=short_url, service="tinyurl", created_at_utc=None))
+
+
+def search(svc, q, mode="fts"):
+    page = svc.list(HistoryFilters(query=q, search_mode=mode), SortSpec(), PageSpec(page=1, page_size=50))
+    return sorted(it.long_url for it in page.items), page.total
+
+
+@pytest.fixture
+def svc(db_session):
+    s = SqlAlchemyHistoryService()
+    add(s, "https://example.com/Articles/how-to-ship", "https://tinyurl.com/ship1")
+    add(s, "https://other.org/blog", "https://tinyurl.com/abc999")
+    add(s, "https://shop.example.net/cart")
+    return s
+
+
+def test_fts_table_created_with_schema(db_session):
+    row = db_session.execute(text("SELECT name FROM sqlite_master WHERE name = 'links_fts'")).first()
+    assert row is not None
+
+
+def test_fts_matches_substring_case_insensitive(svc):
+    found, total = search(svc, "ARTICLES/HOW")
+    assert found == ["https://example.com/Articles/how-to-ship"]
+    assert total == 1
+
+
+def test_fts_searches_short_url_too(svc):
+    found, _ = search(svc, "abc99")
+    assert found == ["https://other.org/blog"]
+
+
+@pytest.mark.parametrize("q", ["ship", "example", "blog", "no-such-thing", 'a"b'])
+def test_fts_agrees_with_substring_mode(svc, q):
+    assert search(svc, q, "fts") == search(svc, q, "substring")
+
+
+def test_fts_short_query_falls_back_to_like(svc):
+    found, _ = search(svc, "sh")
+    assert "https://shop.example.net/cart" in found
+
+
+def test_fts_follows_updates_and_deletes(svc, db_session):
+    rec = add(svc, "https://temporary.example/zzq")
+    assert search(svc, "zzq")[1] == 1
+
+    obj = db_session.get(Link, rec.id)
+    obj.long_url = "https://renamed.example/qqz"
+    db_session.commit()
+    assert search(svc, "zzq")[1] == 0
+    assert search(svc, "qqz")[1] == 1
+
+    svc.delete(rec.id)
+    assert search(svc, "qqz")[1] == 0
+
+
+def test_fts_mode_without_index_uses_like(svc, db_session):
+    db_session.execute(text("DROP TRIGGER links_fts_ai"))
+    db_session.execute(text("DROP TRIGGER links_fts_ad"))
+    db_session.execute(text("DROP TRIGGER links_fts_au"))
+    db_session.execute(text("DROP TABLE links_fts"))
+    db_session.commit()
+
+    found, _ = search(svc, "other.org")
+    assert found == ["https://other.org/blog"]
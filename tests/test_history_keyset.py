@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from urlcutter.db.models import Link
+from urlcutter.db.repo.errors import ValidationError
+from urlcutter.db.repo.history_sql import SqlAlchemyHistoryService
+from urlcutter.db.repo.schemas import CursorSpec, HistoryFilters, LinkRecord, PageSpec, SortSpec
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def svc(db_session):
+    # 25 записей; created_at повторяется парами, чтобы проверить добивку по id
+    for i in range(25):
+        db_session.add(
+            Link(
+                long_url=f"https://example.com/{i}",
+                short_url=f"https://tinyurl.com/{i}",
+                service="tinyurl" if i % 2 else "isgd",
+                created_at=T0 + timedelta(minutes=i // 2),
+            )
+        )
+    db_session.commit()
+    return SqlAlchemyHistoryService()
+
+
+def walk(svc, sort, filters=None, size=7):
+    pages, cursor = [], None
+    while True:
+        page = svc.list(filters or HistoryFilters(), sort, CursorSpec(after=cursor, page_size=size))
+        pages.append(page)
+        if not page.has_next:
+            return pages
+        cursor = page.next_cursor
+
+
+@pytest.mark.parametrize("direction", ["desc", "asc"])
+def test_keyset_matches_offset_order(svc, direction):
+    sort = SortSpec(field="created_at", direction=direction)
+    pages = walk(svc, sort)
+
+    keyset_ids = [it.id for p in pages for it in p.items]
+    expected = sorted(range(1, 26), key=lambda i: ((i - 1) // 2, i), reverse=direction == "desc")
+    assert keyset_ids == expected
+    assert [len(p.items) for p in pages] == [7, 7, 7, 4]
+    assert pages[0].has_prev is False and pages[0].prev_cursor is None
+    assert pages[-1].next_cursor is None
+
+
+def test_keyset_backwards_returns_previous_page(svc):
+    sort = SortSpec()
+    first = svc.list(HistoryFilters(), sort, CursorSpec(page_size=5))
+    second = svc.list(HistoryFilters(), sort, CursorSpec(after=first.next_cursor, page_size=5))
+    back = svc.list(HistoryFilters(), sort, CursorSpec(before=second.prev_cursor, page_size=5))
+
+    assert [it.id for it in back.items] == [it.id for it in first.items]
+    assert back.has_prev is False
+    assert back.has_next is True
+    assert second.has_prev is True
+
+
+def test_keyset_respects_filters(svc):
+    pages = walk(svc, SortSpec(), HistoryFilters(service="isgd"), size=4)
+    items = [it for p in pages for it in p.items]
+    assert {it.service for it in items} == {"isgd"}
+    assert len(items) == 13
+    assert pages[0].total == 13
+
+
+def test_keyset_total_is_cached_until_write(svc, db_session):
+    f, sort = HistoryFilters(), SortSpec()
+    assert svc.list(f, sort, CursorSpec()).total == 25
+
+    # запись мимо сервиса не видна в закэшированном total (до TTL)...
+    db_session.add(Link(long_url="https://side.example", short_url="https://t.co/s", service="x"))
+    db_session.commit()
+    assert svc.list(f, sort, CursorSpec()).total == 25
+    assert svc.list(f, sort, CursorSpec(total="exact")).total == 26
+
+    # ...а запись через сервис сбрасывает кэш
+    svc.add(
+        LinkRecord(
+            id=None, long_url="https://new.example", short_url="https://t.co/n", service="x", created_at_utc=None
+        )
+    )
+    assert svc.list(f, sort, CursorSpec()).total == 27
+
+
+def test_keyset_total_skip(svc):
+    assert svc.list(HistoryFilters(), SortSpec(), CursorSpec(total="skip")).total == -1
+
+
+def test_offset_paging_unchanged(svc):
+    page = svc.list(HistoryFilters(), SortSpec(), PageSpec(page=2, page_size=10))
+    assert page.page == 2 and page.total == 25 and page.next_cursor is None
+
+
+@pytest.mark.parametrize(
+    "spec, sort",
+    [
+        (CursorSpec(after="!!!"), SortSpec()),
+        (CursorSpec(after="x", before="y"), SortSpec()),
+        (CursorSpec(page_size=0), SortSpec()),
+        (CursorSpec(), SortSpec(field="service")),
+    ],
+)
+def test_keyset_rejects_bad_specs(svc, spec, sort):
+    with pytest.raises(ValidationError):
+        svc.list(HistoryFilters(), sort, spec)
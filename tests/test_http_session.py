@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from urlcutter import shorteners
+from urlcutter.errors import ProviderError, ProviderUnavailableError, RateLimitedError
+from urlcutter.shorteners import configure_http, get_http_session, shorten_many, shorten_via_tinyurl_core
+
+
+def test_default_path_uses_direct_api(tinyurl_stub):
+    out = shorten_via_tinyurl_core("https://example.com/a", timeout=2)
+
+    assert out.startswith("https://tinyurl.com/")
+    assert tinyurl_stub["requests"] == 1
+
+
+def test_session_keeps_connection_alive(tinyurl_stub):
+    for i in range(20):
+        shorten_via_tinyurl_core(f"https://example.com/{i}", timeout=2)
+
+    # 20 запросов — одно TCP-соединение
+    assert tinyurl_stub["requests"] == 20
+    assert tinyurl_stub["connections"] == 1
+
+
+def test_http_error_maps_to_runtime_error(tinyurl_stub):
+    tinyurl_stub["status"] = 503
+
+    with pytest.raises(RuntimeError):
+        shorten_via_tinyurl_core("https://example.com", timeout=2)
+
+
+def test_get_http_session_is_shared_across_threads():
+    shorteners.reset_http_session()
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        sessions = list(pool.map(lambda _: get_http_session(), range(64)))
+
+    assert len({id(s) for s in sessions}) == 1
+
+
+def test_configure_http_rebuilds_pool():
+    before = get_http_session()
+    configure_http(pool_size=4, retries=0)
+    try:
+        after = get_http_session()
+        assert after is not before
+        assert after.get_adapter("https://tinyurl.com")._pool_maxsize == 4
+    finally:
+        configure_http(pool_size=shorteners.HTTP_POOL_SIZE, retries=shorteners.HTTP_RETRIES)
+
+
+@pytest.mark.parametrize("kwargs", [{"pool_size": 0}, {"retries": -1}])
+def test_configure_http_rejects_bad_values(kwargs):
+    with pytest.raises(ValueError):
+        configure_http(**kwargs)
+
+
+def test_batch_reuses_pooled_connections(tinyurl_stub):
+    urls = [f"https://example.com/{i}" for i in range(40)]
+
+    out = dict(shorten_many(urls, concurrency=4, timeout=2))
+
+    assert all(isinstance(v, str) for v in out.values())
+    assert tinyurl_stub["connections"] <= 4
+
+
+@pytest.mark.parametrize(
+    "status,headers,error",
+    [
+        (429, {"Retry-After": "12"}, RateLimitedError),
+        (502, {}, ProviderUnavailableError),
+        (404, {}, ProviderError),
+    ],
+)
+def test_http_status_maps_to_typed_errors(tinyurl_stub, status, headers, error):
+    tinyurl_stub["status"] = status
+    tinyurl_stub["headers"] = headers
+
+    with pytest.raises(error) as ei:
+        shorten_via_tinyurl_core("https://example.com", timeout=2)
+
+    assert ei.value.status == status
+    if error is RateLimitedError:
+        assert ei.value.retry_after == 12.0
+    assert ei.type.retryable is (status != 404)
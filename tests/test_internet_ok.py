@@ -1,6 +1,8 @@
 import pytest
 
 from lite_upgrade import internet_ok
+from urlcutter import protection
+from urlcutter.protection import ConnectivityProbe
 
 
 # Минимальный логгер, чтобы удовлетворить сигнатуры
@@ -18,55 +20,117 @@ class FakeLogger:
         pass
 
 
+class Clock:
+    def __init__(self):
+        self.t = 100.0
+
+    def __call__(self):
+        return self.t
+
+
+class FakeConnect:
+    def __init__(self, ok=True):
+        self.ok = ok
+        self.calls = []
+
+    def __call__(self, address, timeout):
+        self.calls.append((address, timeout))
+        if not self.ok:
+            raise OSError("unreachable")
+
+        class _Sock:
+            def close(self):
+                pass
+
+        return _Sock()
+
+
 @pytest.fixture
 def logger():
     return FakeLogger()
 
 
-def test_internet_ok_false_when_circuit_blocked(monkeypatch, logger):
+def test_internet_ok_false_when_circuit_blocked(logger):
     class FakeAppState:
-        def __init__(self):
-            pass
-
         def circuit_blocked(self) -> bool:
             return True
 
         def rate_limit_allow(self, logger) -> bool:  # не должен вызываться, но пусть будет
             pytest.fail("rate_limit_allow must not be called when circuit is blocked")
 
-    # подменяем КЛАСС AppState в модуле lite_upgrade
-    monkeypatch.setattr("lite_upgrade.AppState", FakeAppState)
+    assert internet_ok(logger, state=FakeAppState()) is False
 
-    assert internet_ok(logger) is False
 
-
-def test_internet_ok_false_when_rate_limit_disallows(monkeypatch, logger):
+def test_internet_ok_does_not_spend_rate_limit_tokens(logger):
     class FakeAppState:
-        def __init__(self):
-            pass
-
         def circuit_blocked(self) -> bool:
             return False
 
         def rate_limit_allow(self, logger) -> bool:
-            return False
+            pytest.fail("connectivity check must not consume a rate-limit token")
 
-    monkeypatch.setattr("lite_upgrade.AppState", FakeAppState)
+    assert internet_ok(logger, state=FakeAppState()) is True
 
-    assert internet_ok(logger) is False
 
+def test_internet_ok_reuses_callers_state(logger):
+    # проверка связи только читает состояние: лимит вызывающего остаётся целым
+    st = protection.AppState(rpm_limit=2)
 
-def test_internet_ok_true_when_all_good(monkeypatch, logger):
-    class FakeAppState:
-        def __init__(self):
-            pass
+    assert [internet_ok(logger, state=st) for _ in range(3)] == [True, True, True]
+    assert [st.rate_limit_allow(logger) for _ in range(3)] == [True, True, False]
 
-        def circuit_blocked(self) -> bool:
-            return False
 
-        def rate_limit_allow(self, logger) -> bool:
-            return True
+def test_internet_ok_false_when_probe_fails(logger):
+    probe = ConnectivityProbe(connect=FakeConnect(ok=False))
+
+    assert internet_ok(logger, probe=probe) is False
+
+
+def test_probe_result_is_cached_for_ttl():
+    clock, connect = Clock(), FakeConnect()
+    probe = ConnectivityProbe("https://probe.test/generate_204", ttl=30, clock=clock, connect=connect)
+
+    assert all(probe.check() for _ in range(50))
+    assert connect.calls == [(("probe.test", 443), probe.timeout)]
+
+    clock.t += 31
+    assert probe.check()
+    assert len(connect.calls) == 2
+
+
+def test_probe_failure_is_cached_briefly():
+    clock, connect = Clock(), FakeConnect(ok=False)
+    probe = ConnectivityProbe("http://probe.test:8080/", ttl=30, fail_ttl=5, clock=clock, connect=connect)
+
+    assert not probe.check()
+    assert not probe.check()
+    assert len(connect.calls) == 1
+    assert connect.calls[0][0] == ("probe.test", 8080)
+
+    connect.ok = True
+    clock.t += 6
+    assert probe.check()
+
+
+def test_probe_invalidate_forces_new_check():
+    connect = FakeConnect()
+    probe = ConnectivityProbe(clock=Clock(), connect=connect)
+
+    probe.check()
+    probe.invalidate()
+    probe.check()
+
+    assert len(connect.calls) == 2
+
+
+def test_default_probe_honours_env(monkeypatch):
+    monkeypatch.setenv("URLCUTTER_PROBE_URL", "http://intranet.test:81/ping")
+    monkeypatch.setitem(protection._probe_state, "probe", None)
+
+    assert protection.default_probe().address == ("intranet.test", 81)
+    assert protection.default_probe() is protection.default_probe()
 
-    monkeypatch.setattr("lite_upgrade.AppState", FakeAppState)
 
-    assert internet_ok(logger) is True
+def test_probe_rejects_url_without_host():
+    with pytest.raises(ValueError):
+        ConnectivityProbe("not a url")
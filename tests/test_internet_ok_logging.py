@@ -3,6 +3,7 @@ import logging
 import pytest
 
 from lite_upgrade import internet_ok
+from urlcutter.protection import ConnectivityProbe
 
 
 class FakeLogger:
@@ -39,7 +40,7 @@ def logger():
     return FakeLogger()
 
 
-def test_internet_ok_logs_when_circuit_open(monkeypatch, logger):
+def test_internet_ok_logs_when_circuit_open(logger):
     class FakeAppState:
         def circuit_blocked(self):
             return True
@@ -47,23 +48,17 @@ def test_internet_ok_logs_when_circuit_open(monkeypatch, logger):
         def rate_limit_allow(self, _):
             pytest.fail("should not call rate_limit_allow")
 
-    monkeypatch.setattr("lite_upgrade.AppState", FakeAppState)
-
-    assert internet_ok(logger) is False
+    assert internet_ok(logger, state=FakeAppState()) is False
     msgs = [r.getMessage() for r in logger.records]
     assert any("circuit" in m.lower() for m in msgs)
 
 
-def test_internet_ok_logs_when_rate_limited(monkeypatch, logger):
-    class FakeAppState:
-        def circuit_blocked(self):
-            return False
-
-        def rate_limit_allow(self, _):
-            return False
+def test_internet_ok_logs_when_probe_fails(logger):
+    def refuse(address, timeout):
+        raise OSError("refused")
 
-    monkeypatch.setattr("lite_upgrade.AppState", FakeAppState)
+    probe = ConnectivityProbe("https://probe.test/", connect=refuse)
 
-    assert internet_ok(logger) is False
+    assert internet_ok(logger, probe=probe) is False
     msgs = [r.getMessage() for r in logger.records]
-    assert any("rate" in m.lower() and "limit" in m.lower() for m in msgs)
+    assert any("probe" in m and "probe.test:443" in m for m in msgs)
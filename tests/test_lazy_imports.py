@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+HEAVY = ("requests", "urllib3", "pyshorteners", "sqlalchemy", "alembic", "validators", "pyperclip")
+
+
+def loaded_after(module: str) -> dict[str, str]:
+    """{имя: тип модуля} для HEAVY, попавших в sys.modules после `import module` в чистом процессе."""
+    code = (
+        f"import sys, json, {module}\n"
+        f"print(json.dumps({{k: type(sys.modules[k]).__name__ for k in {HEAVY!r} if k in sys.modules}}))"
+    )
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    res = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=False)
+    assert res.returncode == 0, res.stderr
+    return json.loads(res.stdout)
+
+
+@pytest.mark.parametrize("module", ["urlcutter", "urlcutter.normalization", "lite_upgrade", "urlcutter.handlers"])
+def test_startup_imports_do_not_execute_heavy_dependencies(module):
+    # допустим только ленивый модуль-заглушка (_LazyModule), который ещё не исполнялся
+    executed = {k for k, kind in loaded_after(module).items() if kind != "_LazyModule"}
+    assert executed == set()
+
+
+def test_lazy_module_is_the_real_module_once_touched():
+    import pyshorteners
+
+    import lite_upgrade
+
+    assert lite_upgrade.pyshorteners is pyshorteners
+    assert callable(lite_upgrade.pyshorteners.Shortener)
+
+
+def test_package_exports_shorteners_lazily():
+    import urlcutter
+    from urlcutter import shorteners
+
+    assert urlcutter.shorten_many is shorteners.shorten_many
+    with pytest.raises(AttributeError):
+        _ = urlcutter.no_such_name
@@ -0,0 +1,175 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from urlcutter import shorteners
+from urlcutter.db.models import Base, CodeCounter, Link
+from urlcutter.db.repo import local_codes
+from urlcutter.db.repo.local_codes import LocalCodeStore, decode_base62, encode_base62, is_local_code, local_base_url
+from urlcutter.errors import ProviderUnavailableError
+
+
+@pytest.fixture(autouse=True)
+def local_db(monkeypatch, db_session):
+    @contextmanager
+    def fake_get_session():
+        yield db_session
+
+    monkeypatch.setattr(local_codes, "get_session", fake_get_session)
+    return db_session
+
+
+@pytest.mark.parametrize("n", [0, 1, 61, 62, 3843, 3844, 10**12])
+def test_base62_roundtrip(n):
+    assert decode_base62(encode_base62(n)) == n
+
+
+def test_base62_rejects_bad_input():
+    with pytest.raises(ValueError):
+        encode_base62(-1)
+    with pytest.raises(ValueError):
+        decode_base62("ab-c")
+    assert not is_local_code("")
+    assert not is_local_code("a/b")
+    assert not is_local_code("x" * 17)
+    assert is_local_code("aZ09")
+
+
+def test_shorten_stores_code_in_links(local_db):
+    store = LocalCodeStore("https://s.test/")
+
+    rec = store.shorten("https://example.com/a")
+
+    row = local_db.execute(select(Link).where(Link.id == rec.id)).scalar_one()
+    assert rec.service == "local"
+    assert rec.short_url == f"https://s.test/{row.short_code}"
+    assert store.resolve(row.short_code) == "https://example.com/a"
+    assert row.long_url_fp is not None
+
+
+def test_same_url_reuses_code_and_distinct_urls_get_distinct_codes():
+    store = LocalCodeStore("https://s.test")
+
+    first = store.shorten("https://example.com/a")
+    again = store.shorten("HTTPS://EXAMPLE.com/a")
+    others = {store.shorten(f"https://example.com/{i}").short_url for i in range(50)}
+
+    assert again.short_url == first.short_url
+    assert len(others) == 50
+    assert first.short_url not in others
+
+
+def test_concurrent_calls_for_same_url_share_one_code(monkeypatch, tmp_path):
+    # у каждого потока своя сессия на файловой БД — как в приложении
+    engine = create_engine(f"sqlite:///{tmp_path / 'race.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+
+    @contextmanager
+    def thread_session():
+        with Session() as s:
+            yield s
+            s.commit()
+
+    monkeypatch.setattr(local_codes, "get_session", thread_session)
+    store = LocalCodeStore("https://s.test")
+    existing = store._existing
+
+    def slow_existing(fp):
+        # окно между поиском и вставкой: без блокировки оба потока увидят «ссылки нет»
+        found = existing(fp)
+        time.sleep(0.05)
+        return found
+
+    monkeypatch.setattr(store, "_existing", slow_existing)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        urls = {r.short_url for r in pool.map(store.shorten, ["https://example.com/race"] * 4)}
+
+    assert len(urls) == 1
+    with Session() as s:
+        assert s.execute(select(func.count()).select_from(Link)).scalar() == 1
+    engine.dispose()
+
+
+def test_codes_come_from_counter_blocks(local_db):
+    store = LocalCodeStore("https://s.test", block_size=10)
+
+    codes = [store.next_code() for _ in range(25)]
+
+    assert [decode_base62(c) for c in codes] == list(range(1, 26))
+    # три блока по 10: одна запись в code_counters на блок
+    assert local_db.get(CodeCounter, "links").next_value == 31
+
+
+def test_second_store_on_same_db_does_not_reuse_codes():
+    a = LocalCodeStore("https://s.test", block_size=5)
+    b = LocalCodeStore("https://s.test", block_size=5)
+
+    codes = [a.next_code(), b.next_code(), a.next_code(), b.next_code()]
+
+    assert len(set(codes)) == 4
+
+
+def test_taken_code_is_skipped(local_db):
+    local_db.add(Link(long_url="https://manual.test", short_url="x", service="manual", short_code="1"))
+    local_db.flush()
+    store = LocalCodeStore("https://s.test")
+
+    rec = store.shorten("https://example.com/b")
+
+    assert rec.short_url == "https://s.test/2"
+    assert store.resolve("2") == "https://example.com/b"
+
+
+def test_bad_url_and_unknown_code():
+    store = LocalCodeStore("https://s.test")
+
+    with pytest.raises(ValueError):
+        store.shorten("ftp://example.com")
+    assert store.resolve("zzz") is None
+    assert store.resolve("../etc") is None
+
+
+def test_local_base_url_from_env():
+    assert local_base_url({}) == local_codes.DEFAULT_LOCAL_BASE_URL
+    assert local_base_url({"URLCUTTER_LOCAL_BASE_URL": "https://go.example/"}) == "https://go.example"
+    with pytest.raises(ValueError):
+        local_base_url({"URLCUTTER_LOCAL_BASE_URL": "go.example"})
+
+
+def test_local_provider_is_registered_and_offline():
+    provider = shorteners.get_provider("local")
+
+    assert isinstance(provider, shorteners.LocalProvider)
+    assert provider.offline is True
+
+
+def test_local_provider_through_router():
+    provider = shorteners.LocalProvider(LocalCodeStore("https://s.test"))
+    router = shorteners.ProviderRouter([provider])
+
+    short, name = router.shorten("https://example.com/routed", timeout=1)
+
+    assert name == "local"
+    assert short.startswith("https://s.test/")
+
+
+def test_local_provider_wraps_storage_errors():
+    class Broken:
+        def shorten(self, url):
+            raise local_codes.StorageError("disk full")
+
+    with pytest.raises(ProviderUnavailableError):
+        shorteners.LocalProvider(Broken()).shorten("https://example.com")
+
+
+def test_misconfigured_local_provider_fails_over(monkeypatch):
+    monkeypatch.setenv("URLCUTTER_LOCAL_BASE_URL", "go.example")
+    backup = shorteners.FunctionProvider("backup", lambda url, timeout: "https://backup.test/x")
+    router = shorteners.ProviderRouter([shorteners.LocalProvider(), backup], explore_every=0)
+
+    assert router.shorten("https://example.com/cfg", timeout=1) == ("https://backup.test/x", "backup")
@@ -0,0 +1,103 @@
+import sqlite3
+
+import pytest
+from alembic import command
+
+from urlcutter.db import migrate
+from urlcutter.normalization import _url_fingerprint
+
+
+def _columns(db, table):
+    return {row[1] for row in db.execute(f"PRAGMA table_info({table})")}
+
+
+def _indexes(db, table):
+    return {row[1] for row in db.execute(f"PRAGMA index_list({table})")}
+
+
+def test_upgrade_to_head_builds_current_schema(tmp_path, monkeypatch):
+    monkeypatch.setenv("URLCUTTER_DATA_DIR", str(tmp_path))
+
+    migrate.upgrade_to_head()
+
+    with sqlite3.connect(tmp_path / "history.db") as db:
+        assert "long_url_fp" in _columns(db, "links")
+        assert "ix_links_long_url_fp" in _indexes(db, "links")
+        assert "ix_links_long_like" not in _indexes(db, "links")
+        assert db.execute("SELECT 1 FROM sqlite_master WHERE name = 'links_fts'").fetchone()
+        assert "ux_links_short_code" in _indexes(db, "links")
+        assert "next_value" in _columns(db, "code_counters")
+
+
+def test_backfill_fills_fingerprints_for_existing_rows(tmp_path, monkeypatch):
+    monkeypatch.setenv("URLCUTTER_DATA_DIR", str(tmp_path))
+    # история «до» колонки long_url_fp: столбец есть, значения пустые
+    command.upgrade(migrate.alembic_config(), "5d0c6b2e9a41")
+    with sqlite3.connect(tmp_path / "history.db") as db:
+        db.executemany(
+            "INSERT INTO links (long_url, short_url, service, created_at, copy_count) "
+            "VALUES (?, 's', 'x', '2025-01-01', 0)",
+            [(f"https://example.com/{i}",) for i in range(2500)] + [("ftp://not-normalizable",)],
+        )
+
+    migrate.upgrade_to_head()
+
+    with sqlite3.connect(tmp_path / "history.db") as db:
+        missing = db.execute("SELECT long_url FROM links WHERE long_url_fp IS NULL").fetchall()
+        fp = db.execute("SELECT long_url_fp FROM links WHERE long_url = 'https://example.com/7'").fetchone()[0]
+        fts_hits = db.execute("SELECT count(*) FROM links_fts WHERE links_fts MATCH '\"example.com/7\"'").fetchone()[0]
+    assert missing == [("ftp://not-normalizable",)]
+    assert fts_hits == 111  # /7, /70..79, /700..799 — старые строки попали в индекс
+    assert fp == _url_fingerprint("https://example.com/7")
+
+
+def test_second_start_skips_alembic(tmp_path, monkeypatch):
+    monkeypatch.setenv("URLCUTTER_DATA_DIR", str(tmp_path))
+
+    assert migrate.upgrade_to_head() is True
+    assert migrate.head_cache_path().exists()
+
+    # на быстром пути Alembic не нужен вовсе
+    monkeypatch.setattr(command, "upgrade", lambda *a, **kw: pytest.fail("alembic upgrade called"))
+    assert migrate.schema_is_current()
+    assert migrate.upgrade_to_head() is False
+
+
+def test_pending_revision_runs_alembic_again(tmp_path, monkeypatch):
+    monkeypatch.setenv("URLCUTTER_DATA_DIR", str(tmp_path))
+    migrate.upgrade_to_head()
+
+    # БД откатили на ревизию назад — кэш head больше не совпадает с alembic_version
+    command.downgrade(migrate.alembic_config(), "-1")
+    assert not migrate.schema_is_current()
+
+    assert migrate.upgrade_to_head() is True
+    assert migrate.schema_is_current()
+
+
+def test_changed_versions_dir_invalidates_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("URLCUTTER_DATA_DIR", str(tmp_path))
+    migrate.upgrade_to_head()
+
+    monkeypatch.setattr(migrate, "_versions_signature", lambda versions: "new-build")
+
+    assert not migrate.schema_is_current()
+
+
+def test_same_size_edit_changes_signature(tmp_path):
+    rev = tmp_path / "0001_rev.py"
+    rev.write_text("revision = 'aaaa'\n", encoding="utf-8")
+    before = migrate._versions_signature(tmp_path)
+
+    rev.write_text("revision = 'aaab'\n", encoding="utf-8")  # тот же размер, другое тело
+
+    assert migrate._versions_signature(tmp_path) != before
+
+
+def test_corrupt_cache_falls_back_to_alembic(tmp_path, monkeypatch):
+    monkeypatch.setenv("URLCUTTER_DATA_DIR", str(tmp_path))
+    migrate.upgrade_to_head()
+    migrate.head_cache_path().write_text("{not json", encoding="utf-8")
+
+    assert not migrate.schema_is_current()
+    assert migrate.upgrade_to_head() is True
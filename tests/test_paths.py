@@ -20,8 +20,11 @@ def test_user_data_dir_with_override(monkeypatch, tmp_path):
         ("Linux", "UrlCutter"),
     ],
 )
-def test_user_data_dir_per_os(monkeypatch, system_name, expected):
+def test_user_data_dir_per_os(monkeypatch, tmp_path, system_name, expected):
     monkeypatch.delenv("URLCUTTER_DATA_DIR", raising=False)
+    # каталог создаётся по-настоящему — пусть внутри tmp_path, а не в домашнем
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("APPDATA", str(tmp_path / "AppData"))
     monkeypatch.setattr(paths.platform, "system", lambda: system_name)
     p = paths.user_data_dir()
     assert expected in str(p)
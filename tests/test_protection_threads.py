@@ -0,0 +1,100 @@
+import asyncio
+import sys
+import threading
+
+import pytest
+
+from urlcutter import protection
+from urlcutter.protection import AppState, RateLimiter
+
+THREADS = 32
+PER_THREAD = 500
+
+
+@pytest.fixture(autouse=True)
+def contention():
+    # частые переключения GIL, чтобы гонки read-modify-write проявлялись сразу
+    old = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    protection._reset_state()
+    yield
+    sys.setswitchinterval(old)
+    protection._reset_state()
+
+
+def hammer(fn):
+    barrier = threading.Barrier(THREADS)
+    results = [[] for _ in range(THREADS)]
+
+    def worker(i):
+        barrier.wait()
+        out = results[i]
+        for _ in range(PER_THREAD):
+            out.append(fn())
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return [r for chunk in results for r in chunk]
+
+
+def test_limiter_grants_exactly_the_burst_under_threads():
+    limiter = RateLimiter(1000, clock=lambda: 1_000.0)
+
+    results = hammer(limiter.allow)
+
+    assert len(results) == THREADS * PER_THREAD
+    assert sum(results) == 1000
+
+
+def test_module_rate_limit_is_exact_under_threads():
+    protection.configure_rate_limit(2500)
+
+    results = hammer(lambda: protection.rate_limit_allow(now_fn=lambda: 1_000.0))
+
+    assert sum(results) == 2500
+
+
+def test_app_state_failures_are_not_lost():
+    st = AppState()
+
+    hammer(st.record_failure)
+
+    assert st.fails == THREADS * PER_THREAD
+    assert st.circuit_blocked()
+
+
+def test_module_breaker_counts_every_failure(monkeypatch):
+    # порог выше числа вызовов: предохранитель не открывается, считаем каждую ошибку
+    breaker = protection.CircuitBreaker(fail_threshold=THREADS * PER_THREAD + 1)
+    monkeypatch.setitem(protection._get_state(), "breaker", breaker)
+
+    hammer(lambda: protection.record_failure(now_fn=lambda: 1_000.0))
+
+    assert breaker.failures == THREADS * PER_THREAD
+    assert not protection.circuit_blocked(now_fn=lambda: 1_000.0)
+
+
+def test_half_open_admits_exactly_the_probe_quota():
+    breaker = protection.CircuitBreaker(fail_threshold=1, cooldown=10, half_open_probes=3, clock=lambda: 0.0)
+    breaker.record_failure()
+
+    # cooldown прошёл: из тысяч одновременных вызовов проходят только пробы
+    results = hammer(lambda: breaker.allow(now=10.0))
+
+    assert sum(results) == 3
+
+
+def test_limiter_is_usable_from_asyncio_tasks():
+    limiter = RateLimiter(50, clock=lambda: 1_000.0)
+
+    async def main():
+        async def one():
+            await asyncio.sleep(0)
+            return limiter.allow()
+
+        return await asyncio.gather(*(one() for _ in range(200)))
+
+    assert sum(asyncio.run(main())) == 50
@@ -0,0 +1,218 @@
+import pytest
+
+from urlcutter import shorteners
+from urlcutter.errors import ProviderUnavailableError, RateLimitedError
+from urlcutter.protection import CircuitBreaker
+from urlcutter.shorteners import FunctionProvider, ProviderRouter, PyshortenersProvider, providers_from_env
+
+
+class Clock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+class Scripted:
+    """Провайдер с управляемой «задержкой» (двигает часы) и сценарием ошибок."""
+
+    def __init__(self, name, clock, latency=0.1, errors=()):
+        self.name = name
+        self.clock = clock
+        self.latency = latency
+        self.errors = list(errors)
+        self.calls = []
+
+    def shorten(self, url, timeout=None):
+        self.calls.append(timeout)
+        self.clock.t += self.latency
+        if self.errors:
+            err = self.errors.pop(0)
+            if err is not None:
+                raise err
+        return f"https://{self.name}.test/x"
+
+
+def make_router(*providers, clock, **kw):
+    kw.setdefault("explore_every", 0)
+    return ProviderRouter(providers, clock=clock, **kw)
+
+
+def test_unmeasured_providers_are_tried_then_fastest_wins():
+    clock = Clock()
+    slow = Scripted("slow", clock, latency=0.9)
+    fast = Scripted("fast", clock, latency=0.1)
+    router = make_router(slow, fast, clock=clock)
+
+    # первый проход измеряет всех по очереди
+    assert router.shorten("https://example.com")[1] == "slow"
+    assert router.shorten("https://example.com")[1] == "fast"
+
+    names = [router.shorten("https://example.com")[1] for _ in range(10)]
+
+    assert names == ["fast"] * 10
+    assert router.stats("slow")["latency"] == pytest.approx(0.9)
+
+
+def test_failover_returns_name_of_provider_that_answered():
+    clock = Clock()
+    down = Scripted("down", clock, errors=[ProviderUnavailableError("503")])
+    up = Scripted("up", clock)
+    router = make_router(down, up, clock=clock)
+
+    assert router.shorten("https://example.com") == ("https://up.test/x", "up")
+    assert router.stats("down")["error_rate"] > 0
+
+
+def test_error_prone_provider_is_demoted_even_if_fast():
+    clock = Clock()
+    flaky = Scripted("flaky", clock, latency=0.01, errors=[ProviderUnavailableError("x")] * 3)
+    steady = Scripted("steady", clock, latency=0.5)
+    router = make_router(flaky, steady, clock=clock, max_error_rate=0.4)
+
+    for _ in range(3):
+        router.shorten("https://example.com")
+
+    assert [p.name for p in router.ranked()] == ["steady", "flaky"]
+
+
+def test_throttled_provider_waits_out_retry_after():
+    clock = Clock()
+    limited = Scripted("limited", clock, latency=0.01, errors=[RateLimitedError("429", retry_after=30)])
+    other = Scripted("other", clock, latency=0.5)
+    router = make_router(limited, other, clock=clock, max_error_rate=1.0)
+
+    assert router.shorten("https://example.com")[1] == "other"
+    assert router.shorten("https://example.com")[1] == "other"
+
+    clock.t += 30
+    assert router.shorten("https://example.com")[1] == "limited"
+
+
+def test_open_breaker_skips_provider_and_all_open_raises():
+    clock = Clock()
+    only = Scripted("only", clock, errors=[ProviderUnavailableError("x")] * 2)
+    router = make_router(only, clock=clock, breaker_factory=lambda: CircuitBreaker(fail_threshold=1, cooldown=60))
+
+    with pytest.raises(ProviderUnavailableError):
+        router.shorten("https://example.com")
+    with pytest.raises(ProviderUnavailableError, match="cooling down"):
+        router.shorten("https://example.com")
+    assert len(only.calls) == 1
+
+
+def test_bad_input_is_not_failed_over():
+    clock = Clock()
+    first = Scripted("first", clock, errors=[ValueError("bad url")])
+    second = Scripted("second", clock)
+    router = make_router(first, second, clock=clock)
+
+    with pytest.raises(ValueError):
+        router.shorten("nope")
+    assert second.calls == []
+
+
+def test_failover_gets_only_the_remaining_budget():
+    clock = Clock()
+    stuck = Scripted("stuck", clock, latency=3.0, errors=[TimeoutError()])
+    backup = Scripted("backup", clock)
+    router = make_router(stuck, backup, clock=clock)
+
+    router.shorten("https://example.com", timeout=5.0)
+
+    assert stuck.calls == [5.0]
+    assert backup.calls == [pytest.approx(2.0)]
+
+
+def test_deadline_after_provider_error_raises_timeout():
+    clock = Clock()
+    down = Scripted("down", clock, latency=2.0, errors=[ProviderUnavailableError("503")])
+    backup = Scripted("backup", clock)
+    router = make_router(down, backup, clock=clock)
+
+    with pytest.raises(TimeoutError) as ei:
+        router.shorten("https://example.com", timeout=1.0)
+    assert isinstance(ei.value.__cause__, ProviderUnavailableError)
+    assert backup.calls == []
+
+
+def test_exploration_revisits_stale_provider():
+    clock = Clock()
+    a = Scripted("a", clock, latency=0.1)
+    b = Scripted("b", clock, latency=0.5)
+    router = make_router(a, b, clock=clock, explore_every=5)
+
+    names = [router.shorten("https://example.com")[1] for _ in range(10)]
+
+    assert names.count("b") >= 2
+
+
+def test_providers_from_env():
+    assert [p.name for p in providers_from_env({})] == ["tinyurl"]
+    assert [p.name for p in providers_from_env({"URLCUTTER_PROVIDERS": "isgd, tinyurl,isgd"})] == ["isgd", "tinyurl"]
+    with pytest.raises(ValueError):
+        providers_from_env({"URLCUTTER_PROVIDERS": "nope"})
+
+
+def test_registry_contains_keyless_backends():
+    assert {"tinyurl", "isgd", "dagd"} <= set(shorteners.available_providers())
+
+
+def test_pyshorteners_provider_uses_backend_and_timeout():
+    seen = {}
+
+    def factory(timeout=2):
+        seen["timeout"] = timeout
+
+        class Backend:
+            def short(self, url):
+                seen["url"] = url
+                return " https://is.gd/abc "
+
+        class S:
+            isgd = Backend()
+
+        return S()
+
+    p = PyshortenersProvider("isgd", factory=factory)
+
+    assert p.shorten("https://example.com/a", timeout=0.5) == "https://is.gd/abc"
+    assert seen == {"timeout": 1, "url": "https://example.com/a"}
+
+
+def test_pyshorteners_provider_reuses_shortener_per_timeout():
+    built = []
+
+    class Backend:
+        def short(self, url):
+            return "https://is.gd/abc"
+
+    def factory(timeout=2):
+        built.append(timeout)
+        return type("S", (), {"isgd": Backend()})()
+
+    p = PyshortenersProvider("isgd", factory=factory)
+
+    for t in (0.5, 0.9, 1.0, 1.5, 2.0, 0.5):
+        p.shorten("https://example.com/a", timeout=t)
+
+    assert built == [1, 2]
+
+
+def test_pyshorteners_provider_maps_errors():
+    class Backend:
+        def short(self, url):
+            raise Exception("ShorteningErrorException: b'Error'")
+
+    p = PyshortenersProvider("dagd", factory=lambda: type("S", (), {"dagd": Backend()})())
+
+    with pytest.raises(ProviderUnavailableError) as ei:
+        p.shorten("https://example.com")
+    assert ei.value.provider == "dagd"
+
+
+def test_function_provider_adapts_callable():
+    p = FunctionProvider("f", lambda url, timeout: f"https://f.test/{timeout}")
+
+    assert p.shorten("https://example.com", 3) == "https://f.test/3"
@@ -0,0 +1,91 @@
+import pytest
+
+from urlcutter import protection
+from urlcutter.protection import AppState, RateLimiter, configure_rate_limit, rate_limit_allow, rate_limit_wait
+
+
+class Clock:
+    def __init__(self, t=1_000_000.0):
+        self.t = t
+
+    def __call__(self):
+        return self.t
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    protection._reset_state()
+    yield
+    protection._reset_state()
+
+
+@pytest.mark.parametrize("rate", [1, 7, 60, 5000])
+def test_burst_is_exact_then_refills_at_rate(rate):
+    clk = Clock()
+    lim = RateLimiter(rate, 60, clock=clk)
+
+    assert all(lim.allow() for _ in range(rate))
+    assert not lim.allow()
+
+    # один токен доливается за 60/rate секунд
+    clk.t += 60 / rate
+    assert lim.allow()
+    assert not lim.allow()
+
+
+def test_wait_time_matches_refill():
+    clk = Clock()
+    lim = RateLimiter(6, 60, clock=clk)  # токен каждые 10 с
+    for _ in range(6):
+        lim.allow()
+
+    assert lim.wait_time() == pytest.approx(10.0)
+    clk.t += 4
+    assert lim.wait_time() == pytest.approx(6.0)
+    assert lim.wait_time(cost=2) == pytest.approx(16.0)
+    clk.t += 6
+    assert lim.wait_time() == 0.0
+
+
+def test_smaller_burst_than_rate():
+    clk = Clock()
+    lim = RateLimiter(600, 60, burst=5, clock=clk)
+
+    assert [lim.allow() for _ in range(6)] == [True] * 5 + [False]
+    clk.t += 0.1
+    assert lim.allow()
+
+
+def test_denied_call_does_not_consume():
+    clk = Clock()
+    lim = RateLimiter(2, 60, clock=clk)
+    lim.allow(cost=2)
+    for _ in range(100):
+        assert not lim.allow()
+    clk.t += 30
+    assert lim.allow()
+
+
+@pytest.mark.parametrize("kwargs", [{"rate": 0}, {"rate": 5, "per": 0}, {"rate": 5, "burst": 0}])
+def test_invalid_configuration(kwargs):
+    with pytest.raises(ValueError):
+        RateLimiter(**kwargs)
+
+
+def test_module_api_high_limit_for_batch_jobs():
+    configure_rate_limit(3000)
+    now = 5_000.0
+
+    assert all(rate_limit_allow(now_fn=lambda: now) for _ in range(3000))
+    assert not rate_limit_allow(now_fn=lambda: now)
+    assert rate_limit_wait(now_fn=lambda: now) == pytest.approx(0.02)
+
+
+def test_app_state_uses_limiter(caplog):
+    st = AppState(rpm_limit=2)
+    import logging
+
+    log = logging.getLogger("test.rate")
+    assert st.rate_limit_allow(log) and st.rate_limit_allow(log)
+    assert not st.rate_limit_allow(log)
+    assert "rate_limit hit rpm=2" in caplog.text
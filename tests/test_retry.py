@@ -0,0 +1,130 @@
+from email.utils import formatdate
+
+import pytest
+
+from urlcutter.errors import ProviderError, ProviderUnavailableError, RateLimitedError
+from urlcutter.retry import RetryPolicy, parse_retry_after, retry_call
+
+
+class FakeClock:
+    def __init__(self):
+        self.t = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.t
+
+    def sleep(self, dt):
+        self.sleeps.append(dt)
+        self.t += dt
+
+
+def flaky(errors, result="https://tiny.one/ok", clock=None, cost=0.0):
+    # первые вызовы падают ошибками из списка, потом успех; запоминаем выданные таймауты
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        if clock is not None:
+            clock.t += cost
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return fn, calls
+
+
+def run(fn, policy, clock, **kw):
+    return retry_call(fn, policy, sleep=clock.sleep, clock=clock, rng=lambda: 1.0, **kw)
+
+
+def test_retries_transient_errors_with_exponential_backoff():
+    clock = FakeClock()
+    fn, calls = flaky([ProviderUnavailableError("503"), TimeoutError(), ProviderUnavailableError("502")])
+    policy = RetryPolicy(attempts=4, base_delay=0.5, max_delay=1.5, deadline=60)
+
+    assert run(fn, policy, clock) == "https://tiny.one/ok"
+    assert len(calls) == 4
+    assert clock.sleeps == [0.5, 1.0, 1.5]
+
+
+def test_full_jitter_scales_backoff():
+    policy = RetryPolicy(base_delay=1.0, multiplier=2.0, max_delay=10)
+
+    assert policy.backoff(3, rng=lambda: 0.25) == 1.0
+    assert RetryPolicy(jitter=False, base_delay=1.0).backoff(2, rng=lambda: 0.0) == 2.0
+
+
+@pytest.mark.parametrize("err", [ValueError("bad url"), ProviderError("HTTP 404", status=404), KeyError("x")])
+def test_non_retryable_errors_fail_fast(err):
+    clock = FakeClock()
+    fn, calls = flaky([err])
+
+    with pytest.raises(type(err)):
+        run(fn, RetryPolicy(attempts=5), clock)
+    assert len(calls) == 1
+    assert clock.sleeps == []
+
+
+def test_retry_after_overrides_shorter_backoff():
+    clock = FakeClock()
+    fn, calls = flaky([RateLimitedError("429", retry_after=3.0)])
+
+    run(fn, RetryPolicy(attempts=2, base_delay=0.1, deadline=30), clock)
+
+    assert clock.sleeps == [3.0]
+    assert len(calls) == 2
+
+
+def test_retry_after_beyond_deadline_gives_up_immediately():
+    clock = FakeClock()
+    fn, calls = flaky([RateLimitedError("429", retry_after=120)])
+
+    with pytest.raises(RateLimitedError):
+        run(fn, RetryPolicy(attempts=5, deadline=20), clock)
+    assert len(calls) == 1
+    assert clock.sleeps == []
+
+
+def test_attempt_timeouts_shrink_to_fit_deadline():
+    clock = FakeClock()
+    fn, calls = flaky([TimeoutError(), TimeoutError(), TimeoutError()], clock=clock, cost=4.0)
+    policy = RetryPolicy(attempts=5, base_delay=1.0, max_delay=1.0, attempt_timeout=4.0, deadline=12)
+
+    with pytest.raises(TimeoutError):
+        run(fn, policy, clock)
+
+    # 4 + 1 пауза + 4 + 1 пауза → на третью попытку осталось 2 секунды бюджета
+    assert calls == [4.0, 4.0, 2.0]
+    assert clock.t <= 12 + 4.0
+
+
+def test_on_retry_hook_sees_each_retry():
+    clock = FakeClock()
+    seen = []
+    fn, _ = flaky([TimeoutError(), ProviderUnavailableError("down")])
+
+    run(fn, RetryPolicy(attempts=3), clock, on_retry=lambda n, e, d: seen.append((n, type(e), d)))
+
+    assert [(n, t) for n, t, _ in seen] == [(1, TimeoutError), (2, ProviderUnavailableError)]
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [("7", 7.0), (" 2.5 ", 2.5), ("-3", 0.0), ("", None), (None, None), ("soon", None)],
+)
+def test_parse_retry_after_seconds(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    now = 1_700_000_000.0
+    assert parse_retry_after(formatdate(now + 30, usegmt=True), now=now) == pytest.approx(30)
+    assert parse_retry_after(formatdate(now - 30, usegmt=True), now=now) == 0.0
+
+
+def test_policy_validation():
+    with pytest.raises(ValueError):
+        RetryPolicy(attempts=0)
+    with pytest.raises(ValueError):
+        RetryPolicy(deadline=0)
@@ -0,0 +1,200 @@
+import asyncio
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import create_engine
+
+from urlcutter import serve
+from urlcutter.db.models import Base
+
+
+@pytest.fixture
+def serve_db(tmp_path):
+    path = tmp_path / "history.db"
+    engine = create_engine(f"sqlite:///{path.as_posix()}", future=True)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    with sqlite3.connect(path) as db:
+        db.executemany(
+            "INSERT INTO links (long_url, short_url, service, created_at, copy_count, short_code) "
+            "VALUES (?, ?, 'local', '2025-01-01', 0, ?)",
+            [("https://example.com/a", "http://s/a1", "a1"), ("example.org/путь?q=1", "http://s/b2", "b2")],
+        )
+    return path
+
+
+class Clock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def run_server(db, coro_fn, **server_kw):
+    """Запускает сервер на свободном порту, выполняет coro_fn(host, port), гасит всё."""
+
+    async def main():
+        pool = serve.ReadOnlyPool(db, size=2)
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            server = serve.RedirectServer(serve.RedirectResolver(pool.lookup, executor=ex), **server_kw)
+            host, port = await server.start("127.0.0.1", 0)
+            try:
+                return await coro_fn(host, port), server
+            finally:
+                await server.close()
+                pool.close()
+
+    return asyncio.run(main())
+
+
+async def exchange(host, port, raw: bytes) -> bytes:
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(raw)
+    await writer.drain()
+    data = await asyncio.wait_for(reader.read(), timeout=5)
+    writer.close()
+    return data
+
+
+def test_redirects_known_code_and_404s_unknown(serve_db):
+    raw = b"GET /a1 HTTP/1.1\r\nHost: x\r\n\r\nGET /nope HTTP/1.1\r\nConnection: close\r\n\r\n"
+    data, _ = run_server(serve_db, lambda h, p: exchange(h, p, raw))
+
+    first, second = data.split(b"HTTP/1.1 ")[1:]
+    assert first.startswith(b"302 Found")
+    assert b"Location: https://example.com/a\r\n" in first
+    assert second.startswith(b"404 Not Found")
+    assert b"Connection: close" in second
+
+
+def test_permanent_mode_and_location_encoding(serve_db):
+    raw = b"GET /b2?utm=x HTTP/1.1\r\nConnection: close\r\n\r\n"
+    data, _ = run_server(serve_db, lambda h, p: exchange(h, p, raw), permanent=True)
+
+    assert data.startswith(b"HTTP/1.1 301 Moved Permanently")
+    # без схемы -> http://, не-ASCII — percent-encoded
+    assert b"Location: http://example.org/%D0%BF%D1%83%D1%82%D1%8C?q=1\r\n" in data
+
+
+def test_pipelined_answers_keep_request_order(serve_db):
+    # первый — промах (поход в БД), второй — мусор из памяти, третий — снова промах
+    raw = b"GET /b2 HTTP/1.1\r\n\r\nGET /../x HTTP/1.1\r\n\r\nHEAD /a1 HTTP/1.1\r\nConnection: close\r\n\r\n"
+    data, server = run_server(serve_db, lambda h, p: exchange(h, p, raw))
+
+    statuses = [chunk[:3] for chunk in data.split(b"HTTP/1.1 ")[1:]]
+    assert statuses == [b"302", b"404", b"302"]
+    assert server.resolver.stats["rejected"] == 1
+
+
+def test_bad_requests(serve_db):
+    async def go(h, p):
+        return (
+            await exchange(h, p, b"POST /a1 HTTP/1.1\r\nConnection: close\r\n\r\n"),
+            await exchange(h, p, b"garbage\r\n\r\n"),
+            await exchange(h, p, b"GET /a1 HTTP/1.1\r\nContent-Length: 3\r\n\r\nabc"),
+            await exchange(h, p, b"GET /" + b"a" * serve.MAX_HEADER_BYTES),
+        )
+
+    (post, garbage, body, huge), _ = run_server(serve_db, go)
+
+    assert post.startswith(b"HTTP/1.1 405") and b"Allow: GET, HEAD" in post
+    assert garbage.startswith(b"HTTP/1.1 400")
+    assert body.startswith(b"HTTP/1.1 400")
+    assert huge.startswith(b"HTTP/1.1 431")
+
+
+def test_http10_closes_by_default(serve_db):
+    data, _ = run_server(serve_db, lambda h, p: exchange(h, p, b"GET /a1 HTTP/1.0\r\n\r\n"))
+
+    assert data.startswith(b"HTTP/1.1 302") and b"Connection: close" in data
+
+
+def test_resolver_caches_hits_and_misses_with_ttl():
+    clock = Clock()
+    calls = []
+
+    def lookup(code):
+        calls.append(code)
+        return "https://example.com/x" if code == "hit" else None
+
+    resolver = serve.RedirectResolver(lookup, negative_ttl=5, clock=clock)
+
+    async def go():
+        out = [await resolver.resolve("hit"), await resolver.resolve("hit")]
+        out += [await resolver.resolve("miss"), await resolver.resolve("miss")]
+        clock.t = 6  # негативная запись истекла — код мог появиться
+        out.append(await resolver.resolve("miss"))
+        return out
+
+    out = asyncio.run(go())
+
+    assert out == [b"https://example.com/x", b"https://example.com/x", None, None, None]
+    assert calls == ["hit", "miss", "miss"]
+    assert resolver.stats["hot_hits"] == 1 and resolver.stats["negative_hits"] == 1
+
+
+def test_hot_entry_expires_so_deleted_code_stops_redirecting():
+    clock = Clock()
+    links = {"gone": "https://example.com/gone"}
+    resolver = serve.RedirectResolver(links.get, hot_ttl=60, clock=clock)
+
+    async def go():
+        first = await resolver.resolve("gone")
+        del links["gone"]  # ссылку удалили из истории
+        clock.t = 30
+        cached = await resolver.resolve("gone")
+        clock.t = 61
+        return first, cached, await resolver.resolve("gone")
+
+    assert asyncio.run(go()) == (b"https://example.com/gone", b"https://example.com/gone", None)
+
+
+def test_resolver_collapses_concurrent_misses():
+    calls = []
+
+    def lookup(code):
+        calls.append(code)
+        return "https://example.com/slow"
+
+    resolver = serve.RedirectResolver(lookup)
+
+    async def go():
+        return await asyncio.gather(*(resolver.resolve("same") for _ in range(20)))
+
+    assert set(asyncio.run(go())) == {b"https://example.com/slow"}
+    assert calls == ["same"]
+
+
+def test_hot_cache_is_bounded():
+    resolver = serve.RedirectResolver(lambda code: f"https://example.com/{code}", hot_size=3)
+
+    async def go():
+        for code in ("a", "b", "c", "d"):
+            await resolver.resolve(code)
+
+    asyncio.run(go())
+
+    assert len(resolver._hot) == 3
+    assert resolver.peek("a") is serve._MISS
+
+
+def test_read_only_pool_refuses_writes(serve_db):
+    pool = serve.ReadOnlyPool(serve_db, size=1)
+    try:
+        assert pool.lookup("a1") == "https://example.com/a"
+        assert pool.lookup("zz") is None
+        conn = pool._idle.get_nowait()
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM links")
+    finally:
+        pool.close()
+
+
+def test_main_help(capsys):
+    with pytest.raises(SystemExit) as exc:
+        serve.main(["--help"])
+
+    assert exc.value.code == 0
+    assert "--permanent" in capsys.readouterr().out
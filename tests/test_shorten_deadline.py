@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from urlcutter import shorteners
+from urlcutter.shorteners import abandoned_calls, shorten_via_tinyurl_core
+
+
+def wait_until(cond, limit=3.0):
+    end = time.monotonic() + limit
+    while time.monotonic() < end:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return cond()
+
+
+def slow_http_factory(api_url, seen):
+    # «pyshorteners» над локальным медленным стендом: таймаут сокета берёт из конструктора
+    def factory(timeout=2):
+        seen.append(timeout)
+
+        class Tiny:
+            def short(self, url):
+                return requests.get(api_url, params={"url": url}, timeout=timeout).text.strip()
+
+        class Shortener:
+            tinyurl = Tiny()
+
+        return Shortener()
+
+    return factory
+
+
+def test_timeout_returns_at_deadline_not_when_provider_finishes():
+    release = threading.Event()
+
+    class Tiny:
+        def short(self, url):
+            release.wait(2.0)
+            return "https://tiny.one/late"
+
+    class Shortener:
+        tinyurl = Tiny()
+
+    t0 = time.monotonic()
+    with pytest.raises(TimeoutError):
+        shorten_via_tinyurl_core("https://example.com", timeout=0.2, _shortener_factory=Shortener)
+    elapsed = time.monotonic() - t0
+
+    assert elapsed < 0.5
+    assert abandoned_calls() >= 1
+
+    release.set()
+    assert wait_until(lambda: abandoned_calls() == 0)
+
+
+def test_socket_timeout_is_passed_and_stray_call_is_reaped(tinyurl_stub):
+    tinyurl_stub["delay"] = 3.0
+    seen = []
+    factory = slow_http_factory(tinyurl_stub["api_url"], seen)
+
+    t0 = time.monotonic()
+    with pytest.raises(TimeoutError):
+        shorten_via_tinyurl_core("https://example.com", timeout=0.3, _shortener_factory=factory)
+
+    assert time.monotonic() - t0 < 0.6
+    # pyshorteners делает int(timeout) — поэтому вниз уходит целое число секунд, не меньше 1
+    assert seen == [1]
+    # сокет сам отваливается по своему таймауту, брошенный вызов не висит до ответа стенда
+    assert wait_until(lambda: abandoned_calls() == 0, limit=1.4)
+
+
+def test_fast_calls_share_one_pool(tinyurl_stub):
+    seen = []
+    factory = slow_http_factory(tinyurl_stub["api_url"], seen)
+
+    for _ in range(3):
+        assert shorten_via_tinyurl_core("https://example.com", timeout=2, _shortener_factory=factory)
+
+    assert shorteners._get_call_pool() is shorteners._get_call_pool()
+    assert seen == [2, 2, 2]
+    assert abandoned_calls() == 0
+
+
+def test_nullary_factory_still_supported():
+    class Tiny:
+        def short(self, url):
+            return "https://tiny.one/ok"
+
+    class Shortener:
+        tinyurl = Tiny()
+
+    assert shorten_via_tinyurl_core("https://example.com", timeout=1, _shortener_factory=lambda: Shortener()) == (
+        "https://tiny.one/ok"
+    )
+
+
+def test_lite_upgrade_default_uses_shared_pool_deadline():
+    import lite_upgrade
+
+    release = threading.Event()
+
+    class Tiny:
+        def short(self, url):
+            release.wait(2.0)
+            return "https://tiny.one/late"
+
+    class Shortener:
+        tinyurl = Tiny()
+
+    t0 = time.monotonic()
+    with pytest.raises(TimeoutError):
+        lite_upgrade.shorten_via_tinyurl("https://example.com", timeout=0.2, _shortener_factory=Shortener)
+
+    # без with-блока пула: вернулись на дедлайне, поток учтён как брошенный
+    assert time.monotonic() - t0 < 0.5
+    assert abandoned_calls() >= 1
+    release.set()
+    assert wait_until(lambda: abandoned_calls() == 0)
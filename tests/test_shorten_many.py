@@ -0,0 +1,215 @@
+import threading
+import time
+
+import pytest
+
+from urlcutter import shorteners
+from urlcutter.protection import CircuitBreaker
+from urlcutter.shorteners import shorten_many
+
+
+def make_factory(delays=None, fail_on=(), counter=None):
+    # Фабрика «провайдера»: задержка по URL, падение на выбранных URL, счётчик параллельности
+    delays = delays or {}
+    calls = {"created": 0}
+
+    def _factory():
+        calls["created"] += 1
+
+        class FakeTiny:
+            def short(self, url: str) -> str:
+                if counter is not None:
+                    with counter["lock"]:
+                        counter["now"] += 1
+                        counter["max"] = max(counter["max"], counter["now"])
+                try:
+                    time.sleep(delays.get(url, 0.0))
+                    if url in fail_on:
+                        raise RuntimeError("boom")
+                    return "https://tiny.one/" + url.rsplit("/", 1)[-1]
+                finally:
+                    if counter is not None:
+                        with counter["lock"]:
+                            counter["now"] -= 1
+
+        class FakeShortener:
+            tinyurl = FakeTiny()
+
+        return FakeShortener()
+
+    return _factory, calls
+
+
+def test_shorten_many_returns_all_results():
+    factory, calls = make_factory()
+    urls = [f"https://example.com/{i}" for i in range(20)]
+
+    out = dict(shorten_many(urls, concurrency=4, _shortener_factory=factory))
+
+    assert set(out) == set(urls)
+    assert out["https://example.com/7"] == "https://tiny.one/7"
+    # один Shortener на весь батч
+    assert calls["created"] == 1
+
+
+def test_shorten_many_yields_in_completion_order():
+    factory, _ = make_factory(delays={"https://example.com/slow": 0.3})
+    urls = ["https://example.com/slow", "https://example.com/fast"]
+
+    order = [u for u, _ in shorten_many(urls, concurrency=2, _shortener_factory=factory)]
+
+    assert order == ["https://example.com/fast", "https://example.com/slow"]
+
+
+def test_shorten_many_respects_concurrency_bound():
+    counter = {"lock": threading.Lock(), "now": 0, "max": 0}
+    factory, _ = make_factory(delays={f"https://example.com/{i}": 0.02 for i in range(30)}, counter=counter)
+    urls = [f"https://example.com/{i}" for i in range(30)]
+
+    results = list(shorten_many(urls, concurrency=3, _shortener_factory=factory))
+
+    assert len(results) == 30
+    assert counter["max"] <= 3
+
+
+def test_shorten_many_reports_errors_per_item():
+    factory, _ = make_factory(fail_on={"https://example.com/bad"})
+    urls = ["https://example.com/ok", "ftp://nope", "https://example.com/bad"]
+
+    out = dict(shorten_many(urls, concurrency=2, _shortener_factory=factory))
+
+    assert out["https://example.com/ok"] == "https://tiny.one/ok"
+    assert isinstance(out["ftp://nope"], ValueError)
+    assert isinstance(out["https://example.com/bad"], RuntimeError)
+
+
+def test_shorten_many_per_item_timeout_does_not_block_batch():
+    factory, _ = make_factory(delays={"https://example.com/stuck": 1.0})
+    urls = ["https://example.com/stuck", "https://example.com/a", "https://example.com/b"]
+
+    t0 = time.monotonic()
+    out = dict(shorten_many(urls, concurrency=2, timeout=0.2, _shortener_factory=factory))
+    elapsed = time.monotonic() - t0
+
+    assert isinstance(out["https://example.com/stuck"], TimeoutError)
+    assert out["https://example.com/a"] == "https://tiny.one/a"
+    assert out["https://example.com/b"] == "https://tiny.one/b"
+    assert elapsed < 0.9
+
+
+def test_shorten_many_direct_http_path():
+    class DummyResp:
+        status_code = 200
+        text = "https://tinyurl.com/xyz"
+
+    seen = []
+
+    def fake_get(url, timeout=None):
+        seen.append(timeout)
+        return DummyResp()
+
+    out = list(shorten_many(["https://example.com"], timeout=1.5, _get=fake_get))
+
+    assert out == [("https://example.com", "https://tinyurl.com/xyz")]
+    assert seen == [1.5]
+
+
+def test_shorten_many_reuses_one_pool():
+    assert shorteners._get_batch_pool() is shorteners._get_batch_pool()
+
+
+def test_shorten_many_rejects_bad_concurrency():
+    # сразу при вызове, без итерации
+    with pytest.raises(ValueError):
+        shorten_many(["https://example.com"], concurrency=0)
+
+
+def test_shorten_many_timed_out_item_is_tracked_as_abandoned():
+    release = threading.Event()
+
+    def _factory(timeout=None):
+        seen.append(timeout)
+
+        class FakeTiny:
+            def short(self, url):
+                release.wait(5)
+                return "https://tiny.one/late"
+
+        class FakeShortener:
+            tinyurl = FakeTiny()
+
+        return FakeShortener()
+
+    seen = []
+    before = shorteners.abandoned_calls()
+    try:
+        out = list(shorten_many(["https://example.com/stuck"], timeout=0.1, _shortener_factory=_factory))
+        assert isinstance(out[0][1], TimeoutError)
+        # зависший поток пула не потерян, а таймаут дошёл и до сокета Shortener
+        assert shorteners.abandoned_calls() == before + 1
+        assert seen == [1]
+    finally:
+        release.set()
+    deadline = time.monotonic() + 5
+    while shorteners.abandoned_calls() > before and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert shorteners.abandoned_calls() == before
+
+
+def test_shorten_many_stops_calling_provider_when_breaker_opens():
+    calls = []
+
+    def failing_get(url, timeout=None):
+        calls.append(url)
+        raise ConnectionError("down")
+
+    breaker = CircuitBreaker(fail_threshold=3, cooldown=60)
+    urls = [f"https://example.com/{i}" for i in range(20)]
+
+    out = list(shorten_many(urls, concurrency=1, _get=failing_get, breaker=breaker))
+
+    assert len(out) == 20
+    assert all(isinstance(r, RuntimeError) for _, r in out)
+    assert len(calls) == 3
+    assert breaker.state() == CircuitBreaker.OPEN
+
+
+def test_shorten_many_breaker_half_open_admits_single_probe():
+    clock = {"t": 0.0}
+    breaker = CircuitBreaker(fail_threshold=1, cooldown=10, clock=lambda: clock["t"])
+    breaker.record_failure()
+    clock["t"] = 10.0
+    factory, calls = make_factory()
+
+    out = dict(
+        shorten_many(
+            [f"https://example.com/{i}" for i in range(8)], concurrency=4, _shortener_factory=factory, breaker=breaker
+        )
+    )
+
+    ok = sorted(int(u.rsplit("/", 1)[-1]) for u, r in out.items() if isinstance(r, str))
+    # прошла одна проба, следующие отбиты; её успех закрыл предохранитель для хвоста
+    assert ok == [0, 5, 6, 7]
+    assert breaker.state() == CircuitBreaker.CLOSED
+
+
+def test_shorten_many_bad_input_completes_half_open_probe():
+    clock = {"t": 0.0}
+    breaker = CircuitBreaker(fail_threshold=1, cooldown=10, clock=lambda: clock["t"])
+    breaker.record_failure()
+    clock["t"] = 10.0
+    factory, calls = make_factory()
+
+    # пробу забирает невалидный URL: его ValueError не должен держать слот до конца аренды
+    out = list(
+        shorten_many(
+            ["not a url", "https://example.com/1", "https://example.com/2"],
+            concurrency=1,
+            _shortener_factory=factory,
+            breaker=breaker,
+        )
+    )
+
+    assert isinstance(out[0][1], ValueError)
+    assert all(isinstance(r, str) for _, r in out[1:])
+    assert breaker.state() == CircuitBreaker.CLOSED
@@ -22,7 +22,5 @@ def test_shorten_timeout(monkeypatch):
         def submit(self, fn):  # fn не вызываем, сразу "таймаут"
             return FakeFuture()
 
-    monkeypatch.setattr(lite_upgrade, "ThreadPoolExecutor", FakeExecutor)
-
     with pytest.raises(lite_upgrade.FutTimeout):
-        lite_upgrade.shorten_via_tinyurl("http://example.com", timeout=0.01)
+        lite_upgrade.shorten_via_tinyurl("http://example.com", timeout=0.01, _pool_factory=FakeExecutor)
@@ -15,11 +15,10 @@ def test_shorten_via_tinyurl_happy_path(monkeypatch, fake_shortener_ok_factory):
 
 
 def test_shorten_via_tinyurl_timeout(monkeypatch, fake_pool_timeout_factory, fake_shortener_ok_factory):
-    monkeypatch.setattr("lite_upgrade.ThreadPoolExecutor", fake_pool_timeout_factory)
     monkeypatch.setattr("pyshorteners.Shortener", fake_shortener_ok_factory)
 
     with pytest.raises(TimeoutError):
-        shorten_via_tinyurl("https://example.com", timeout=0.01)
+        shorten_via_tinyurl("https://example.com", timeout=0.01, _pool_factory=fake_pool_timeout_factory)
 
 
 def test_shorten_via_tinyurl_provider_error(monkeypatch, fake_shortener_boom_factory):
@@ -87,11 +86,9 @@ def test_shorten_via_tinyurl_forwards_timeout(
 
     # 2) подменяем пул на нашу реализацию, которая запоминает timeout
     fake_pool, captured = fake_pool_capturing_timeout_factory()
-    monkeypatch.setattr("lite_upgrade.ThreadPoolExecutor", lambda max_workers=1: fake_pool)
-
     # 3) вызываем с «нестандартным» таймаутом и проверяем, что он дошёл
     t = 0.123
-    out = shorten_via_tinyurl("https://example.com", timeout=t)
+    out = shorten_via_tinyurl("https://example.com", timeout=t, _pool_factory=lambda max_workers=1: fake_pool)
     assert out == "https://tiny.one/abc123"
     assert captured["timeout"] == t
     assert captured["calls"] == 1
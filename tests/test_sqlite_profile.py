@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from urlcutter.db.engine import SQLITE_PRAGMA_DEFAULTS, install_sqlite_profile, sqlite_pragmas
+
+
+def test_defaults_without_env():
+    assert sqlite_pragmas({}) == {k: v.upper() for k, v in SQLITE_PRAGMA_DEFAULTS.items()}
+
+
+def test_env_overrides_and_normalizes():
+    prof = sqlite_pragmas({"URLCUTTER_SQLITE_SYNCHRONOUS": "full", "URLCUTTER_SQLITE_CACHE_SIZE": " -2000 "})
+    assert prof["synchronous"] == "FULL"
+    assert prof["cache_size"] == "-2000"
+    assert prof["journal_mode"] == "WAL"
+
+
+def test_profile_can_be_switched_off():
+    assert sqlite_pragmas({"URLCUTTER_SQLITE_PROFILE": "off"}) == {}
+
+
+@pytest.mark.parametrize(
+    "key, value",
+    [
+        ("URLCUTTER_SQLITE_JOURNAL_MODE", "wal; DROP TABLE links"),
+        ("URLCUTTER_SQLITE_MMAP_SIZE", "lots"),
+        ("URLCUTTER_SQLITE_TEMP_STORE", "ram"),
+    ],
+)
+def test_invalid_values_rejected(key, value):
+    with pytest.raises(ValueError, match=key):
+        sqlite_pragmas({key: value})
+
+
+def test_profile_applied_on_every_connection(tmp_path):
+    eng = install_sqlite_profile(create_engine(f"sqlite:///{tmp_path / 'p.db'}"), sqlite_pragmas({}))
+    try:
+        for _ in range(2):
+            with eng.connect() as conn:
+                assert conn.execute(text("PRAGMA journal_mode")).scalar_one() == "wal"
+                assert conn.execute(text("PRAGMA synchronous")).scalar_one() == 1
+                assert conn.execute(text("PRAGMA busy_timeout")).scalar_one() == 5000
+                assert conn.execute(text("PRAGMA temp_store")).scalar_one() == 2
+            eng.dispose()
+    finally:
+        eng.dispose()
@@ -1,3 +1,4 @@
+from .errors import ProviderError, ProviderUnavailableError, RateLimitedError
 from .logging_utils import setup_logging
 from .normalization import _url_fingerprint, normalize_url
 from .protection import (
@@ -8,21 +9,44 @@ from .protection import (
     CLIENT_RPM_LIMIT,
     RATE_LIMIT_WINDOW_SEC,
     AppState,
+    CircuitBreaker,
+    ConnectivityProbe,
+    RateLimiter,
     _get_state,
     _reset_state,
+    breaker_for,
+    circuit_allow,
     circuit_blocked,
+    configure_probe,
+    configure_rate_limit,
     cooldown_left,
+    default_probe,
     internet_ok,
     rate_limit_allow,
+    rate_limit_wait,
     record_failure,
     record_success,
 )
-from .shorteners import shorten_via_tinyurl_core
+
+# shorteners тянет сетевой стек (requests/urllib3) — импортируем при первом обращении
+_LAZY_SHORTENERS = ("shorten_via_tinyurl_core", "shorten_many", "ashorten", "ashorten_many")
+
+
+def __getattr__(name: str):
+    if name in _LAZY_SHORTENERS:
+        from . import shorteners
+
+        return getattr(shorteners, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "normalize_url",
     "_url_fingerprint",
     "setup_logging",
+    "ProviderError",
+    "ProviderUnavailableError",
+    "RateLimitedError",
     "CB_COOLDOWN_SEC",
     "CB_FAIL_THRESHOLD",
     "CIRCUIT_COOLDOWN_SEC",
@@ -30,14 +54,26 @@ __all__ = [
     "CLIENT_RPM_LIMIT",
     "RATE_LIMIT_WINDOW_SEC",
     "AppState",
+    "CircuitBreaker",
+    "ConnectivityProbe",
+    "RateLimiter",
     "_get_state",
     "_reset_state",
+    "circuit_allow",
     "circuit_blocked",
+    "breaker_for",
     "cooldown_left",
     "internet_ok",
+    "default_probe",
+    "configure_probe",
     "rate_limit_allow",
+    "rate_limit_wait",
+    "configure_rate_limit",
     "record_failure",
     "record_success",
     "shorten_via_tinyurl_core",
+    "shorten_many",
+    "ashorten",
+    "ashorten_many",
 ]
 __version__ = "0.1.0"
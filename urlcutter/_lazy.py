@@ -0,0 +1,30 @@
+"""Lazy imports for heavy optional-at-startup dependencies."""
+
+from __future__ import annotations
+
+import importlib.util
+import sys
+from types import ModuleType
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Модуль `name`, который реально исполняется при первом обращении к атрибуту.
+
+    Объект регистрируется в sys.modules, поэтому `import name` и monkeypatch по строке
+    ("pyshorteners.Shortener") видят тот же самый модуль. Уже импортированный модуль
+    возвращается как есть. Нет такого пакета — ModuleNotFoundError сразу, как у import.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.loader is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
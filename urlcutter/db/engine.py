@@ -1,25 +1,122 @@
-"""SQLAlchemy engine and session helpers for UrlCutter."""
+"""SQLAlchemy engine and session helpers for UrlCutter.
+
+Engine и SessionLocal создаются лениво, при первом get_session() (или первом обращении
+к `engine` / `SessionLocal` / `_SQLITE_URL`): импорт модуля не трогает диск.
+"""
 
 from __future__ import annotations
 
+import os
+import threading
+from collections.abc import Mapping
 from contextlib import contextmanager
 
-from sqlalchemy import create_engine
+from sqlalchemy import Engine, create_engine, event
 from sqlalchemy.orm import sessionmaker
 
 from .paths import db_path
 
-# SQLite URL to the user data dir DB
-_SQLITE_URL = f"sqlite:///{db_path().as_posix()}"
+# Профиль производительности SQLite, применяется к каждому новому соединению.
+# Любой PRAGMA переопределяется env URLCUTTER_SQLITE_<NAME>, весь профиль выключает URLCUTTER_SQLITE_PROFILE=off.
+# busy_timeout первым: смена journal_mode тоже может ждать блокировку.
+SQLITE_PRAGMA_DEFAULTS: dict[str, str] = {
+    "busy_timeout": "5000",  # мс ожидания блокировки вместо мгновенного "database is locked"
+    "journal_mode": "WAL",  # читатели не блокируют писателя; хранится в файле БД
+    "synchronous": "NORMAL",  # в WAL безопасно: fsync на checkpoint, а не на каждый коммит
+    "mmap_size": str(256 * 1024 * 1024),
+    "cache_size": "-16000",  # отрицательное — в КиБ (~16 МиБ на соединение)
+    "temp_store": "MEMORY",
+}
+_PRAGMA_CHOICES = {
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA", "0", "1", "2", "3"},
+    "temp_store": {"DEFAULT", "FILE", "MEMORY", "0", "1", "2"},
+}
+_PROFILE_OFF = {"off", "0", "none", "false"}
+
+
+def sqlite_pragmas(env: Mapping[str, str] | None = None) -> dict[str, str]:
+    """Итоговый профиль: SQLITE_PRAGMA_DEFAULTS + env-переопределения. ValueError на недопустимом значении."""
+    env = os.environ if env is None else env
+    if env.get("URLCUTTER_SQLITE_PROFILE", "").strip().lower() in _PROFILE_OFF:
+        return {}
+
+    out: dict[str, str] = {}
+    for name, default in SQLITE_PRAGMA_DEFAULTS.items():
+        key = f"URLCUTTER_SQLITE_{name.upper()}"
+        value = env.get(key, default).strip().upper()
+        choices = _PRAGMA_CHOICES.get(name)
+        if choices is not None:
+            if value not in choices:
+                raise ValueError(f"{key}={value!r}: expected one of {sorted(choices)}")
+        else:
+            try:
+                value = str(int(value))
+            except ValueError as e:
+                raise ValueError(f"{key}={value!r}: expected an integer") from e
+        out[name] = value
+    return out
+
+
+def apply_sqlite_pragmas(dbapi_conn, pragmas: Mapping[str, str]) -> None:
+    """PRAGMA по списку на сыром DB-API соединении (значения уже проверены sqlite_pragmas)."""
+    cur = dbapi_conn.cursor()
+    try:
+        for name, value in pragmas.items():
+            cur.execute(f"PRAGMA {name}={value}")
+    finally:
+        cur.close()
+
+
+def install_sqlite_profile(eng: Engine, pragmas: Mapping[str, str] | None = None) -> Engine:
+    """Вешает профиль на событие connect движка; pragmas=None => sqlite_pragmas() из окружения."""
+    pragmas = dict(sqlite_pragmas() if pragmas is None else pragmas)
+    if pragmas:
+        event.listen(eng, "connect", lambda dbapi_conn, _record: apply_sqlite_pragmas(dbapi_conn, pragmas))
+    return eng
+
+
+_init_lock = threading.Lock()
+
+
+def _sqlite_url() -> str:
+    # SQLite URL to the user data dir DB (db_path() создаёт каталог данных)
+    return f"sqlite:///{db_path().as_posix()}"
+
+
+def _session_factory() -> sessionmaker:
+    """
+    SessionLocal; при первом вызове строит engine и фабрику сессий.
+
+    Уже заданные атрибуты модуля (например, подменённые в тестах) не перезаписываются.
+    """
+    g = globals()
+    factory = g.get("SessionLocal")
+    if factory is not None:
+        return factory
+    with _init_lock:
+        if "SessionLocal" not in g:
+            # не setdefault: аргумент вычислился бы всегда, а _sqlite_url() создаёт каталог данных
+            url = g.get("_SQLITE_URL") or _sqlite_url()
+            g.setdefault("_SQLITE_URL", url)
+            if "engine" not in g:
+                # Single engine for the app; check_same_thread=False for GUI callbacks
+                g["engine"] = install_sqlite_profile(
+                    create_engine(url, connect_args={"check_same_thread": False}, future=True)
+                )
+            g["SessionLocal"] = sessionmaker(bind=g["engine"], autoflush=False, autocommit=False, future=True)
+        return g["SessionLocal"]
 
-# Single engine for the app; check_same_thread=False for GUI callbacks
-engine = create_engine(
-    _SQLITE_URL,
-    connect_args={"check_same_thread": False},
-    future=True,
-)
 
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+def __getattr__(name: str):
+    # PEP 562: ленивые атрибуты модуля
+    if name == "_SQLITE_URL":
+        url = globals()[name] = _sqlite_url()  # сюда попадаем, только если атрибута ещё нет
+        return url
+    if name in ("engine", "SessionLocal"):
+        _session_factory()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 @contextmanager
@@ -31,7 +128,7 @@ def get_session():
         with get_session() as s:
             ...
     """
-    session = SessionLocal()
+    session = _session_factory()()
     try:
         yield session
         session.commit()
@@ -0,0 +1,81 @@
+"""SQLite FTS5 (trigram) shadow index over links.long_url / links.short_url.
+
+`links_fts` is an external-content table: it stores only the trigram index, rows live
+in `links` and are kept in sync by triggers. Trigram tokens make `MATCH` a
+case-insensitive substring search for queries of 3+ characters.
+
+Note: a migration that rebuilds `links` (batch "move and copy") drops its triggers —
+call `create_fts()` again afterwards.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import column, table
+
+FTS_TABLE = "links_fts"
+FTS_MIN_QUERY_LEN = 3  # короче трёх символов триграмм нет — ищем через LIKE
+
+FTS_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+    "USING fts5(long_url, short_url, content='links', content_rowid='id', tokenize='trigram')",
+    f"CREATE TRIGGER IF NOT EXISTS links_fts_ai AFTER INSERT ON links BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, long_url, short_url) VALUES (new.id, new.long_url, new.short_url); END",
+    f"CREATE TRIGGER IF NOT EXISTS links_fts_ad AFTER DELETE ON links BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, long_url, short_url) "
+    "VALUES ('delete', old.id, old.long_url, old.short_url); END",
+    f"CREATE TRIGGER IF NOT EXISTS links_fts_au AFTER UPDATE OF long_url, short_url ON links BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, long_url, short_url) "
+    "VALUES ('delete', old.id, old.long_url, old.short_url); "
+    f"INSERT INTO {FTS_TABLE}(rowid, long_url, short_url) VALUES (new.id, new.long_url, new.short_url); END",
+)
+
+FTS_DROP = (
+    "DROP TRIGGER IF EXISTS links_fts_au",
+    "DROP TRIGGER IF EXISTS links_fts_ad",
+    "DROP TRIGGER IF EXISTS links_fts_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+)
+
+# Для запросов: SELECT rowid FROM links_fts WHERE links_fts MATCH :q
+links_fts = table(FTS_TABLE, column("rowid"), column(FTS_TABLE))
+
+
+def fts_supported(conn) -> bool:
+    """True if this SQLite build has FTS5 with the trigram tokenizer (SQLite ≥ 3.34)."""
+    try:
+        conn.exec_driver_sql("CREATE VIRTUAL TABLE temp._fts_probe USING fts5(x, tokenize='trigram')")
+        conn.exec_driver_sql("DROP TABLE temp._fts_probe")
+        return True
+    except Exception:
+        return False
+
+
+def create_fts(conn, *, rebuild: bool = True) -> bool:
+    """Create the FTS table + triggers (idempotent) and index existing rows. False if unsupported."""
+    if conn.dialect.name != "sqlite" or not fts_supported(conn):
+        return False
+    for stmt in FTS_DDL:
+        conn.exec_driver_sql(stmt)
+    if rebuild:
+        conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+def drop_fts(conn) -> None:
+    for stmt in FTS_DROP:
+        conn.exec_driver_sql(stmt)
+
+
+def fts_present(conn) -> bool:
+    row = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)).first()
+    return row is not None
+
+
+def fts_phrase(query: str) -> str:
+    """Quote user input as one FTS5 phrase (no operators, `"` escaped)."""
+    return '"' + query.replace('"', '""') + '"'
+
+
+def after_links_create(target, connection, **kw) -> None:
+    """DDL hook: `metadata.create_all()` builds the FTS index next to `links`."""
+    create_fts(connection, rebuild=False)
@@ -1,23 +1,41 @@
-"""Programmatic Alembic upgrade for app startup (works with/without alembic.ini)."""
+"""Programmatic Alembic upgrade for app startup (works with/without alembic.ini).
+
+Быстрый путь: рядом с БД лежит кэш head-ревизий (`history.db.alembic-head`) с подписью
+каталога versions. Если подпись совпала, а `alembic_version` в БД равен закэшированным
+head — схема актуальна, Alembic даже не импортируется. Иначе обычный `upgrade head`
+и перезапись кэша.
+"""
 
 from __future__ import annotations
 
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
 from pathlib import Path
-
-from alembic import command
-from alembic.config import Config
+from typing import TYPE_CHECKING
 
 from .paths import alembic_dir, db_path
 
+if TYPE_CHECKING:
+    from alembic.config import Config
+
+HEAD_CACHE_SUFFIX = ".alembic-head"
+
 
-def upgrade_to_head() -> None:
+def alembic_config() -> Config:
     """
-    Ensure the local DB schema is at the latest Alembic head.
-    Safe to call on every app start.
+    Build the Alembic config for the app DB.
 
     - В dev читаем корневой alembic.ini (если есть) только ради логгинга.
     - В иных случаях конфиг собираем программно.
     """
+    # Alembic нужен только когда есть что мигрировать; патч __version__ — вместе с ним
+    from alembic.config import Config  # noqa: PLC0415
+
+    import urlcutter.patches.fix_alembic_version  # noqa: F401, PLC0415
+
     # Попробуем найти корневой ini (обычный dev-случай: <project_root>/alembic.ini)
     project_root = Path(__file__).resolve().parents[2]
     root_ini = project_root / "alembic_migrations" / "alembic.ini"
@@ -27,6 +45,77 @@ def upgrade_to_head() -> None:
     # Куда смотреть миграции и где наша БД
     cfg.set_main_option("script_location", str(alembic_dir()))
     cfg.set_main_option("sqlalchemy.url", f"sqlite:///{db_path().as_posix()}")
+    return cfg
+
+
+def _versions_signature(versions: Path) -> str:
+    """Подпись набора ревизий: имена и содержимое файлов (mtime не берём — в frozen-сборке он плавает).
+
+    Файлов единицы и они маленькие, так что хэш содержимого дешёв и ловит правку без смены размера.
+    """
+    h = hashlib.sha1()
+    with contextlib.suppress(OSError):
+        for entry in sorted(os.scandir(versions), key=lambda e: e.name):
+            if entry.name.endswith(".py") and entry.is_file():
+                h.update(f"{entry.name}\n".encode())
+                h.update(Path(entry.path).read_bytes())
+    return h.hexdigest()
+
+
+def head_cache_path() -> Path:
+    db = db_path()
+    return db.with_name(db.name + HEAD_CACHE_SUFFIX)
+
+
+def _db_revisions(db: Path) -> set[str] | None:
+    """Ревизии из alembic_version одним запросом stdlib sqlite3; None — БД нет или таблицы нет."""
+    if not db.exists():
+        return None
+    try:
+        with contextlib.closing(sqlite3.connect(f"{db.as_uri()}?mode=ro", uri=True)) as conn:
+            return {row[0] for row in conn.execute("SELECT version_num FROM alembic_version")}
+    except sqlite3.Error:
+        return None
+
+
+def schema_is_current() -> bool:
+    """True, если по кэшу head и alembic_version миграции не нужны (без импорта Alembic)."""
+    try:
+        cache = json.loads(head_cache_path().read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return False
+    if not isinstance(cache, dict) or cache.get("signature") != _versions_signature(alembic_dir() / "versions"):
+        return False
+    heads = cache.get("heads")
+    return bool(heads) and _db_revisions(db_path()) == set(heads)
+
+
+def _write_head_cache(cfg: Config) -> None:
+    from alembic.script import ScriptDirectory  # noqa: PLC0415
+
+    payload = {
+        "signature": _versions_signature(alembic_dir() / "versions"),
+        "heads": sorted(ScriptDirectory.from_config(cfg).get_heads()),
+    }
+    path = head_cache_path()
+    tmp = path.with_name(path.name + ".tmp")
+    # кэш — только ускорение: не записали, значит в следующий раз пойдём через Alembic
+    with contextlib.suppress(OSError):
+        tmp.write_text(json.dumps(payload), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+def upgrade_to_head() -> bool:
+    """
+    Ensure the local DB schema is at the latest Alembic head.
+    Safe to call on every app start. Returns True if Alembic actually ran.
+    """
+    if schema_is_current():
+        return False
+
+    from alembic import command  # noqa: PLC0415
 
-    # Запускаем апгрейд
+    cfg = alembic_config()
     command.upgrade(cfg, "head")
+    _write_head_cache(cfg)
+    return True
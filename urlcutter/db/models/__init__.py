@@ -10,4 +10,5 @@ class Base(DeclarativeBase):
 
 
 # export models
+from .counter import CodeCounter  # noqa: E402,F401
 from .link import Link  # noqa: E402,F401
@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+from sqlalchemy import Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import Base
+
+
+class CodeCounter(Base):
+    """Named monotonic counter; the local shortener takes codes from it in blocks."""
+
+    __tablename__ = "code_counters"
+
+    name: Mapped[str] = mapped_column(String(32), primary_key=True)
+    next_value: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
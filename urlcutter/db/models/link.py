@@ -2,9 +2,11 @@ from __future__ import annotations
 
 from datetime import datetime
 
-from sqlalchemy import DateTime, Index, Integer, String
+from sqlalchemy import DateTime, Index, Integer, String, event
 from sqlalchemy.orm import Mapped, mapped_column
 
+from urlcutter.db.fts import after_links_create
+
 from . import Base
 
 
@@ -17,10 +19,19 @@ class Link(Base):
     service: Mapped[str] = mapped_column(String(64), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
     copy_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # SHA-1 hex of normalize_url(long_url); NULL for rows the URL cannot be normalized for
+    long_url_fp: Mapped[str | None] = mapped_column(String(40), nullable=True)
+    # base62-код встроенного сокращателя (service="local"); у ссылок внешних сервисов — NULL
+    short_code: Mapped[str | None] = mapped_column(String(16), nullable=True)
 
     __table_args__ = (
         Index("ix_links_created_at", "created_at"),
         Index("ix_links_service", "service"),
-        Index("ix_links_long_like", "long_url"),
         Index("ix_links_short_like", "short_url"),
+        Index("ix_links_long_url_fp", "long_url_fp"),
+        Index("ux_links_short_code", "short_code", unique=True),
     )
+
+
+# create_all() (тесты, новая БД без Alembic) сразу строит и FTS-индекс
+event.listen(Link.__table__, "after_create", after_links_create)
@@ -2,5 +2,11 @@
 
 __all__ = ["history_service"]
 
-# optionally expose concrete implementation
-from .history_sql import SqlAlchemyHistoryService  # noqa: F401
+
+def __getattr__(name: str):
+    # optionally expose concrete implementation (лениво: history_sql тянет SQLAlchemy)
+    if name == "SqlAlchemyHistoryService":
+        from .history_sql import SqlAlchemyHistoryService
+
+        return SqlAlchemyHistoryService
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
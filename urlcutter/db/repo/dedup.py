@@ -0,0 +1,76 @@
+"""Lookup-before-shorten cache: reuse an existing short link for an already seen long URL."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+
+from urlcutter.db.repo.history_service import HistoryService
+from urlcutter.db.repo.schemas import LinkRecord
+from urlcutter.normalization import _url_fingerprint
+
+DEFAULT_CACHE_SIZE = 1024
+
+
+class ShortLinkCache:
+    """
+    Fingerprint → LinkRecord lookup in two tiers:
+      1) in-memory LRU (no I/O),
+      2) the history DB via `HistoryService.find_by_fingerprint` (indexed column).
+
+    Keys are `_url_fingerprint(long_url)`, so URLs that differ only in what
+    `normalize_url` strips (case of host, default port, query order, fragment) share a link.
+    """
+
+    def __init__(self, history: HistoryService | None = None, maxsize: int = DEFAULT_CACHE_SIZE):
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        self.history = history
+        self.maxsize = maxsize
+        self._items: OrderedDict[str, LinkRecord] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def lookup(self, long_url: str, exclude_service: str | None = None) -> LinkRecord | None:
+        """
+        Return a stored record for `long_url` or None. Invalid URLs are a miss.
+        A cached record of `exclude_service` is ignored and the DB is asked for another one.
+        """
+        try:
+            fp = _url_fingerprint(long_url)
+        except ValueError:
+            return None
+
+        with self._lock:
+            rec = self._items.get(fp)
+            if rec is not None and (exclude_service is None or rec.service != exclude_service):
+                self._items.move_to_end(fp)
+                return rec
+
+        if self.history is None:
+            return None
+        rec = self.history.find_by_fingerprint(fp, exclude_service)
+        if rec is not None:
+            self._put(fp, rec)
+        return rec
+
+    def remember(self, long_url: str, record: LinkRecord) -> None:
+        """Put a freshly stored record into the LRU (the DB row is already there)."""
+        try:
+            fp = _url_fingerprint(long_url)
+        except ValueError:
+            return
+        self._put(fp, record)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def _put(self, fp: str, record: LinkRecord) -> None:
+        with self._lock:
+            self._items[fp] = record
+            self._items.move_to_end(fp)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
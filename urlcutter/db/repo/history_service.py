@@ -2,9 +2,16 @@
 
 from __future__ import annotations
 
+import os
 from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+from typing import BinaryIO
 
+from urlcutter.normalization import _url_fingerprint
+
+from .errors import ExportError, ValidationError
 from .schemas import (
+    CursorSpec,
     ExportSpec,
     HistoryFilters,
     HistoryPage,
@@ -26,7 +33,7 @@ class HistoryService(ABC):
     """
 
     @abstractmethod
-    def list(self, filters: HistoryFilters, sort: SortSpec, page: PageSpec) -> HistoryPage:
+    def list(self, filters: HistoryFilters, sort: SortSpec, page: PageSpec | CursorSpec) -> HistoryPage:
         """Return a paginated result according to filters and sort order."""
         raise NotImplementedError
 
@@ -38,6 +45,34 @@ class HistoryService(ABC):
         """
         raise NotImplementedError
 
+    def add_many(self, records: Iterable[LinkRecord], batch_size: int = 500) -> list[LinkRecord]:
+        """
+        Persist many records and return the stored versions in input order.
+        Each batch of `batch_size` records is one transaction; a failing batch leaves earlier ones committed.
+        Default: one add() per record.
+        """
+        return [self.add(r) for r in records]
+
+    def find_by_fingerprint(self, fingerprint: str, exclude_service: str | None = None) -> LinkRecord | None:
+        """
+        Return the newest record whose normalized long URL has this fingerprint, or None.
+        Records of `exclude_service` (e.g. machine-local links) are skipped.
+        Used to reuse an existing short link instead of calling the provider again.
+        """
+        raise NotImplementedError
+
+    def find_by_long_url(self, long_url: str) -> LinkRecord | None:
+        """
+        Equality lookup by long URL (after normalize_url), done as a fixed-width probe
+        on the fingerprint index instead of comparing 2048-char strings.
+        May raise ValidationError for URLs that cannot be normalized.
+        """
+        try:
+            fp = _url_fingerprint(long_url)
+        except ValueError as e:
+            raise ValidationError(str(e)) from e
+        return self.find_by_fingerprint(fp)
+
     @abstractmethod
     def increment_copy_count(self, id: int) -> None:
         """Increase copy_count for the given record id by 1."""
@@ -53,6 +88,34 @@ class HistoryService(ABC):
         """Produce CSV bytes for the current selection (filters + sort)."""
         raise NotImplementedError
 
+    def export_csv_iter(self, spec: ExportSpec) -> Iterator[bytes]:
+        """
+        Yield the same CSV as export_csv() in chunks, header first.
+        Default: one chunk; storage-backed implementations stream rows in batches.
+        """
+        yield self.export_csv(spec)
+
+    def export_csv_to(self, target: str | os.PathLike | BinaryIO, spec: ExportSpec) -> int:
+        """
+        Write the CSV to a file path or a binary file object chunk by chunk.
+        Returns the number of bytes written. May raise ValidationError, StorageError or ExportError.
+        """
+        if isinstance(target, str | os.PathLike):
+            try:
+                with open(target, "wb") as f:
+                    return self.export_csv_to(f, spec)
+            except OSError as e:
+                raise ExportError(str(e)) from e
+
+        written = 0
+        try:
+            for chunk in self.export_csv_iter(spec):
+                target.write(chunk)
+                written += len(chunk)
+        except OSError as e:
+            raise ExportError(str(e)) from e
+        return written
+
     @abstractmethod
     def distinct_services(self) -> list[str]:
         """Return unique service identifiers available in storage."""
@@ -2,18 +2,26 @@
 
 from __future__ import annotations
 
+import base64
+import binascii
 import csv
+import dataclasses
 import io
+import threading
+import time as _time
+from collections.abc import Iterable, Iterator
 from datetime import UTC, datetime, time
 
-from sqlalchemy import func, or_, select
+from sqlalchemy import func, insert, or_, select, tuple_
 from sqlalchemy.exc import SQLAlchemyError
 
 from urlcutter.db.engine import get_session
+from urlcutter.db.fts import FTS_MIN_QUERY_LEN, fts_phrase, fts_present, links_fts
 from urlcutter.db.models import Link
 from urlcutter.db.repo.errors import ExportError, NotFoundError, StorageError, ValidationError
 from urlcutter.db.repo.history_service import HistoryService
 from urlcutter.db.repo.schemas import (
+    CursorSpec,
     ExportSpec,
     HistoryFilters,
     HistoryPage,
@@ -21,6 +29,7 @@ from urlcutter.db.repo.schemas import (
     PageSpec,
     SortSpec,
 )
+from urlcutter.normalization import _url_fingerprint
 
 
 def _utc_boundaries_from_local_dates(date_from_local, date_to_local) -> tuple[datetime | None, datetime | None]:
@@ -36,6 +45,53 @@ def _utc_boundaries_from_local_dates(date_from_local, date_to_local) -> tuple[da
     return start_utc, end_utc
 
 
+def _fingerprint_or_none(long_url: str) -> str | None:
+    """Отпечаток для дедупликации; для URL, которые не нормализуются, — None."""
+    try:
+        return _url_fingerprint(long_url)
+    except ValueError:
+        return None
+
+
+# Сколько живёт закэшированный total для CursorSpec(total="cached"), сек.
+# Записи через этот же сервис сбрасывают кэш сразу; TTL страхует от записей извне.
+COUNT_CACHE_TTL_SEC = 30.0
+
+
+def _encode_cursor(created_at: datetime, id: int) -> str:
+    """(created_at, id) -> непрозрачный url-safe токен."""
+    raw = f"{created_at.isoformat()}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(token: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode("utf-8")
+        ts, _, id_s = raw.rpartition("|")
+        return datetime.fromisoformat(ts), int(id_s)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValidationError(f"Invalid cursor: {token!r}") from e
+
+
+def _to_record(r: Link) -> LinkRecord:
+    return LinkRecord(
+        id=r.id,
+        long_url=r.long_url or "",
+        short_url=r.short_url or "",
+        service=r.service or "",
+        created_at_utc=r.created_at,
+        copy_count=r.copy_count or 0,
+    )
+
+
+# add_many: строк на одну транзакцию (один INSERT ... RETURNING на пачку)
+DEFAULT_ADD_BATCH = 500
+
+# Экспорт: строк на одну пачку курсора (yield_per) и на один отданный chunk CSV
+EXPORT_YIELD_PER = 1000
+EXPORT_HEADER = ("created_at_utc", "service", "long_url", "short_url", "copy_count")
+
+
 def _sanitize_csv_value(v: str) -> str:
     """Защита от CSV-инъекций."""
     if not v:
@@ -57,9 +113,15 @@ class SqlAlchemyHistoryService(HistoryService):
         "copy_count": Link.copy_count,
     }
 
+    def __init__(self) -> None:
+        # кэш count() для keyset-пагинации: ключ фильтров -> (поколение записей, total, момент)
+        self._count_lock = threading.Lock()
+        self._count_cache: dict[tuple, tuple[int, int, float]] = {}
+        self._write_gen = 0
+
     # ---------- helpers ----------
 
-    def _apply_filters(self, stmt, filters: HistoryFilters):
+    def _apply_filters(self, stmt, filters: HistoryFilters, session=None):
         if filters is None:
             return stmt
 
@@ -76,13 +138,114 @@ class SqlAlchemyHistoryService(HistoryService):
 
         # query (CI substring in long OR short)
         if filters.query:
-            q = f"%{filters.query.lower()}%"
-            stmt = stmt.where(or_(func.lower(Link.long_url).like(q), func.lower(Link.short_url).like(q)))
+            if self._use_fts(filters, session):
+                matched = select(links_fts.c.rowid).where(links_fts.c.links_fts.op("MATCH")(fts_phrase(filters.query)))
+                stmt = stmt.where(Link.id.in_(matched))
+            else:
+                q = f"%{filters.query.lower()}%"
+                stmt = stmt.where(or_(func.lower(Link.long_url).like(q), func.lower(Link.short_url).like(q)))
         return stmt
 
+    def _bump_write_gen(self) -> None:
+        with self._count_lock:
+            self._write_gen += 1
+            self._count_cache.clear()
+
+    def _count(self, s, base, filters: HistoryFilters, mode: str) -> int:
+        if mode == "skip":
+            return -1
+        key = dataclasses.astuple(filters) if filters is not None else ()
+        now = _time.monotonic()
+        if mode == "cached":
+            with self._count_lock:
+                hit = self._count_cache.get(key)
+                gen = self._write_gen
+            if hit is not None and hit[0] == gen and now - hit[2] < COUNT_CACHE_TTL_SEC:
+                return hit[1]
+        else:
+            with self._count_lock:
+                gen = self._write_gen
+        total = s.execute(select(func.count()).select_from(base.subquery())).scalar_one()
+        with self._count_lock:
+            self._count_cache[key] = (gen, total, now)
+        return total
+
+    def _list_keyset(self, filters: HistoryFilters, sort: SortSpec, page: CursorSpec) -> HistoryPage:
+        """
+        Keyset-пагинация по (created_at, id): WHERE (created_at, id) < :token ORDER BY ... LIMIT n+1.
+
+        Идёт по ix_links_created_at (rowid в SQLite-индексе неявно), поэтому стоимость страницы
+        не зависит от её «глубины». Назад — тот же запрос с обратным сравнением и порядком.
+        """
+        if page.page_size <= 0:
+            raise ValidationError("Invalid page_size")
+        if page.after and page.before:
+            raise ValidationError("Only one of after/before may be set")
+        if self._SORT_MAP.get(sort.field) is not Link.created_at:
+            raise ValidationError(f"Keyset paging supports created_at sort only, got: {sort.field}")
+
+        desc = sort.direction == "desc"
+        backwards = page.before is not None
+        token = page.before if backwards else page.after
+        # в каком направлении читаем индекс: назад по desc-списку == вперёд по возрастанию
+        scan_desc = desc != backwards
+        key = tuple_(Link.created_at, Link.id)
+
+        try:
+            with get_session() as s:
+                base = self._apply_filters(select(Link), filters, s)
+                total = self._count(s, base, filters, page.total)
+
+                stmt = base
+                if token is not None:
+                    created_at, id_ = _decode_cursor(token)
+                    bound = tuple_(created_at, id_)
+                    stmt = stmt.where(key < bound if scan_desc else key > bound)
+                if scan_desc:
+                    stmt = stmt.order_by(Link.created_at.desc(), Link.id.desc())
+                else:
+                    stmt = stmt.order_by(Link.created_at.asc(), Link.id.asc())
+                rows = s.execute(stmt.limit(page.page_size + 1)).scalars().all()
+
+                more = len(rows) > page.page_size
+                items = [_to_record(r) for r in rows[: page.page_size]]
+        except SQLAlchemyError as e:
+            raise StorageError(str(e)) from e
+
+        if backwards:
+            items.reverse()
+            has_prev, has_next = more, True
+        else:
+            has_prev, has_next = token is not None, more
+
+        def _cur(rec: LinkRecord) -> str:
+            return _encode_cursor(rec.created_at_utc, rec.id)
+
+        return HistoryPage(
+            items=items,
+            total=total,
+            page=0,
+            page_size=page.page_size,
+            has_prev=has_prev and bool(items),
+            has_next=has_next and bool(items),
+            next_cursor=_cur(items[-1]) if has_next and items else None,
+            prev_cursor=_cur(items[0]) if has_prev and items else None,
+        )
+
+    @staticmethod
+    def _use_fts(filters: HistoryFilters, session) -> bool:
+        """FTS only when asked for, the query has a trigram, and the index exists in this DB."""
+        if getattr(filters, "search_mode", "substring") != "fts" or session is None:
+            return False
+        if len(filters.query) < FTS_MIN_QUERY_LEN:
+            return False
+        return fts_present(session.connection())
+
     # ---------- interface ----------
 
-    def list(self, filters: HistoryFilters, sort: SortSpec, page: PageSpec) -> HistoryPage:
+    def list(self, filters: HistoryFilters, sort: SortSpec, page: PageSpec | CursorSpec) -> HistoryPage:
+        if isinstance(page, CursorSpec):
+            return self._list_keyset(filters, sort, page)
         if page.page < 1 or page.page_size <= 0:
             raise ValidationError("Invalid page or page_size")
 
@@ -97,7 +260,7 @@ class SqlAlchemyHistoryService(HistoryService):
                 s.expire_on_commit = False
 
                 base = select(Link)
-                base = self._apply_filters(base, filters)
+                base = self._apply_filters(base, filters, s)
 
                 total = s.execute(select(func.count()).select_from(base.subquery())).scalar_one()
 
@@ -105,17 +268,7 @@ class SqlAlchemyHistoryService(HistoryService):
                 rows = s.execute(stmt).scalars().all()
 
                 # СБОР ДАННЫХ ВНУТРИ СЕССИИ
-                items = [
-                    LinkRecord(
-                        id=r.id,
-                        long_url=r.long_url or "",
-                        short_url=r.short_url or "",
-                        service=r.service or "",
-                        created_at_utc=r.created_at,
-                        copy_count=r.copy_count or 0,
-                    )
-                    for r in rows
-                ]
+                items = [_to_record(r) for r in rows]
 
             has_prev = page.page > 1
             has_next = (page.page * page.page_size) < total
@@ -133,14 +286,14 @@ class SqlAlchemyHistoryService(HistoryService):
             with get_session() as s:
                 obj = Link(
                     long_url=record.long_url,
+                    long_url_fp=_fingerprint_or_none(record.long_url),
                     short_url=record.short_url,
                     service=record.service,
                     # created_at по умолчанию в модели
                     copy_count=record.copy_count or 0,
                 )
                 s.add(obj)
-                s.flush()  # получаем id и created_at
-                s.commit()  # << вот этого раньше не было
+                s.flush()  # получаем id и created_at; коммит делает get_session на выходе
                 stored = LinkRecord(
                     id=obj.id,
                     long_url=obj.long_url,
@@ -149,7 +302,77 @@ class SqlAlchemyHistoryService(HistoryService):
                     created_at_utc=obj.created_at,
                     copy_count=obj.copy_count,
                 )
-                return stored
+            self._bump_write_gen()
+            return stored
+        except SQLAlchemyError as e:
+            raise StorageError(str(e)) from e
+
+    def add_many(self, records: Iterable[LinkRecord], batch_size: int = DEFAULT_ADD_BATCH) -> list[LinkRecord]:
+        if batch_size <= 0:
+            raise ValidationError("batch_size must be positive")
+
+        stored: list[LinkRecord] = []
+        batch: list[LinkRecord] = []
+        for rec in records:
+            if not rec.long_url or not rec.short_url or not rec.service:
+                raise ValidationError("long_url, short_url, service are required")
+            batch.append(rec)
+            if len(batch) >= batch_size:
+                stored += self._insert_batch(batch)
+                batch = []
+        if batch:
+            stored += self._insert_batch(batch)
+        return stored
+
+    def _insert_batch(self, batch: list[LinkRecord]) -> list[LinkRecord]:
+        """Одна транзакция: executemany INSERT ... RETURNING id, created_at (порядок = порядок batch)."""
+        now = datetime.now(UTC).replace(tzinfo=None)
+        params = [
+            {
+                "long_url": r.long_url,
+                "long_url_fp": _fingerprint_or_none(r.long_url),
+                "short_url": r.short_url,
+                "service": r.service,
+                # импорт сохраняет исходное время; в БД — наивный UTC
+                "created_at": (
+                    r.created_at_utc.astimezone(UTC).replace(tzinfo=None)
+                    if r.created_at_utc and r.created_at_utc.tzinfo
+                    else (r.created_at_utc or now)
+                ),
+                "copy_count": r.copy_count or 0,
+            }
+            for r in batch
+        ]
+        stmt = insert(Link).returning(Link.id, Link.created_at, sort_by_parameter_order=True)
+        try:
+            with get_session() as s:
+                rows = s.connection().execute(stmt, params).all()
+        except SQLAlchemyError as e:
+            raise StorageError(str(e)) from e
+        self._bump_write_gen()
+        return [
+            LinkRecord(
+                id=id_,
+                long_url=p["long_url"],
+                short_url=p["short_url"],
+                service=p["service"],
+                created_at_utc=created_at,
+                copy_count=p["copy_count"],
+            )
+            for (id_, created_at), p in zip(rows, params, strict=True)
+        ]
+
+    def find_by_fingerprint(self, fingerprint: str, exclude_service: str | None = None) -> LinkRecord | None:
+        if not fingerprint:
+            raise ValidationError("fingerprint is required")
+        try:
+            with get_session() as s:
+                stmt = select(Link).where(Link.long_url_fp == fingerprint)
+                if exclude_service is not None:
+                    stmt = stmt.where(Link.service != exclude_service)
+                stmt = stmt.order_by(Link.id.desc()).limit(1)
+                r = s.execute(stmt).scalars().first()
+                return None if r is None else _to_record(r)
         except SQLAlchemyError as e:
             raise StorageError(str(e)) from e
 
@@ -176,47 +399,63 @@ class SqlAlchemyHistoryService(HistoryService):
                     return False
                 s.delete(obj)
                 s.commit()  # ← этот commit оставляем
-                return True
+            self._bump_write_gen()
+            return True
         except SQLAlchemyError as e:
             raise StorageError(str(e)) from e
 
     def export_csv(self, spec: ExportSpec) -> bytes:
-        # выгружаем всю выборку по фильтрам/сортировке
+        # вся выборка одним куском — для маленьких историй; большие пишем через export_csv_to
+        return b"".join(self.export_csv_iter(spec))
+
+    def export_csv_iter(self, spec: ExportSpec) -> Iterator[bytes]:
+        # сорт проверяем сразу, а не на первом next()
         order_col = self._SORT_MAP.get(spec.sort.field)
         if order_col is None:
             raise ValidationError(f"Unknown sort field: {spec.sort.field}")
         order_expr = order_col.desc() if spec.sort.direction == "desc" else order_col.asc()
+        return self._iter_csv_chunks(spec.filters, order_expr)
 
-        try:
-            with get_session() as s:
-                base = select(Link)
-                base = self._apply_filters(base, spec.filters)
-                stmt = base.order_by(order_expr)
-                rows: list[Link] = s.execute(stmt).scalars().all()
-        except SQLAlchemyError as e:
-            raise StorageError(str(e)) from e
-
+    def _iter_csv_chunks(self, filters: HistoryFilters, order_expr) -> Iterator[bytes]:
+        """Голые кортежи колонок пачками по EXPORT_YIELD_PER: в памяти одна пачка, без ORM-объектов."""
         buf = io.StringIO(newline="")
         writer = csv.writer(buf, delimiter=",", quoting=csv.QUOTE_MINIMAL)
 
+        def take() -> bytes:
+            try:
+                chunk = buf.getvalue().encode("utf-8")
+            except Exception as e:  # noqa: BLE001
+                raise ExportError(str(e)) from e
+            buf.seek(0)
+            buf.truncate()
+            return chunk
+
         # заголовки
-        writer.writerow(["created_at_utc", "service", "long_url", "short_url", "copy_count"])
-
-        for r in rows:
-            writer.writerow(
-                [
-                    (r.created_at or datetime.now(UTC).replace(tzinfo=None)).replace(microsecond=0).isoformat() + "Z",
-                    _sanitize_csv_value(r.service),
-                    _sanitize_csv_value(r.long_url),
-                    _sanitize_csv_value(r.short_url),
-                    r.copy_count,
-                ]
-            )
+        writer.writerow(EXPORT_HEADER)
+        yield take()
 
         try:
-            return buf.getvalue().encode("utf-8")
-        except Exception as e:  # noqa: BLE001
-            raise ExportError(str(e)) from e
+            with get_session() as s:
+                stmt = select(Link.created_at, Link.service, Link.long_url, Link.short_url, Link.copy_count)
+                stmt = self._apply_filters(stmt, filters, s).order_by(order_expr)
+                result = s.execute(stmt.execution_options(yield_per=EXPORT_YIELD_PER))
+                for part in result.partitions():
+                    for created_at, service, long_url, short_url, copy_count in part:
+                        writer.writerow(
+                            [
+                                (created_at or datetime.now(UTC).replace(tzinfo=None))
+                                .replace(microsecond=0)
+                                .isoformat()
+                                + "Z",
+                                _sanitize_csv_value(service),
+                                _sanitize_csv_value(long_url),
+                                _sanitize_csv_value(short_url),
+                                copy_count,
+                            ]
+                        )
+                    yield take()
+        except SQLAlchemyError as e:
+            raise StorageError(str(e)) from e
 
     def distinct_services(self) -> list[str]:
         try:
@@ -0,0 +1,209 @@
+"""Local shortening engine: base62 codes from a block-allocated counter, stored in `links`.
+
+Коды берутся из счётчика `code_counters` блоками по `block_size`: одна запись в БД на блок,
+дальше — инкремент в памяти. Блок выдаётся атомарным UPDATE, так что два процесса на одной
+БД не получат одинаковых номеров; уникальный индекс `ux_links_short_code` — последняя страховка.
+Недоиспользованный хвост блока при выходе просто теряется (коды не обязаны идти подряд).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from urlcutter.db.engine import get_session
+from urlcutter.db.models import CodeCounter, Link
+from urlcutter.db.repo.errors import StorageError
+from urlcutter.db.repo.schemas import LinkRecord
+from urlcutter.normalization import _url_fingerprint
+
+LOCAL_SERVICE = "local"
+LOCAL_BASE_URL_ENV = "URLCUTTER_LOCAL_BASE_URL"
+DEFAULT_LOCAL_BASE_URL = "http://127.0.0.1:8080"  # адрес `python -m urlcutter.serve` по умолчанию
+LOCAL_BLOCK_SIZE = 100  # номеров за одно обращение к code_counters
+LOCAL_COUNTER = "links"
+MAX_CODE_LEN = 16  # = длина колонки links.short_code
+_INSERT_ATTEMPTS = 5  # код уже занят (ручная вставка, чужой счётчик) — берём следующий
+
+BASE62_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_BASE62_INDEX = {ch: i for i, ch in enumerate(BASE62_ALPHABET)}
+
+
+def encode_base62(n: int) -> str:
+    """Non-negative int -> base62 string (0 -> "0")."""
+    if n < 0:
+        raise ValueError("base62 encodes non-negative integers only")
+    if n == 0:
+        return BASE62_ALPHABET[0]
+    out = []
+    while n:
+        n, r = divmod(n, 62)
+        out.append(BASE62_ALPHABET[r])
+    return "".join(reversed(out))
+
+
+def decode_base62(code: str) -> int:
+    """Inverse of encode_base62. ValueError on an empty string or a foreign character."""
+    if not code:
+        raise ValueError("empty code")
+    n = 0
+    for ch in code:
+        try:
+            n = n * 62 + _BASE62_INDEX[ch]
+        except KeyError:
+            raise ValueError(f"not a base62 code: {code!r}") from None
+    return n
+
+
+def is_local_code(code: str) -> bool:
+    """Cheap shape check before touching the DB (the redirect server uses it for junk paths)."""
+    return 0 < len(code) <= MAX_CODE_LEN and all(ch in _BASE62_INDEX for ch in code)
+
+
+def local_base_url(env: dict[str, str] | None = None) -> str:
+    """Base of local short links from URLCUTTER_LOCAL_BASE_URL, without a trailing slash."""
+    raw = (env if env is not None else os.environ).get(LOCAL_BASE_URL_ENV, "").strip() or DEFAULT_LOCAL_BASE_URL
+    if not raw.startswith(("http://", "https://")):
+        raise ValueError(f"{LOCAL_BASE_URL_ENV} must be an http(s) URL, got {raw!r}")
+    return raw.rstrip("/")
+
+
+class LocalCodeStore:
+    """
+    Offline shortener over the history DB.
+
+      shorten(long_url) -> LinkRecord  — existing local link for the same URL or a new code
+      resolve(code)     -> long_url | None
+
+    Thread-safe; one instance per process is enough (see shorteners.LocalProvider).
+    """
+
+    def __init__(
+        self,
+        base_url: str | None = None,
+        *,
+        block_size: int = LOCAL_BLOCK_SIZE,
+        counter: str = LOCAL_COUNTER,
+    ) -> None:
+        if block_size < 1:
+            raise ValueError("block_size must be >= 1")
+        self.base_url = (base_url or local_base_url()).rstrip("/")
+        self.block_size = block_size
+        self.counter = counter
+        self._next = 0
+        self._end = 0  # [_next, _end) — ещё не выданные номера текущего блока
+        self._lock = threading.Lock()
+        # поиск существующей ссылки и вставка новой — одна критическая секция, иначе два параллельных
+        # вызова на один URL (batch, hedging) получат два разных кода
+        self._shorten_lock = threading.Lock()
+
+    def short_url(self, code: str) -> str:
+        return f"{self.base_url}/{code}"
+
+    def _allocate_block(self) -> int:
+        """Reserve `block_size` numbers in code_counters; returns the first one."""
+        for _ in range(2):
+            with get_session() as s:
+                stmt = (
+                    update(CodeCounter)
+                    .where(CodeCounter.name == self.counter)
+                    .values(next_value=CodeCounter.next_value + self.block_size)
+                    .returning(CodeCounter.next_value)
+                )
+                end = s.execute(stmt).scalar()
+                if end is not None:
+                    return end - self.block_size
+                try:
+                    # первый блок: счётчика ещё нет (начинаем с 1, код "0" не выдаём)
+                    s.execute(insert(CodeCounter).values(name=self.counter, next_value=1 + self.block_size))
+                    return 1
+                except IntegrityError:
+                    s.rollback()  # параллельный процесс успел создать счётчик — повторяем UPDATE
+        raise StorageError(f"could not allocate a block from counter {self.counter!r}")
+
+    def next_code(self) -> str:
+        with self._lock:
+            if self._next >= self._end:
+                self._next = self._allocate_block()
+                self._end = self._next + self.block_size
+            n = self._next
+            self._next += 1
+        return encode_base62(n)
+
+    def _existing(self, fp: str) -> LinkRecord | None:
+        with get_session() as s:
+            stmt = (
+                select(Link)
+                .where(Link.long_url_fp == fp, Link.service == LOCAL_SERVICE, Link.short_code.is_not(None))
+                .order_by(Link.id.desc())
+                .limit(1)
+            )
+            r = s.execute(stmt).scalars().first()
+            return None if r is None else _record(r)
+
+    def shorten(self, long_url: str) -> LinkRecord:
+        """Local short link for `long_url`; ValueError for a URL that cannot be normalized."""
+        fp = _url_fingerprint(long_url)  # ValueError на мусоре — как у внешних провайдеров
+        with self._shorten_lock:
+            return self._shorten_locked(long_url, fp)
+
+    def _shorten_locked(self, long_url: str, fp: str) -> LinkRecord:
+        try:
+            found = self._existing(fp)
+            if found is not None:
+                return found
+            for _ in range(_INSERT_ATTEMPTS):
+                code = self.next_code()
+                with get_session() as s:
+                    obj = Link(
+                        long_url=long_url,
+                        long_url_fp=fp,
+                        short_url=self.short_url(code),
+                        short_code=code,
+                        service=LOCAL_SERVICE,
+                        copy_count=0,
+                    )
+                    s.add(obj)
+                    try:
+                        s.flush()
+                    except IntegrityError:
+                        s.rollback()  # код занят — берём следующий номер
+                        continue
+                    return _record(obj)
+        except SQLAlchemyError as e:
+            raise StorageError(str(e)) from e
+        raise StorageError(f"no free local code after {_INSERT_ATTEMPTS} attempts")
+
+    def resolve(self, code: str) -> str | None:
+        """Long URL for a local code or None (unknown / malformed code)."""
+        if not is_local_code(code):
+            return None
+        try:
+            with get_session() as s:
+                return s.execute(select(Link.long_url).where(Link.short_code == code)).scalar()
+        except SQLAlchemyError as e:
+            raise StorageError(str(e)) from e
+
+
+def _record(r: Link) -> LinkRecord:
+    return LinkRecord(
+        id=r.id,
+        long_url=r.long_url,
+        short_url=r.short_url,
+        service=r.service,
+        created_at_utc=r.created_at,
+        copy_count=r.copy_count,
+    )
+
+
+__all__ = [
+    "LOCAL_SERVICE",
+    "LocalCodeStore",
+    "decode_base62",
+    "encode_base62",
+    "is_local_code",
+    "local_base_url",
+]
@@ -13,6 +13,8 @@ PAGE_SIZE_CHOICES = (10, 25, 50, 100)
 SortField = Literal["created_at", "service", "long_url", "short_url", "copy_count"]
 SortDirection = Literal["asc", "desc"]
 LocaleCode = Literal["ru", "en"]
+SearchMode = Literal["substring", "fts"]
+TotalMode = Literal["exact", "cached", "skip"]
 
 
 @dataclass(slots=True)
@@ -39,6 +41,7 @@ class HistoryFilters:
     date_from_local: date | None = None  # inclusive, user's local date
     date_to_local: date | None = None  # inclusive, user's local date
     service: str | None = None  # None or "ALL" => no filter
+    search_mode: SearchMode = "substring"  # "fts" => trigram index (falls back to LIKE if unavailable)
 
 
 @dataclass(slots=True)
@@ -53,14 +56,31 @@ class PageSpec:
     page_size: int = DEFAULT_PAGE_SIZE  # should be one of PAGE_SIZE_CHOICES
 
 
+@dataclass(slots=True)
+class CursorSpec:
+    """
+    Keyset page: seek from a `(created_at, id)` token instead of OFFSET.
+
+    At most one of `after` / `before` is set; both None => first page.
+    Tokens are opaque strings taken from HistoryPage.next_cursor / prev_cursor.
+    """
+
+    after: str | None = None  # next page: rows strictly after this token
+    before: str | None = None  # previous page: rows strictly before this token
+    page_size: int = DEFAULT_PAGE_SIZE
+    total: TotalMode = "cached"  # "skip" => HistoryPage.total == -1 (not counted)
+
+
 @dataclass(slots=True)
 class HistoryPage:
     items: list[LinkRecord]
     total: int
-    page: int
+    page: int  # 0 for keyset (CursorSpec) pages
     page_size: int
     has_prev: bool
     has_next: bool
+    next_cursor: str | None = None  # keyset only
+    prev_cursor: str | None = None  # keyset only
 
 
 @dataclass(slots=True)
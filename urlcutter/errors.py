@@ -0,0 +1,41 @@
+"""Typed exceptions for shortening providers (no logic).
+
+All of them subclass RuntimeError, so code that caught RuntimeError from
+`shorten_via_tinyurl_core` keeps working.
+"""
+
+from __future__ import annotations
+
+
+class ProviderError(RuntimeError):
+    """Provider call failed; not worth retrying unless a subclass says so."""
+
+    retryable = False
+
+    def __init__(self, message: str, *, provider: str = "tinyurl", status: int | None = None) -> None:
+        super().__init__(message)
+        self.provider = provider
+        self.status = status
+
+
+class RateLimitedError(ProviderError):
+    """Provider answered 429; `retry_after` (seconds) comes from the Retry-After header, if any."""
+
+    retryable = True
+
+    def __init__(
+        self,
+        message: str,
+        *,
+        provider: str = "tinyurl",
+        status: int | None = 429,
+        retry_after: float | None = None,
+    ) -> None:
+        super().__init__(message, provider=provider, status=status)
+        self.retry_after = retry_after
+
+
+class ProviderUnavailableError(ProviderError):
+    """Provider is down or unreachable (5xx, connection errors)."""
+
+    retryable = True
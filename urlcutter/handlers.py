@@ -3,24 +3,76 @@ import logging
 import webbrowser
 from concurrent.futures import TimeoutError as FutTimeout
 from datetime import UTC, datetime
+from functools import cached_property
 from urllib.parse import urlparse
 
 import flet as ft
-import pyperclip
-import validators
 
 from urlcutter import CLIENT_RPM_LIMIT, AppState, _url_fingerprint
-from urlcutter.db.repo.history_sql import SqlAlchemyHistoryService
-from urlcutter.db.repo.schemas import HistoryFilters, LinkRecord, PageSpec, SortSpec  # + эти двое новые
-from urlcutter.protection import internet_ok
+from urlcutter._lazy import lazy_import
+from urlcutter.db.repo.dedup import ShortLinkCache
+from urlcutter.db.repo.schemas import LinkRecord
+from urlcutter.errors import ProviderUnavailableError, RateLimitedError
+from urlcutter.protection import default_probe, internet_ok
+from urlcutter.retry import RetryPolicy, retry_call
+from urlcutter.shorteners import (
+    FunctionProvider,
+    LocalProvider,
+    Provider,
+    ProviderRouter,
+    hedge_percentile_from_env,
+    providers_from_env,
+)
 from urlcutter.shorteners import shorten_via_tinyurl_core as shorten_via_tinyurl
 from urlcutter.ui_builders import titlebar_set_back, titlebar_set_main
 
+from .ui.history.data_source import HistoryDataSource
 from .ui.history.view import make_history_screen
 
+# исполняются при первом обращении (копирование / валидация), а не на старте окна
+pyperclip = lazy_import("pyperclip")
+validators = lazy_import("validators")
+
 REQUEST_TIMEOUT = 8.0
 RETRIES = 1
 DEFAULT_HTTP_TIMEOUT = 5
+SHORTEN_DEADLINE_SEC = 15.0  # общий бюджет одного нажатия «Shorten», включая паузы между попытками
+
+# Повторы с экспоненциальной паузой и джиттером; 429 ждёт Retry-After, а не долбит сервис сразу
+SHORTEN_RETRY_POLICY = RetryPolicy(
+    attempts=1 + RETRIES,
+    base_delay=0.5,
+    max_delay=4.0,
+    attempt_timeout=REQUEST_TIMEOUT,
+    deadline=SHORTEN_DEADLINE_SEC,
+)
+
+
+def _error_kind(e: BaseException) -> str:
+    """Причина неудачи для тоста и логов: timeout / rate / unavailable / unknown."""
+    if isinstance(e, FutTimeout | TimeoutError):
+        return "timeout"
+    if isinstance(e, RateLimitedError):
+        return "rate"
+    if isinstance(e, ProviderUnavailableError):
+        return "unavailable"
+    # нетипизированные ошибки (pyshorteners и пр.) — по тексту, как раньше
+    msg = str(e)
+    if "429" in msg or "Too Many Requests" in msg:
+        return "rate"
+    if any(x in msg for x in ("502", "503", "504")):
+        return "unavailable"
+    return "unknown"
+
+
+def _is_network_error(e: BaseException) -> bool:
+    """Таймаут или обрыв соединения где-то в цепочке причин (requests-ошибки — подклассы OSError)."""
+    seen: BaseException | None = e
+    while seen is not None:
+        if isinstance(seen, FutTimeout | OSError):
+            return True
+        seen = seen.__cause__
+    return False
 
 
 def _safe_fp(s: str) -> str:
@@ -49,7 +101,6 @@ class Handlers:
         self.shorten_button = shorten_button
 
         self.main_body: ft.Container | None = None
-        self.history = SqlAlchemyHistoryService()  # NEW: сервис истории
         self._last_history_id: int | None = None
 
         self.title_row: ft.Row | None = None
@@ -58,6 +109,48 @@ class Handlers:
         self.close_btn: ft.IconButton | None = None
         self.drag_area: ft.WindowDragArea | None = None
 
+    @cached_property
+    def history(self):
+        """Сервис истории; SQLAlchemy импортируется при первом обращении, а не при старте окна."""
+        from urlcutter.db.repo.history_sql import SqlAlchemyHistoryService  # noqa: PLC0415
+
+        return SqlAlchemyHistoryService()
+
+    @cached_property
+    def dedup(self) -> ShortLinkCache:
+        # уже сокращённые URL: LRU + индекс в БД
+        return ShortLinkCache(self.history)
+
+    @cached_property
+    def providers(self) -> list[Provider]:
+        """Провайдеры из URLCUTTER_PROVIDERS (по умолчанию только tinyurl), в порядке из переменной."""
+        # tinyurl идёт через модульный shorten_via_tinyurl: имя резолвится на каждом вызове (его подменяют тесты)
+        tinyurl = FunctionProvider("tinyurl", lambda url, timeout: shorten_via_tinyurl(url, timeout))
+        return [tinyurl if p.name == "tinyurl" else p for p in providers_from_env()]
+
+    @cached_property
+    def router(self) -> ProviderRouter:
+        """Сетевые провайдеры, самый быстрый здоровый — первым.
+
+        Офлайн-провайдеры (local) сюда не входят: EWMA поставила бы их первыми, а их ссылки
+        работают только на этой машине. Они попадают сюда, лишь если сетевых не настроено.
+        URLCUTTER_HEDGE_PERCENTILE включает hedging: медленный ответ дублируется второму провайдеру.
+        """
+        online = [p for p in self.providers if not getattr(p, "offline", False)]
+        return ProviderRouter(online or self.providers, hedge_percentile=hedge_percentile_from_env())
+
+    @cached_property
+    def offline_router(self) -> ProviderRouter | None:
+        """Провайдеры, которым не нужна сеть (local), — когда internet_ok() ложен; None, если таких нет."""
+        offline = [p for p in self.providers if getattr(p, "offline", False)]
+        return ProviderRouter(offline) if offline else None
+
+    def _online_reachable(self) -> bool:
+        """Есть ли в роутере сетевые провайдеры и связь с ними (проба кэширована, сети почти не стоит)."""
+        if all(getattr(p, "offline", False) for p in self.router.providers):
+            return False
+        return internet_ok(self.logger)
+
     # UX-утилиты
     def toast(self, msg: str, ms: int = 1500):
         sb = ft.SnackBar(ft.Text(msg), bgcolor=ft.Colors.BLACK, duration=ms)
@@ -298,36 +391,17 @@ class Handlers:
                 if hasattr(self, "logger"):
                     self.logger.debug("titlebar_set_back skipped: %s", e)
 
-            # 2) Готовим параметры запроса
-            page = PageSpec(page=1, page_size=50)
-            sort = SortSpec(field="created_at", direction="desc")
-            self.logger.debug("open_history with page=%s sort=%s", page, sort)
-
-            # 3) Читаем историю
-            hp = self.history.list(filters=HistoryFilters(), sort=sort, page=page)
-            self.logger.debug("history_page total=%s items=%s", hp.total, len(hp.items))
-
-            # 4) Сбор данных для UI
-            def safe(v, default="—"):
-                return v if (v is not None and v != "") else default
-
-            items = [
-                {
-                    "id": r.id,
-                    "created_at_local": self._fmt_local_dt(r.created_at_utc),
-                    "service": safe(r.service),
-                    "long_url": safe(r.long_url),
-                    "short_url": safe(r.short_url),
-                }
-                for r in hp.items
-            ]
-
-            # 5) Рендерим экран истории
+            # 2) Источник данных: фильтры и страницы считает БД, в памяти — только видимая страница
+            source = HistoryDataSource(self.history, fmt_dt=self._fmt_local_dt)
+            self.logger.debug("open_history with sort=%s", source.sort)
+
+            # 3) Рендерим экран истории (первая страница читается здесь же)
             self.main_body.content = make_history_screen(
                 t=lambda k: k,
-                items=items,
+                source=source,
                 on_back=self._back_to_saved_view,
             )
+            self.logger.debug("history total=%s", source.total)
             self.page.update()
 
         except Exception:
@@ -381,92 +455,129 @@ class Handlers:
             self.logger.info("shorten_reject reason=already_shortened provider=tinyurl")
             return
 
-        # 2) Защита
-        if self.state.circuit_blocked():
-            self.toast(f"Service cooling down {self.state.cooldown_left()}s after repeated errors.")
-            self.logger.warning("shorten_blocked reason=circuit_open cooldown_left=%ds", self.state.cooldown_left())
-            return
-        if not self.state.rate_limit_allow(self.logger):
-            self.toast(f"Local limit {CLIENT_RPM_LIMIT}/min to respect remote caps. Try later.")
-            self.logger.warning("shorten_blocked reason=local_rate_limit rpm=%d", CLIENT_RPM_LIMIT)
+        # 1.5) Уже сокращали этот URL — отдаём ссылку без сети и без тика rate-limit
+        try:
+            cached = self.dedup.lookup(long_url)
+        except Exception as ce:
+            cached = None
+            self.logger.debug("Dedup lookup failed: %s", ce)
+        if cached is not None and cached.service == LocalProvider.name and self._online_reachable():
+            # ссылка local работает только на этой машине: в сети ищем настоящую, иначе — к провайдеру
+            try:
+                cached = self.dedup.lookup(long_url, exclude_service=LocalProvider.name)
+            except Exception as ce:
+                cached = None
+                self.logger.debug("Dedup lookup failed: %s", ce)
+        if cached is not None:
+            self.short_url_field.value = cached.short_url
+            self._last_history_id = cached.id
+            self.page.update()
+            self.toast("Done! Link shortened.")
+            self.logger.info("shorten_cache_hit url=%s service=%s", _safe_fp(long_url), cached.service)
             return
+
+        # 2) Маршрут: сеть или офлайн-провайдеры
+        router = self.router
         if not internet_ok(self.logger):
-            self.toast("No internet connection detected.")
-            self.logger.warning("shorten_blocked reason=offline")
-            return
+            router = self.offline_router
+            if router is None:
+                self.toast("No internet connection detected.")
+                self.logger.warning("shorten_blocked reason=offline")
+                return
+            self.logger.info("shorten_offline providers=%s", ",".join(p.name for p in router.providers))
+        # предохранитель и rate-limit берегут удалённые сервисы; local их не касается
+        remote = not all(getattr(p, "offline", False) for p in router.providers)
+
+        # 2.5) Защита
+        if remote:
+            if self.state.circuit_blocked():
+                self.toast(f"Service cooling down {self.state.cooldown_left()}s after repeated errors.")
+                self.logger.warning("shorten_blocked reason=circuit_open cooldown_left=%ds", self.state.cooldown_left())
+                return
+            if not self.state.rate_limit_allow(self.logger):
+                self.toast(f"Local limit {CLIENT_RPM_LIMIT}/min to respect remote caps. Try later.")
+                self.logger.warning("shorten_blocked reason=local_rate_limit rpm=%d", CLIENT_RPM_LIMIT)
+                return
+            # half-open: слот пробы берём только сейчас, когда точно идём в сеть
+            if not self.state.circuit_allow():
+                self.toast(f"Service cooling down {self.state.cooldown_left()}s after repeated errors.")
+                self.logger.warning("shorten_blocked reason=circuit_probe_busy")
+                return
 
-        # 3) Запускаем с таймаутом + ретрай
+        # 3) Запускаем с таймаутом; повторы и паузы — в retry_call по SHORTEN_RETRY_POLICY
         self.busy(True)
-        last_err = None
-        for attempt in range(1 + RETRIES):
-            self.logger.info(
-                "attempt_start provider=tinyurl attempt=%d timeout=%.1fs",
-                attempt + 1,
-                REQUEST_TIMEOUT,
+        attempt_no = 0
+
+        def attempt(timeout: float) -> tuple[str, str]:
+            nonlocal attempt_no
+            attempt_no += 1
+            self.logger.info("attempt_start attempt=%d timeout=%.1fs", attempt_no, timeout)
+            return router.shorten(long_url, timeout)
+
+        def on_retry(attempt_idx: int, err: BaseException, delay: float) -> None:
+            self.logger.error(
+                "attempt_error provider=%s kind=%s attempt=%d err=%s retry_in=%.2fs",
+                getattr(err, "provider", "-"),
+                _error_kind(err),
+                attempt_idx,
+                err,
+                delay,
             )
+
+        try:
+            short_url, service = retry_call(attempt, SHORTEN_RETRY_POLICY, on_retry=on_retry)
+        except Exception as e:
+            last_err = _error_kind(e)
+            provider = getattr(e, "provider", "-")
+            if _is_network_error(e):
+                # сетевой сбой у провайдера: сбросить кэш пробы, иначе ещё до TTL считаемся онлайн
+                default_probe().invalidate()
+            if last_err == "unknown":
+                self.logger.exception(
+                    "attempt_error provider=%s kind=%s attempt=%d err=%s", provider, last_err, attempt_no, e
+                )
+            else:
+                self.logger.error(
+                    "attempt_error provider=%s kind=%s attempt=%d err=%s", provider, last_err, attempt_no, e
+                )
+        else:
+            self.short_url_field.value = short_url
+            self.page.update()
+            self.toast("Done! Link shortened.")
+
+            # --- запись в историю (тихо; не ломаем UX, если что-то пойдёт не так) ---
             try:
-                short_url = shorten_via_tinyurl(long_url, REQUEST_TIMEOUT)
-                self.short_url_field.value = short_url
-                self.page.update()
-                self.toast("Done! Link shortened.")
-
-                # --- запись в историю (тихо; не ломаем UX, если что-то пойдёт не так) ---
-                try:
-                    self._last_history_id = None  # сбросим на всякий случай
+                self._last_history_id = None  # сбросим на всякий случай
+                if service == LocalProvider.name:
+                    # local уже записал строку с кодом в links — второй записи не нужно
+                    stored = self.dedup.lookup(long_url)
+                else:
                     stored = self.history.add(
                         LinkRecord(
                             id=None,
                             long_url=long_url,  # исходный длинный URL из этой функции
                             short_url=short_url,  # только что полученный короткий
-                            service="tinyurl",  # пока фиксируем; позже подставим выбранный сервис из настроек
+                            service=service,  # провайдер, который выбрал роутер
                             created_at_utc=None,  # БД проставит сама
                             copy_count=0,
                         )
                     )
-                    self._last_history_id = stored.id
-                except Exception as he:
-                    if hasattr(self, "logger"):
-                        self.logger.debug("History add failed: %s", he)
+                self._last_history_id = stored.id
+                self.dedup.remember(long_url, stored)
+            except Exception as he:
+                if hasattr(self, "logger"):
+                    self.logger.debug("History add failed: %s", he)
 
-                self.busy(False)
-                self.logger.info("attempt_success provider=tinyurl short_host=%s", urlparse(short_url).netloc)
+            self.busy(False)
+            self.logger.info("attempt_success provider=%s short_host=%s", service, urlparse(short_url).netloc)
+            if remote:
                 self.state.record_success()
-                return
-
-            except FutTimeout:
-                last_err = "timeout"
-                self.logger.error(
-                    "attempt_error provider=tinyurl kind=timeout timeout=%.1fs attempt=%d",
-                    REQUEST_TIMEOUT,
-                    attempt + 1,
-                )
-
-            except Exception as e:
-                msg = str(e)
-                if "429" in msg or "Too Many Requests" in msg:
-                    last_err = "rate"
-                elif any(x in msg for x in ("502", "503", "504")):
-                    last_err = "unavailable"
-                else:
-                    last_err = "unknown"
-                if last_err == "unknown":
-                    self.logger.exception(
-                        "attempt_error provider=tinyurl kind=%s attempt=%d err=%s",
-                        last_err,
-                        attempt + 1,
-                        msg,
-                    )
-                else:
-                    self.logger.error(
-                        "attempt_error provider=tinyurl kind=%s attempt=%d err=%s",
-                        last_err,
-                        attempt + 1,
-                        msg,
-                    )
+            return
 
         # 4) Все попытки исчерпаны
         self.busy(False)
-        self.state.record_failure()
+        if remote:
+            self.state.record_failure()
         self.logger.error("shorten_failed url=%s final_reason=%s", _url_fingerprint(long_url), last_err)
         if last_err == "timeout":
             self.toast("The service did not respond. Check the internet or try again later.")
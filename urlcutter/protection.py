@@ -1,7 +1,10 @@
 import logging
+import os
+import socket
+import threading
 import time
-from collections import deque
 from collections.abc import Callable
+from urllib.parse import urlsplit
 
 # --- Константы поведения ---
 CLIENT_RPM_LIMIT = 60  # сколько запросов в минуту разрешено
@@ -10,13 +13,219 @@ CB_COOLDOWN_SEC = 30  # сколько секунд держим «открыт
 CIRCUIT_FAIL_THRESHOLD = 3  # сколько подряд ошибок, чтобы "остановиться"
 CIRCUIT_COOLDOWN_SEC = 60  # на сколько секунд "остановиться" (cooldown)
 RATE_LIMIT_WINDOW_SEC = 60
+CB_BACKOFF_FACTOR = 2.0  # во сколько раз растёт cooldown при повторном срабатывании
+CB_MAX_COOLDOWN_SEC = 600  # потолок cooldown при экспоненциальном росте
+CB_HALF_OPEN_PROBES = 1  # сколько пробных запросов пропускаем после cooldown
+
+# ---- Проверка сети ----
+CONNECTIVITY_PROBE_URL = "https://www.google.com/generate_204"  # переопределяется URLCUTTER_PROBE_URL
+CONNECTIVITY_TIMEOUT = 2.0  # короткий таймаут для проверки сети
+CONNECTIVITY_TTL_SEC = 30.0  # сколько доверяем «сеть есть»
+CONNECTIVITY_FAIL_TTL_SEC = 5.0  # «сети нет» кэшируем коротко, чтобы быстро заметить восстановление
+
+
+def _now_default() -> float:
+    return time.time()
+
+
+# допуск на накопленную ошибку float (в долях интервала): rate=7/мин не должен терять
+# 7-й токен всплеска, а rpm=3000 при эпохальных таймстемпах — последний из 3000
+_GCRA_SLACK = 1e-6
+
+
+class RateLimiter:
+    """
+    GCRA (generic cell rate algorithm) — token bucket на одном числе.
+
+    `rate` запросов за `per` секунд, до `burst` подряд (по умолчанию = rate). Вместо очереди
+    таймстемпов хранится одно «теоретическое время прибытия» (TAT): память и цена вызова O(1)
+    при любом лимите. Поведение как у ведра на `burst` токенов, которое доливается
+    со скоростью rate/per.
+
+    Потокобезопасен: проверка и сдвиг TAT идут под коротким локом, внутри нет ни I/O,
+    ни await — из asyncio-кода вызывать можно напрямую.
+    """
+
+    def __init__(
+        self,
+        rate: int,
+        per: float = RATE_LIMIT_WINDOW_SEC,
+        *,
+        burst: int | None = None,
+        clock: Callable[[], float] = _now_default,
+    ) -> None:
+        if rate <= 0 or per <= 0:
+            raise ValueError("rate and per must be positive")
+        burst = rate if burst is None else burst
+        if burst <= 0:
+            raise ValueError("burst must be positive")
+        self.rate = rate
+        self.per = float(per)
+        self.burst = burst
+        self.clock = clock
+        self._interval = self.per / rate  # сколько «стоит» один запрос, сек
+        self._tolerance = self._interval * burst  # насколько TAT может убежать вперёд от now
+        self._eps = self._interval * _GCRA_SLACK
+        self._tat = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self, cost: int = 1, *, now: float | None = None) -> bool:
+        """Забрать `cost` токенов, если есть; иначе False и состояние не меняется."""
+        now = self.clock() if now is None else now
+        with self._lock:
+            new_tat = max(self._tat, now) + self._interval * cost
+            if new_tat - now > self._tolerance + self._eps:
+                return False
+            self._tat = new_tat
+            return True
+
+    def wait_time(self, cost: int = 1, *, now: float | None = None) -> float:
+        """Через сколько секунд allow(cost) вернёт True (0.0 — уже можно)."""
+        now = self.clock() if now is None else now
+        tat = self._tat  # одно чтение float, лок не нужен
+        new_tat = max(tat, now) + self._interval * cost
+        wait = new_tat - now - self._tolerance
+        return wait if wait > self._eps else 0.0
+
+    def reset(self) -> None:
+        with self._lock:
+            self._tat = 0.0
+
+
+class CircuitBreaker:
+    """
+    Предохранитель closed → open → half-open.
+
+    - closed: пропускает всё, считает ошибки подряд; на `fail_threshold` — open.
+    - open: ничего не пропускает `cooldown` секунд.
+    - half-open: после cooldown пропускает не больше `half_open_probes` пробных запросов.
+      Успех пробы закрывает предохранитель. Ошибка снова открывает его, и cooldown растёт
+      в `backoff` раз, но не выше `max_cooldown`. Поэтому воркеры, проснувшиеся
+      одновременно, не бьют толпой в ещё лежащий сервис.
+
+    Проба, о которой так и не отчитались (вызывающий передумал идти в сеть), через
+    `cooldown` секунд перестаёт занимать слот.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(  # noqa: PLR0913
+        self,
+        fail_threshold: int = CB_FAIL_THRESHOLD,
+        cooldown: float = CB_COOLDOWN_SEC,
+        *,
+        half_open_probes: int = CB_HALF_OPEN_PROBES,
+        backoff: float = CB_BACKOFF_FACTOR,
+        max_cooldown: float = CB_MAX_COOLDOWN_SEC,
+        clock: Callable[[], float] = _now_default,
+    ) -> None:
+        if fail_threshold <= 0 or cooldown <= 0 or half_open_probes <= 0:
+            raise ValueError("fail_threshold, cooldown and half_open_probes must be positive")
+        if backoff < 1:
+            raise ValueError("backoff must be >= 1")
+        self.fail_threshold = fail_threshold
+        self.cooldown = float(cooldown)
+        self.half_open_probes = half_open_probes
+        self.backoff = float(backoff)
+        self.max_cooldown = max(float(max_cooldown), self.cooldown)
+        self.clock = clock
+        self.failures = 0  # ошибок подряд
+        self.trips = 0  # срабатываний подряд (для экспоненциального cooldown)
+        self._state = self.CLOSED
+        self._open_until = 0.0
+        self._probes = 0
+        self._probe_lease_until = 0.0
+        self._lock = threading.Lock()
+
+    def _now(self, now: float | None) -> float:
+        return self.clock() if now is None else now
+
+    def _refresh(self, now: float) -> None:
+        if self._state == self.OPEN and now >= self._open_until:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+
+    def _trip(self, now: float) -> None:
+        self.trips += 1
+        cooldown = min(self.cooldown * self.backoff ** (self.trips - 1), self.max_cooldown)
+        self._state = self.OPEN
+        self._open_until = now + cooldown
+        self._probes = 0
+
+    def state(self, *, now: float | None = None) -> str:
+        with self._lock:
+            self._refresh(self._now(now))
+            return self._state
+
+    def blocked(self, *, now: float | None = None) -> bool:
+        """Только спросить: откажет ли allow() прямо сейчас. Слот пробы не занимает."""
+        now = self._now(now)
+        with self._lock:
+            self._refresh(now)
+            if self._state == self.HALF_OPEN:
+                return self._probes >= self.half_open_probes and now < self._probe_lease_until
+            return self._state == self.OPEN
+
+    def allow(self, *, now: float | None = None) -> bool:
+        """Можно ли сделать запрос; в half-open занимает слот пробы (звать прямо перед походом в сеть)."""
+        now = self._now(now)
+        with self._lock:
+            self._refresh(now)
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                return False
+            if self._probes >= self.half_open_probes and now < self._probe_lease_until:
+                return False
+            if self._probes >= self.half_open_probes:
+                self._probes = 0  # пробы «потерялись» — раздаём слоты заново
+            self._probes += 1
+            self._probe_lease_until = now + self.cooldown
+            return True
+
+    def record_success(self, *, now: float | None = None) -> None:
+        with self._lock:
+            self._refresh(self._now(now))
+            self.failures = 0
+            if self._state == self.HALF_OPEN:
+                self._state = self.CLOSED
+                self.trips = 0
+
+    def record_failure(self, *, now: float | None = None) -> None:
+        now = self._now(now)
+        with self._lock:
+            self._refresh(now)
+            self.failures += 1
+            if self._state == self.HALF_OPEN or (self._state == self.CLOSED and self.failures >= self.fail_threshold):
+                self._trip(now)
+
+    def cooldown_left(self, *, now: float | None = None) -> float:
+        now = self._now(now)
+        with self._lock:
+            self._refresh(now)
+            return self._open_until - now if self._state == self.OPEN else 0.0
+
+    def reset(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.trips = 0
+            self._state = self.CLOSED
+            self._open_until = 0.0
+            self._probes = 0
+
 
 # --- Глобальное состояние (простое и прозрачное) ---
+# Замену объектов в _state/_breakers делаем под _state_lock, читаем без лока: одно чтение
+# значения из dict атомарно. Счётчики внутри RateLimiter/CircuitBreaker защищены их собственными локами.
+_state_lock = threading.Lock()
 _state = {
-    "ticks": deque(),  # таймстемпы успешных выдач для rate-limit
-    "fail_count": 0,  # счётчик подряд идущих ошибок
-    "cb_open_until": 0.0,  # unix-время, до которого предохранитель «открыт»
+    "limiter": RateLimiter(CLIENT_RPM_LIMIT, RATE_LIMIT_WINDOW_SEC),  # rate-limit для модульного API
+    "breaker": CircuitBreaker(CB_FAIL_THRESHOLD, CB_COOLDOWN_SEC),  # общий предохранитель модульного API
 }
+# Предохранители по провайдерам/хостам: сбой одного не блокирует остальных
+_breakers: dict[str, CircuitBreaker] = {}
 
 
 # Тестовые служебные функции (экспортируем для фикстур)
@@ -25,99 +234,207 @@ def _get_state():
 
 
 def _reset_state():
-    _state["ticks"].clear()
-    _state["fail_count"] = 0
-    _state["cb_open_until"] = 0.0
+    with _state_lock:
+        _state["limiter"] = RateLimiter(CLIENT_RPM_LIMIT, RATE_LIMIT_WINDOW_SEC)
+        _state["breaker"] = CircuitBreaker(CB_FAIL_THRESHOLD, CB_COOLDOWN_SEC)
+        _breakers.clear()
+
+
+def configure_rate_limit(rpm: int, *, burst: int | None = None) -> None:
+    """Лимит модульного rate_limit_allow(), например тысячи в минуту для пакетных задач."""
+    limiter = RateLimiter(rpm, RATE_LIMIT_WINDOW_SEC, burst=burst)
+    with _state_lock:
+        _state["limiter"] = limiter
+
+
+def breaker_for(key: str, **kwargs) -> CircuitBreaker:
+    """
+    Предохранитель провайдера или хоста `key` (регистр не важен), создаётся при первом обращении.
+
+    `kwargs` (как у CircuitBreaker) применяются только при создании.
+    """
+    key = key.lower()
+    breaker = _breakers.get(key)
+    if breaker is None:
+        with _state_lock:
+            breaker = _breakers.get(key)
+            if breaker is None:
+                breaker = _breakers[key] = CircuitBreaker(**kwargs)
+    return breaker
 
 
 class AppState:
-    def __init__(self):
-        self.ticks = deque(maxlen=CLIENT_RPM_LIMIT * 2)
-        self.fails = 0
-        self.blocked_until = 0.0
+    """Состояние защиты одного клиента; безопасно делить между потоками воркер-пула."""
+
+    def __init__(self, rpm_limit: int = CLIENT_RPM_LIMIT, *, burst: int | None = None):
+        self.limiter = RateLimiter(rpm_limit, RATE_LIMIT_WINDOW_SEC, burst=burst)
+        self.breaker = CircuitBreaker(CIRCUIT_FAIL_THRESHOLD, CIRCUIT_COOLDOWN_SEC)
+
+    @property
+    def fails(self) -> int:
+        return self.breaker.failures
 
     def circuit_blocked(self) -> bool:
-        return time.time() < self.blocked_until
+        # без побочных эффектов: вызывающий может дальше передумать (rate-limit, нет сети)
+        return self.breaker.blocked()
+
+    def circuit_allow(self) -> bool:
+        # непосредственно перед запросом: в half-open занимает слот пробы
+        return self.breaker.allow()
 
     def record_failure(self):
-        self.fails += 1
-        if self.fails >= CIRCUIT_FAIL_THRESHOLD:
-            self.blocked_until = time.time() + CIRCUIT_COOLDOWN_SEC
+        self.breaker.record_failure()
 
     def record_success(self):
-        self.fails = 0
-        self.blocked_until = 0.0
+        self.breaker.record_success()
 
     def cooldown_left(self) -> int:
-        return max(0, int(self.blocked_until - time.time()))
+        return max(0, int(self.breaker.cooldown_left()))
 
     def rate_limit_allow(self, logger: logging.Logger) -> bool:
-        now = time.time()
-        while self.ticks and now - self.ticks[0] > RATE_LIMIT_WINDOW_SEC:
-            self.ticks.popleft()
-        if len(self.ticks) >= CLIENT_RPM_LIMIT:
-            logger.warning("rate_limit hit rpm=%d queue_len=%d", CLIENT_RPM_LIMIT, len(self.ticks))
+        if not self.limiter.allow():
+            logger.warning("rate_limit hit rpm=%d wait=%.1fs", self.limiter.rate, self.limiter.wait_time())
             return False
-        self.ticks.append(now)
         return True
 
 
-def _now_default() -> float:
-    return time.time()
+def circuit_blocked(*, now_fn: Callable[[], float] = _now_default) -> bool:
+    return _state["breaker"].blocked(now=now_fn())
 
 
-def circuit_blocked(*, now_fn: Callable[[], float] = _now_default) -> bool:
-    now = now_fn()
-    return now < _state["cb_open_until"]
+def circuit_allow(*, now_fn: Callable[[], float] = _now_default) -> bool:
+    return _state["breaker"].allow(now=now_fn())
 
 
 def cooldown_left(*, now_fn: Callable[[], float] = _now_default) -> int:
-    now = now_fn()
-    left = int(round(_state["cb_open_until"] - now))
+    left = int(round(_state["breaker"].cooldown_left(now=now_fn())))
     return max(0, left)
 
 
 def record_failure(*, now_fn: Callable[[], float] = _now_default) -> None:
-    now = now_fn()
-    # Если уже открыт — просто обновим таймер (не обязательно, но удобно)
-    if now < _state["cb_open_until"]:
-        return
-    _state["fail_count"] += 1
-    if _state["fail_count"] >= CB_FAIL_THRESHOLD:
-        _state["cb_open_until"] = now + CB_COOLDOWN_SEC
-        _state["fail_count"] = 0  # сбросим, чтобы после окна считать заново
+    _state["breaker"].record_failure(now=now_fn())
 
 
-def record_success() -> None:
-    # Любой успешный вызов сбрасывает счётчик ошибок
-    _state["fail_count"] = 0
+def record_success(*, now_fn: Callable[[], float] = _now_default) -> None:
+    # Любой успешный вызов сбрасывает счётчик ошибок (и закрывает half-open)
+    _state["breaker"].record_success(now=now_fn())
 
 
 def rate_limit_allow(*, now_fn: Callable[[], float] = _now_default) -> bool:
     """
-    Скользящее окно 60 сек: очищаем старые метки и решаем, можно ли ещё.
+    CLIENT_RPM_LIMIT в минуту с таким же всплеском подряд (см. RateLimiter).
     """
-    now = now_fn()
-    # Очищаем старые записи старше 60с
-    window_start = now - float(RATE_LIMIT_WINDOW_SEC)
-    ticks = _state["ticks"]
-    while ticks and ticks[0] <= window_start:
-        ticks.popleft()
-    if len(ticks) < CLIENT_RPM_LIMIT:
-        ticks.append(now)
+    return _state["limiter"].allow(now=now_fn())
+
+
+def rate_limit_wait(*, now_fn: Callable[[], float] = _now_default) -> float:
+    """Сколько секунд ждать до следующего разрешённого запроса."""
+    return _state["limiter"].wait_time(now=now_fn())
+
+
+class ConnectivityProbe:
+    """
+    Дешёвая проверка сети: TCP-коннект к host:port из `url`, без TLS и HTTP.
+
+    Результат кэшируется: удачный на `ttl` секунд, неудачный на `fail_ttl`, так что
+    при частых сокращениях проба идёт раз в N секунд, а не на каждый клик.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        url: str = CONNECTIVITY_PROBE_URL,
+        *,
+        timeout: float = CONNECTIVITY_TIMEOUT,
+        ttl: float = CONNECTIVITY_TTL_SEC,
+        fail_ttl: float = CONNECTIVITY_FAIL_TTL_SEC,
+        clock: Callable[[], float] = time.monotonic,
+        connect: Callable[..., socket.socket] = socket.create_connection,
+    ) -> None:
+        parts = urlsplit(url)
+        if not parts.hostname:
+            raise ValueError(f"probe url has no host: {url!r}")
+        self.url = url
+        self.address = (parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        self.timeout = timeout
+        self.ttl = ttl
+        self.fail_ttl = fail_ttl
+        self.clock = clock
+        self._connect = connect
+        self._ok: bool | None = None
+        self._expires = 0.0
+        self._lock = threading.Lock()
+
+    def _probe(self) -> bool:
+        try:
+            sock = self._connect(self.address, timeout=self.timeout)
+        except OSError:
+            return False
+        sock.close()
         return True
-    return False
+
+    def check(self) -> bool:
+        """Есть ли сеть; пока кэш свежий — без обращения к сокетам."""
+        if self._ok is not None and self.clock() < self._expires:
+            return self._ok
+        # одна проба на всех: остальные потоки ждут её результат, а не стучатся параллельно
+        with self._lock:
+            if self._ok is not None and self.clock() < self._expires:
+                return self._ok
+            ok = self._probe()
+            self._expires = self.clock() + (self.ttl if ok else self.fail_ttl)
+            self._ok = ok
+            return ok
+
+    def invalidate(self) -> None:
+        """Сбросить кэш, например после сетевой ошибки у провайдера."""
+        with self._lock:
+            self._ok = None
+            self._expires = 0.0
 
 
-def internet_ok(logger: logging.Logger, *, AppState_cls=AppState) -> bool:
-    st = AppState_cls()
+_probe_state: dict[str, ConnectivityProbe | None] = {"probe": None}
 
-    if st.circuit_blocked():
+
+def default_probe() -> ConnectivityProbe:
+    """Общая проба процесса; создаётся при первом обращении."""
+    probe = _probe_state["probe"]
+    if probe is None:
+        with _state_lock:
+            probe = _probe_state["probe"]
+            if probe is None:
+                probe = ConnectivityProbe(os.getenv("URLCUTTER_PROBE_URL") or CONNECTIVITY_PROBE_URL)
+                _probe_state["probe"] = probe
+    return probe
+
+
+def configure_probe(url: str | None = None, **kwargs) -> ConnectivityProbe:
+    """Заменить общую пробу (другой endpoint, TTL, таймаут). Аргументы — как у ConnectivityProbe."""
+    probe = ConnectivityProbe(url or os.getenv("URLCUTTER_PROBE_URL") or CONNECTIVITY_PROBE_URL, **kwargs)
+    with _state_lock:
+        _probe_state["probe"] = probe
+    return probe
+
+
+def internet_ok(
+    logger: logging.Logger,
+    *,
+    state: AppState | None = None,
+    probe: ConnectivityProbe | None = None,
+) -> bool:
+    """
+    Можно ли идти в сеть прямо сейчас.
+
+    Если передан `state` (живой AppState вызывающего), сначала проверяется его предохранитель —
+    только чтение: токен rate-limit и слот пробы half-open не расходуются. Затем — кэшированная
+    проба сети (`probe` или общая default_probe()).
+    """
+    if state is not None and state.circuit_blocked():
         logger.warning("circuit open: skip network")
         return False
 
-    if not st.rate_limit_allow(logger):
-        logger.warning("rate limit exceeded")
+    probe = probe or default_probe()
+    if not probe.check():
+        logger.warning("connectivity probe failed target=%s:%d", *probe.address)
         return False
 
     return True
@@ -0,0 +1,118 @@
+"""Retry scheduling for provider calls: exponential backoff with full jitter,
+Retry-After awareness and one total deadline per call.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import TypeVar
+
+from urlcutter.errors import ProviderError, RateLimitedError
+
+T = TypeVar("T")
+
+__all__ = ["RetryPolicy", "parse_retry_after", "retry_call"]
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Сколько раз и с какими паузами повторять вызов провайдера.
+
+    attempts        — всего попыток, включая первую.
+    base_delay      — пауза перед 2-й попыткой до джиттера; дальше растёт в `multiplier` раз.
+    max_delay       — потолок одной паузы.
+    attempt_timeout — таймаут одной попытки.
+    deadline        — общий бюджет вызова: ни попытка, ни пауза не выходят за него.
+    jitter          — «full jitter»: пауза случайна в [0, backoff], чтобы клиенты не синхронизировались.
+    """
+
+    attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    multiplier: float = 2.0
+    attempt_timeout: float = 8.0
+    deadline: float = 20.0
+    jitter: bool = True
+
+    def __post_init__(self) -> None:
+        if self.attempts < 1:
+            raise ValueError("attempts must be >= 1")
+        if self.base_delay < 0 or self.max_delay < 0 or self.multiplier < 1:
+            raise ValueError("delays must be >= 0 and multiplier >= 1")
+        if self.attempt_timeout <= 0 or self.deadline <= 0:
+            raise ValueError("attempt_timeout and deadline must be positive")
+
+    def backoff(self, retry_no: int, rng: Callable[[], float] = random.random) -> float:
+        """Пауза перед повтором номер `retry_no` (1 — первый повтор)."""
+        cap = min(self.max_delay, self.base_delay * self.multiplier ** (retry_no - 1))
+        return cap * rng() if self.jitter else cap
+
+    @staticmethod
+    def is_retryable(exc: BaseException) -> bool:
+        # таймаут попытки и «временные» ошибки провайдера; 4xx и плохой ввод — нет
+        if isinstance(exc, ProviderError):
+            return exc.retryable
+        return isinstance(exc, TimeoutError)
+
+
+def parse_retry_after(value: str | None, *, now: float | None = None) -> float | None:
+    """Retry-After в секундах: число секунд или HTTP-дата (RFC 9110). Мусор → None."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime  # noqa: PLC0415
+
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None or when.tzinfo is None:
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, when.timestamp() - now)
+
+
+def retry_call(  # noqa: PLR0913
+    fn: Callable[[float], T],
+    policy: RetryPolicy,
+    *,
+    on_retry: Callable[[int, BaseException, float], None] | None = None,
+    sleep: Callable[[float], None] = time.sleep,
+    clock: Callable[[], float] = time.monotonic,
+    rng: Callable[[], float] = random.random,
+) -> T:
+    """
+    Вызвать `fn(timeout)` с повторами по `policy`.
+
+    `timeout` каждой попытки — min(attempt_timeout, остаток дедлайна). Пауза перед повтором —
+    backoff с джиттером, но не меньше Retry-After, если провайдер его прислал. Если пауза
+    не помещается в остаток дедлайна, повтора не будет: сразу поднимается последняя ошибка.
+    `on_retry(attempt, exc, delay)` вызывается перед каждой паузой (для логов).
+    """
+    deadline = clock() + policy.deadline
+    attempt = 1
+    while True:
+        remaining = deadline - clock()
+        try:
+            return fn(min(policy.attempt_timeout, remaining))
+        except Exception as exc:
+            if attempt >= policy.attempts or not policy.is_retryable(exc):
+                raise
+            delay = policy.backoff(attempt, rng)
+            if isinstance(exc, RateLimitedError) and exc.retry_after is not None:
+                delay = max(delay, exc.retry_after)
+            # после паузы должно остаться время хотя бы на осмысленную попытку
+            if clock() + delay >= deadline:
+                raise
+            if on_retry is not None:
+                on_retry(attempt, exc, delay)
+            sleep(delay)
+            attempt += 1
@@ -0,0 +1,422 @@
+"""Redirect server for locally generated short codes: `python -m urlcutter.serve`.
+
+GET/HEAD /<code> -> 302 (301 with --permanent) to the long URL stored in `links.short_code`.
+
+Перед БД два кэша: LRU горячих кодов (без I/O, ответ собирается заранее) и негативный
+кэш неизвестных кодов. У обоих TTL: код может появиться позже, когда приложение сократит
+новую ссылку, а удалённая из истории перестаёт редиректить не позже чем через `--hot-ttl`.
+Промахи идут в SQLite только на чтение (mode=ro) через небольшой пул соединений в потоках;
+одновременные промахи по одному коду схлопываются в один запрос.
+
+HTTP — минимальный HTTP/1.1 на asyncio.Protocol: keep-alive и pipelining, без тел запросов.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import queue
+import sqlite3
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import quote
+
+from urlcutter.db.paths import db_path
+from urlcutter.db.repo.local_codes import is_local_code
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080  # совпадает с DEFAULT_LOCAL_BASE_URL в local_codes
+HOT_CACHE_SIZE = 10_000
+NEGATIVE_CACHE_SIZE = 10_000
+NEGATIVE_TTL_SEC = 5.0
+HOT_TTL_SEC = 60.0  # сколько отдаём код из памяти, не перепроверяя, что его не удалили
+DB_POOL_SIZE = 4
+MAX_HEADER_BYTES = 8192  # длиннее — 431 и закрываем соединение
+KEEPALIVE_TIMEOUT_SEC = 15.0
+
+# Что не кодируем в Location: разделители URL и уже закодированные %XX
+_LOCATION_SAFE = ":/?#[]@!$&'()*+,;=%~"
+_NOT_FOUND = b"Not Found"
+_REASONS = {
+    301: "Moved Permanently",
+    302: "Found",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+}
+
+logger = logging.getLogger("urlcutter.serve")
+
+
+def location_for(long_url: str) -> bytes:
+    """Location header value: ASCII only (no CR/LF can leak into the response), scheme-less -> http://."""
+    url = long_url.strip()
+    if "://" not in url:
+        url = "http://" + url
+    return quote(url, safe=_LOCATION_SAFE).encode("ascii")
+
+
+class ReadOnlyPool:
+    """Fixed set of read-only sqlite3 connections shared by the lookup threads."""
+
+    def __init__(self, path: str | Path, size: int = DB_POOL_SIZE):
+        if size < 1:
+            raise ValueError("size must be >= 1")
+        self.path = Path(path)
+        self.size = size
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._all: list[sqlite3.Connection] = []
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only=1")
+        self._all.append(conn)
+        return conn
+
+    def lookup(self, code: str) -> str | None:
+        """Long URL for `code` or None. Blocking: call it from a worker thread."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            # соединений не больше, чем потоков-воркеров, поэтому открываем лениво без счётчика-семафора
+            conn = self._connect()
+        try:
+            row = conn.execute("SELECT long_url FROM links WHERE short_code = ?", (code,)).fetchone()
+        finally:
+            self._idle.put(conn)
+        return None if row is None else row[0]
+
+    def close(self) -> None:
+        for conn in self._all:
+            with contextlib.suppress(sqlite3.Error):
+                conn.close()
+        self._all.clear()
+
+
+class _LRU:
+    """Bounded code -> value map; used only from the event loop thread, so no lock."""
+
+    def __init__(self, maxsize: int):
+        if maxsize < 1:
+            raise ValueError("maxsize must be >= 1")
+        self.maxsize = maxsize
+        self._items: OrderedDict[str, object] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: str):
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key: str, value) -> None:
+        self._items[key] = value
+        self._items.move_to_end(key)
+        if len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        self._items.pop(key, None)
+
+
+_MISS = object()  # peek(): в кэшах ответа нет, нужен поход в БД
+
+
+class RedirectResolver:
+    """code -> Location bytes (or None for unknown codes) through the hot LRU, the negative cache and the DB."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        lookup: Callable[[str], str | None],
+        *,
+        hot_size: int = HOT_CACHE_SIZE,
+        negative_size: int = NEGATIVE_CACHE_SIZE,
+        negative_ttl: float = NEGATIVE_TTL_SEC,
+        hot_ttl: float = HOT_TTL_SEC,
+        executor: ThreadPoolExecutor | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.lookup = lookup
+        self.negative_ttl = negative_ttl
+        self.hot_ttl = hot_ttl
+        self.clock = clock
+        self.executor = executor
+        self._hot = _LRU(hot_size)  # code -> (Location, момент, до которого верим записи)
+        self._negative = _LRU(negative_size)  # code -> момент, до которого считаем код неизвестным
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.stats = {"hot_hits": 0, "negative_hits": 0, "db_lookups": 0, "rejected": 0}
+
+    def peek(self, code: str):
+        """Answer from memory: Location bytes, None (unknown code) or _MISS (ask the DB)."""
+        if not is_local_code(code):
+            self.stats["rejected"] += 1
+            return None
+        entry = self._hot.get(code)
+        if entry is not None:
+            location, until = entry
+            if until > self.clock():
+                self.stats["hot_hits"] += 1
+                return location
+            self._hot.pop(code)
+        until = self._negative.get(code)
+        if until is not None:
+            if until > self.clock():
+                self.stats["negative_hits"] += 1
+                return None
+            self._negative.pop(code)
+        return _MISS
+
+    async def resolve(self, code: str) -> bytes | None:
+        hit = self.peek(code)
+        if hit is not _MISS:
+            return hit
+        # поход в БД — отдельная задача: клиент, закрывший соединение, не отменяет её для остальных
+        task = self._inflight.get(code)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._fetch(code))
+            self._inflight[code] = task
+            task.add_done_callback(lambda t: self._fetched(code, t))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, code: str) -> bytes | None:
+        self.stats["db_lookups"] += 1
+        long_url = await asyncio.get_running_loop().run_in_executor(self.executor, self.lookup, code)
+        if long_url is None:
+            self._negative.put(code, self.clock() + self.negative_ttl)
+            return None
+        location = location_for(long_url)
+        self._hot.put(code, (location, self.clock() + self.hot_ttl))
+        return location
+
+    def _fetched(self, code: str, task: asyncio.Task) -> None:
+        self._inflight.pop(code, None)
+        if not task.cancelled():
+            task.exception()  # ожидающих может не остаться — не шумим "exception was never retrieved"
+
+
+def _response(status: int, *, location: bytes | None = None, keep_alive: bool = True, body: bytes = b"") -> bytes:
+    head = [f"HTTP/1.1 {status} {_REASONS[status]}".encode("ascii")]
+    if location is not None:
+        head.append(b"Location: " + location)
+    if status == 405:  # noqa: PLR2004
+        head.append(b"Allow: GET, HEAD")
+    head.append(b"Content-Length: %d" % len(body))
+    if not keep_alive:
+        head.append(b"Connection: close")
+    return b"\r\n".join(head) + b"\r\n\r\n" + body
+
+
+class _RedirectProtocol(asyncio.Protocol):
+    """One client connection: parse pipelined requests, answer strictly in order."""
+
+    def __init__(self, server: RedirectServer):
+        self.server = server
+        self.transport: asyncio.Transport | None = None
+        self._buf = b""
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self._last_seen = 0.0
+        self._idle_timer: asyncio.TimerHandle | None = None
+
+    # --- asyncio.Protocol ---
+    def connection_made(self, transport) -> None:
+        self.transport = transport
+        self._last_seen = time.monotonic()
+        self._idle_timer = asyncio.get_running_loop().call_later(self.server.keepalive_timeout, self._check_idle)
+
+    def connection_lost(self, exc) -> None:
+        self._closing = True
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        if self._task is not None:
+            self._task.cancel()
+
+    def data_received(self, data: bytes) -> None:
+        self._last_seen = time.monotonic()
+        self._buf += data
+        if self._task is None:
+            self._drain()
+
+    # --- internals ---
+    def _check_idle(self) -> None:
+        # таймер не переставляем на каждый запрос: проверяем время последней активности при срабатывании
+        idle = time.monotonic() - self._last_seen
+        if self._task is None and idle >= self.server.keepalive_timeout:
+            self.transport.close()
+            return
+        delay = max(0.1, self.server.keepalive_timeout - idle)
+        self._idle_timer = asyncio.get_running_loop().call_later(delay, self._check_idle)
+
+    def _next_request(self) -> tuple[bytes, bytes, bool] | None:
+        """(method, path, keep_alive) of the next complete request; None — wait for more bytes."""
+        end = self._buf.find(b"\r\n\r\n")
+        if end < 0:
+            if len(self._buf) > MAX_HEADER_BYTES:
+                self._reply(_response(431, keep_alive=False), keep_alive=False)
+            return None
+        head, self._buf = self._buf[:end], self._buf[end + 4 :]
+        lines = head.split(b"\r\n")
+        parts = lines[0].split(b" ")
+        if len(parts) != 3 or not parts[2].startswith(b"HTTP/1."):  # noqa: PLR2004
+            self._reply(_response(400, keep_alive=False), keep_alive=False)
+            return None
+        method, target, version = parts
+        keep_alive = version == b"HTTP/1.1"
+        for line in lines[1:]:
+            name, _, value = line.partition(b":")
+            name = name.strip().lower()
+            if name == b"connection":
+                value = value.strip().lower()
+                keep_alive = value != b"close" if keep_alive else value == b"keep-alive"
+            elif name in (b"content-length", b"transfer-encoding") and value.strip() not in (b"0", b""):
+                # тела запросам редиректа не нужны; без поддержки тел дальнейший поток не разобрать
+                self._reply(_response(400, keep_alive=False), keep_alive=False)
+                return None
+        return method, target, keep_alive
+
+    def _reply(self, payload: bytes, *, keep_alive: bool) -> None:
+        if self._closing:
+            return
+        self.transport.write(payload)
+        if not keep_alive:
+            self._closing = True
+            self._buf = b""
+            self.transport.close()
+
+    def _answer(self, method: bytes, location: bytes | None, keep_alive: bool) -> None:
+        if location is None:
+            payload = _response(404, keep_alive=keep_alive, body=_NOT_FOUND)
+            if method == b"HEAD":
+                payload = payload[: -len(_NOT_FOUND)]  # заголовки те же, тела нет
+        else:
+            payload = _response(self.server.status, location=location, keep_alive=keep_alive)
+        self._reply(payload, keep_alive=keep_alive)
+
+    def _drain(self) -> None:
+        while not self._closing:
+            req = self._next_request()
+            if req is None:
+                return
+            method, target, keep_alive = req
+            if method not in (b"GET", b"HEAD"):
+                self._reply(_response(405, keep_alive=keep_alive), keep_alive=keep_alive)
+                continue
+            code = target.split(b"?", 1)[0].lstrip(b"/").decode("latin-1")
+            hit = self.server.resolver.peek(code)
+            if hit is _MISS:
+                # дальше — по порядку: следующие запросы ждут, пока этот сходит в БД
+                self._task = asyncio.get_running_loop().create_task(self._slow(method, code, keep_alive))
+                return
+            self._answer(method, hit, keep_alive)
+
+    async def _slow(self, method: bytes, code: str, keep_alive: bool) -> None:
+        try:
+            location = await self.server.resolver.resolve(code)
+        except Exception:
+            logger.exception("redirect_lookup_failed code=%s", code)
+            self._reply(_response(500, keep_alive=False), keep_alive=False)
+            return
+        finally:
+            self._task = None
+        self._answer(method, location, keep_alive)
+        self._drain()
+
+
+class RedirectServer:
+    """asyncio server around a RedirectResolver."""
+
+    def __init__(
+        self,
+        resolver: RedirectResolver,
+        *,
+        permanent: bool = False,
+        keepalive_timeout: float = KEEPALIVE_TIMEOUT_SEC,
+    ):
+        self.resolver = resolver
+        self.status = 301 if permanent else 302
+        self.keepalive_timeout = keepalive_timeout
+        self._server: asyncio.Server | None = None
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> tuple[str, int]:
+        """Bind and start accepting; returns the actual (host, port) — port=0 picks a free one."""
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(lambda: _RedirectProtocol(self), host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+
+async def serve(  # noqa: PLR0913
+    db: str | Path | None = None,
+    *,
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    permanent: bool = False,
+    hot_size: int = HOT_CACHE_SIZE,
+    negative_ttl: float = NEGATIVE_TTL_SEC,
+    hot_ttl: float = HOT_TTL_SEC,
+    pool_size: int = DB_POOL_SIZE,
+) -> None:
+    """Run the redirect server until cancelled."""
+    pool = ReadOnlyPool(db or db_path(), pool_size)
+    with ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="urlcutter-serve") as executor:
+        resolver = RedirectResolver(
+            pool.lookup, hot_size=hot_size, negative_ttl=negative_ttl, hot_ttl=hot_ttl, executor=executor
+        )
+        server = RedirectServer(resolver, permanent=permanent)
+        bound_host, bound_port = await server.start(host, port)
+        logger.info("serve_started addr=http://%s:%d db=%s", bound_host, bound_port, pool.path)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+            pool.close()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m urlcutter.serve", description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", help="path to history.db (default: the app's data dir)")
+    parser.add_argument("--permanent", action="store_true", help="answer 301 instead of 302")
+    parser.add_argument("--cache-size", type=int, default=HOT_CACHE_SIZE, help="hot LRU size, codes")
+    parser.add_argument("--negative-ttl", type=float, default=NEGATIVE_TTL_SEC, help="seconds to remember a miss")
+    parser.add_argument(
+        "--hot-ttl", type=float, default=HOT_TTL_SEC, help="seconds to serve a cached code before re-checking the DB"
+    )
+    parser.add_argument("--pool-size", type=int, default=DB_POOL_SIZE, help="read-only DB connections")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(
+            serve(
+                args.db,
+                host=args.host,
+                port=args.port,
+                permanent=args.permanent,
+                hot_size=args.cache_size,
+                negative_ttl=args.negative_ttl,
+                hot_ttl=args.hot_ttl,
+                pool_size=args.pool_size,
+            )
+        )
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -1,33 +1,106 @@
 """TinyURL shortener core with dual backend:
-- direct HTTP API (DI via _get for unit tests)
-- pyshorteners + ThreadPoolExecutor (keeps legacy tests happy)
+- direct HTTP API over a pooled keep-alive session (DI via _get for unit tests)
+- pyshorteners + ThreadPoolExecutor when a Shortener factory is injected (keeps legacy tests happy)
+- batch mode (`shorten_many`) on top of one long-lived worker pool
+- asyncio mode (`ashorten` / `ashorten_many`) over one shared httpx.AsyncClient per loop
 """
 
 from __future__ import annotations
 
-from collections.abc import Callable
-from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import inspect
+import math
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import deque
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from functools import partial
 from http import HTTPStatus
 
 # stdlib
+from typing import TYPE_CHECKING, Protocol
 from urllib.parse import quote, urlparse
 
-import requests
-
-# 3rd party
 # local
 from urlcutter import normalize_url
+from urlcutter.errors import ProviderError, ProviderUnavailableError, RateLimitedError
+from urlcutter.protection import CircuitBreaker
+from urlcutter.retry import parse_retry_after
+
+# 3rd party: requests/urllib3 импортируются при первой сборке сессии (_build_session)
+if TYPE_CHECKING:
+    import requests
 
-__all__ = ["shorten_via_tinyurl_core"]
+    from urlcutter.db.repo.local_codes import LocalCodeStore
+
+__all__ = [
+    "shorten_via_tinyurl_core",
+    "shorten_many",
+    "configure_http",
+    "get_http_session",
+    "abandoned_calls",
+    "abandoned_hedges",
+    "Provider",
+    "TinyURLProvider",
+    "PyshortenersProvider",
+    "FunctionProvider",
+    "LocalProvider",
+    "ProviderRouter",
+    "register_provider",
+    "get_provider",
+    "available_providers",
+    "providers_from_env",
+    "hedge_percentile_from_env",
+    "reset_http_session",
+    "ashorten",
+    "ashorten_many",
+    "get_async_client",
+    "aclose_async_client",
+]
 
 DEFAULT_HTTP_TIMEOUT = 5
 
+# Прямой API TinyURL; URLCUTTER_TINYURL_API позволяет подставить локальный стенд
+TINYURL_API_URL = os.getenv("URLCUTTER_TINYURL_API", "https://tinyurl.com/api-create.php")
+HTTP_POOL_SIZE = 32  # keep-alive соединений на хост
+HTTP_RETRIES = 2  # повторы только на уровне соединения (DNS/TCP/TLS)
+HTTP_BACKOFF = 0.2
+
+# Общая HTTP-сессия на процесс (создаётся лениво, пересоздаётся после configure_http)
+_http = {
+    "session": None,
+    "api_url": TINYURL_API_URL,
+    "pool_size": HTTP_POOL_SIZE,
+    "retries": HTTP_RETRIES,
+    "keep_alive": True,
+}
+_http_lock = threading.Lock()
+
+# Batch mode: сколько URL одновременно «в полёте» по умолчанию и потолок пула
+DEFAULT_BATCH_CONCURRENCY = 8
+BATCH_POOL_MAX_WORKERS = 64
+
+# Один долгоживущий пул на весь процесс (создаётся лениво)
+_batch = {"pool": None}
+_batch_lock = threading.Lock()
+
+# Вызовы pyshorteners с таймаутом: общий пул на процесс вместо пула на каждый вызов.
+# Future, брошенные по дедлайну, лежат в "abandoned", пока поток не вернётся (done-callback их убирает).
+CALL_POOL_MAX_WORKERS = 16
+_calls: dict = {"pool": None, "abandoned": set()}
+_calls_lock = threading.Lock()
+
+# Hedged-режим ProviderRouter: свой пул и свой учёт брошенных ног, чтобы не занимать воркеры shorten_many
+HEDGE_POOL_MAX_WORKERS = 16
+_hedges: dict = {"pool": None, "abandoned": set()}
+_hedges_lock = threading.Lock()
 
-try:
-    import pyshorteners
-except Exception:
-    pyshorteners = None
+# Async: один httpx.AsyncClient на event loop (клиент привязан к своему циклу)
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
 
 
 def _looks_like_url(s: str) -> bool:
@@ -35,6 +108,196 @@ def _looks_like_url(s: str) -> bool:
     return p.scheme in ("http", "https") and bool(p.netloc)
 
 
+def _normalize_input(url: str) -> str:
+    # --- Early validate user input (before any provider call) ---
+    if not isinstance(url, str) or not url.strip():
+        raise ValueError("url must be a non-empty string")
+
+    # Normalize (trim spaces, validate scheme, etc.)
+    return normalize_url(url)
+
+
+def _tinyurl_api(norm: str) -> str:
+    return f"{_http['api_url']}?url={quote(norm, safe='')}"
+
+
+def _parse_tinyurl_response(resp: object) -> str:
+    """Validate a TinyURL API response (requests/httpx alike) and return the short link.
+
+    Non-200 statuses map to typed errors: 429 → RateLimitedError (with Retry-After),
+    5xx → ProviderUnavailableError, anything else → ProviderError.
+    """
+    status = getattr(resp, "status_code", HTTPStatus.OK)
+    if status == HTTPStatus.TOO_MANY_REQUESTS:
+        headers = getattr(resp, "headers", None) or {}
+        raise RateLimitedError(
+            f"TinyURL HTTP {status} Too Many Requests", retry_after=parse_retry_after(headers.get("Retry-After"))
+        )
+    if status >= HTTPStatus.INTERNAL_SERVER_ERROR:
+        raise ProviderUnavailableError(f"TinyURL HTTP {status}", status=status)
+    if status != HTTPStatus.OK:
+        raise ProviderError(f"TinyURL HTTP {status}", status=status)
+
+    short = getattr(resp, "text", "").strip()
+    if not _looks_like_url(short):
+        raise ValueError("TinyURL returned invalid payload")
+    return short
+
+
+# ---------- Pooled HTTP session ----------
+
+
+def _build_session() -> requests.Session:
+    import requests  # noqa: PLC0415
+    from requests.adapters import HTTPAdapter  # noqa: PLC0415
+    from urllib3.util.retry import Retry  # noqa: PLC0415
+
+    retry = Retry(
+        total=_http["retries"],
+        connect=_http["retries"],
+        read=0,
+        status=0,
+        backoff_factor=HTTP_BACKOFF,
+        allowed_methods=frozenset({"GET"}),
+        # 429/503 с Retry-After отдаём наверх как есть: паузы и бюджет решает urlcutter.retry
+        respect_retry_after_header=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_http["pool_size"], max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Connection"] = "keep-alive" if _http["keep_alive"] else "close"
+    return session
+
+
+def get_http_session() -> requests.Session:
+    """Return the process-wide pooled session for the direct API path (lazy, thread-safe)."""
+    session = _http["session"]
+    if session is None:
+        with _http_lock:
+            session = _http["session"]
+            if session is None:
+                session = _build_session()
+                _http["session"] = session
+    return session
+
+
+def reset_http_session() -> None:
+    """Close the shared session; the next request opens a fresh pool."""
+    with _http_lock:
+        session, _http["session"] = _http["session"], None
+    if session is not None:
+        session.close()
+
+
+def configure_http(
+    *,
+    api_url: str | None = None,
+    pool_size: int | None = None,
+    retries: int | None = None,
+    keep_alive: bool | None = None,
+) -> None:
+    """
+    Tune the shared session used by the direct TinyURL path.
+
+    `api_url` points the client at another endpoint (e.g. a local stand-in server in tests).
+    Options left as None keep their current value; the pool is rebuilt on next use.
+    """
+    if pool_size is not None and pool_size < 1:
+        raise ValueError("pool_size must be >= 1")
+    if retries is not None and retries < 0:
+        raise ValueError("retries must be >= 0")
+    with _http_lock:
+        if api_url is not None:
+            _http["api_url"] = api_url
+        if pool_size is not None:
+            _http["pool_size"] = pool_size
+        if retries is not None:
+            _http["retries"] = retries
+        if keep_alive is not None:
+            _http["keep_alive"] = keep_alive
+    reset_http_session()
+
+
+def _get_call_pool() -> ThreadPoolExecutor:
+    """Return the process-wide pool for deadline-bound pyshorteners calls (lazy, thread-safe)."""
+    pool = _calls["pool"]
+    if pool is None:
+        with _calls_lock:
+            pool = _calls["pool"]
+            if pool is None:
+                pool = ThreadPoolExecutor(max_workers=CALL_POOL_MAX_WORKERS, thread_name_prefix="urlcutter-call")
+                _calls["pool"] = pool
+    return pool
+
+
+def _forget_abandoned(registry: dict, fut: Future) -> None:
+    with _calls_lock:
+        registry["abandoned"].discard(fut)
+
+
+def _abandon(fut: Future, registry: dict = _calls) -> None:
+    """Give up on a call that missed its deadline without waiting for its thread.
+
+    The future is tracked in `registry["abandoned"]` (call pool by default) until it ends.
+    """
+    if fut.cancel():
+        return  # ещё стоял в очереди — поток не занят
+    with _calls_lock:
+        registry["abandoned"].add(fut)
+    # если уже успел завершиться, callback сработает сразу
+    fut.add_done_callback(partial(_forget_abandoned, registry))
+
+
+def _call_with_deadline(fn: Callable[..., str], *args: object, timeout: float) -> str:
+    """Run `fn(*args)` on the shared call pool and return or raise TimeoutError at `timeout`."""
+    # выход из `with ThreadPoolExecutor` ждал бы зависший вызов — поэтому общий пул без with
+    fut = _get_call_pool().submit(fn, *args)
+    try:
+        return fut.result(timeout=timeout)
+    except TimeoutError:
+        _abandon(fut)
+        raise
+
+
+def abandoned_calls() -> int:
+    """How many timed-out provider calls are still running in the background."""
+    return len(_calls["abandoned"])
+
+
+def _get_hedge_pool() -> ThreadPoolExecutor:
+    """Return the process-wide pool for hedged router legs (lazy, thread-safe)."""
+    pool = _hedges["pool"]
+    if pool is None:
+        with _hedges_lock:
+            pool = _hedges["pool"]
+            if pool is None:
+                pool = ThreadPoolExecutor(max_workers=HEDGE_POOL_MAX_WORKERS, thread_name_prefix="urlcutter-hedge")
+                _hedges["pool"] = pool
+    return pool
+
+
+def abandoned_hedges() -> int:
+    """How many cancelled hedged-router legs (losers, deadline misses) are still running."""
+    return len(_hedges["abandoned"])
+
+
+def _accepts_timeout(factory: Callable[..., object]) -> bool:
+    try:
+        params = inspect.signature(factory).parameters.values()
+    except (TypeError, ValueError):
+        return False
+    return any(p.name == "timeout" or p.kind is inspect.Parameter.VAR_KEYWORD for p in params)
+
+
+def _make_shortener(factory: Callable[..., object], timeout: float | None) -> object:
+    # pyshorteners.Shortener(timeout=...) передаёт таймаут в requests — сокет не висит дольше дедлайна.
+    # Он делает int(timeout), поэтому округляем вверх: 0.3 → 1, а не 0 (= «без таймаута» → ошибка)
+    if timeout is not None and _accepts_timeout(factory):
+        return factory(timeout=max(1, math.ceil(timeout)))
+    return factory()
+
+
 def shorten_via_tinyurl_core(
     url: str,
     timeout: float | None = None,
@@ -46,65 +309,772 @@ def shorten_via_tinyurl_core(
     """Return a TinyURL short link for `url`.
 
     Behavior:
-      - If `_get` is provided, use direct HTTP API (TinyURL endpoint).
-      - Otherwise use `pyshorteners.Shortener().tinyurl.short(...)`.
-      - If `timeout` is provided in the pyshorteners path, call via a pool and
-        pass the timeout to `future.result(timeout=...)`.
+      - If `_get` is provided, use direct HTTP API (TinyURL endpoint) through it.
+      - If `_shortener_factory` is provided, use `factory().tinyurl.short(...)` (pyshorteners).
+      - Otherwise use the direct HTTP API over the shared pooled session.
+      - If `timeout` is provided in the pyshorteners path, it is passed to the factory
+        (socket timeout, when the factory takes `timeout`) and enforced as a deadline:
+        the call runs on a shared pool and we return at `timeout` without waiting for
+        the worker; the stray call is tracked (see `abandoned_calls`) until it ends.
+        An injected `_pool_factory` is used instead, as `with factory(max_workers=1)`.
 
     Raises:
       ValueError   — bad input, or provider returned non‑URL payload.
       TimeoutError — when pyshorteners path exceeds the given timeout.
-      RuntimeError — network/provider errors in other cases.
+      RateLimitedError / ProviderUnavailableError / ProviderError — HTTP 429 / 5xx or
+                     connection failure / other statuses on the direct path (all RuntimeError).
+      RuntimeError — other provider errors in the pyshorteners path.
     """
-    # --- Early validate user input (before any provider call) ---
-    if not isinstance(url, str) or not url.strip():
-        raise ValueError("url must be a non-empty string")
-
-    # 1) Normalize (trim spaces, validate scheme, etc.)
-    norm = normalize_url(url)
+    norm = _normalize_input(url)
 
-    # --- A) Direct HTTP path (used by new unit-tests) ---
-    if _get is not None:
-        get = _get or requests.get
-        api = f"https://tinyurl.com/api-create.php?url={quote(norm, safe='')}"
+    # --- A) Direct HTTP path (default; `_get` injected by unit-tests) ---
+    if _get is not None or _shortener_factory is None:
+        get = _get or get_http_session().get
+        api = _tinyurl_api(norm)
         try:
             resp = get(api, timeout=(timeout or DEFAULT_HTTP_TIMEOUT))
         except Exception as e:
-            raise RuntimeError(f"TinyURL request failed: {e}") from e
-
-        if getattr(resp, "status_code", HTTPStatus.OK) != HTTPStatus.OK:
-            raise RuntimeError(f"TinyURL HTTP {resp.status_code}")
-
-        short = getattr(resp, "text", "").strip()
-        if not _looks_like_url(short):
-            raise ValueError("TinyURL returned invalid payload")
-        return short
+            raise ProviderUnavailableError(f"TinyURL request failed: {e}") from e
+        return _parse_tinyurl_response(resp)
 
     # --- B) pyshorteners + thread pool (legacy tests expect this) ---
     try:
-        shortener_factory = _shortener_factory
-        if shortener_factory is None:
-            if pyshorteners is None:
-                raise RuntimeError("pyshorteners is required for TinyURL but is not installed.")
-            shortener_factory = pyshorteners.Shortener
-
-        shortener = shortener_factory()
+        shortener = _make_shortener(_shortener_factory, timeout)
         tiny = shortener.tinyurl
 
         if timeout is None:
             return tiny.short(norm)
 
-        pool_factory = _pool_factory or ThreadPoolExecutor
-        with pool_factory(max_workers=1) as pool:
-            fut = pool.submit(partial(tiny.short, norm))
-            return fut.result(timeout=timeout)
+        if _pool_factory is not None:
+            with _pool_factory(max_workers=1) as pool:
+                fut = pool.submit(partial(tiny.short, norm))
+                return fut.result(timeout=timeout)
+
+        return _call_with_deadline(tiny.short, norm, timeout=timeout)
 
     except TimeoutError:
         # Propagate exactly as tests expect
         raise
-    except ValueError:
-        # Respect provider's own ValueError if any
+    except (ValueError, ProviderError):
+        # Respect provider's own ValueError / typed errors if any
         raise
     except Exception as e:
         # Any other provider/pool error → RuntimeError
         raise RuntimeError(f"TinyURL provider error: {e}") from e
+
+
+# ---------- Providers and routing ----------
+
+# Бэкенды pyshorteners, которым не нужен API-ключ
+KEYLESS_PYSHORTENERS = ("isgd", "dagd", "clckru")
+PROVIDERS_ENV = "URLCUTTER_PROVIDERS"  # через запятую, в порядке предпочтения; по умолчанию только tinyurl
+DEFAULT_PROVIDERS = ("tinyurl",)
+
+ROUTER_EWMA_ALPHA = 0.3  # вес свежего замера в EWMA
+ROUTER_MAX_ERROR_RATE = 0.5  # выше — провайдер уходит в конец очереди
+ROUTER_EXPLORE_EVERY = 20  # каждый N-й запрос идёт к давно не опрошенному провайдеру, чтобы обновить оценку
+
+# Hedging (opt-in): если основной провайдер не ответил за свой p-й перцентиль латентности,
+# тот же URL уходит второму, берём первый валидный ответ
+HEDGE_ENV = "URLCUTTER_HEDGE_PERCENTILE"  # "0.95" или "95"; пусто — hedging выключен
+LATENCY_WINDOW = 200  # сколько последних замеров держим на провайдера для перцентиля
+HEDGE_MIN_SAMPLES = 10  # пока замеров меньше — ждём HEDGE_DEFAULT_DELAY_SEC
+HEDGE_DEFAULT_DELAY_SEC = 1.0
+HEDGE_MIN_DELAY_SEC = 0.05  # не дублируем запросы раньше, даже если провайдер очень быстрый
+
+
+class Provider(Protocol):
+    """Common interface of a shortening backend."""
+
+    name: str
+
+    def shorten(self, url: str, timeout: float | None = None) -> str: ...
+
+
+class TinyURLProvider:
+    """TinyURL over the direct API and the shared pooled session."""
+
+    name = "tinyurl"
+
+    def shorten(self, url: str, timeout: float | None = None) -> str:
+        return shorten_via_tinyurl_core(url, timeout)
+
+
+class PyshortenersProvider:
+    """Any pyshorteners backend (`Shortener().<backend>.short`), deadline-bound like the TinyURL path."""
+
+    def __init__(self, backend: str, *, name: str | None = None, factory: Callable[..., object] | None = None):
+        self.backend = backend
+        self.name = name or backend
+        self._factory = factory
+        # Shortener() на каждый вызов — это ещё и pkgutil-скан его провайдеров; держим по экземпляру
+        # на «сокетный» таймаут (целые секунды, как в _make_shortener) — ключей единицы
+        self._shorteners: dict[int | None, object] = {}
+        self._lock = threading.Lock()
+
+    def _shortener(self, timeout: float | None) -> object:
+        key = None if timeout is None else max(1, math.ceil(timeout))
+        shortener = self._shorteners.get(key)
+        if shortener is None:
+            if self._factory is None:
+                import pyshorteners  # noqa: PLC0415
+
+                factory = pyshorteners.Shortener
+            else:
+                factory = self._factory
+            with self._lock:
+                shortener = self._shorteners.get(key)
+                if shortener is None:
+                    shortener = self._shorteners[key] = _make_shortener(factory, key)
+        return shortener
+
+    def shorten(self, url: str, timeout: float | None = None) -> str:
+        norm = _normalize_input(url)
+        try:
+            backend = getattr(self._shortener(timeout), self.backend)
+            if timeout is None:
+                short = backend.short(norm)
+            else:
+                short = _call_with_deadline(backend.short, norm, timeout=timeout)
+        except (TimeoutError, ValueError, ProviderError):
+            raise
+        except Exception as e:
+            raise ProviderUnavailableError(f"{self.name} provider error: {e}", provider=self.name) from e
+        short = str(short).strip()
+        if not _looks_like_url(short):
+            raise ValueError(f"{self.name} returned invalid payload")
+        return short
+
+
+class FunctionProvider:
+    """Adapter for a plain `fn(url, timeout) -> short_url` callable."""
+
+    def __init__(self, name: str, fn: Callable[[str, float | None], str]):
+        self.name = name
+        self._fn = fn
+
+    def shorten(self, url: str, timeout: float | None = None) -> str:
+        return self._fn(url, timeout)
+
+
+class LocalProvider:
+    """Built-in offline shortener: base62 codes in the history DB (see db.repo.local_codes)."""
+
+    name = "local"
+    offline = True  # работает без сети: handlers не требуют internet_ok для него
+
+    def __init__(self, store: LocalCodeStore | None = None):
+        self._store = store
+        self._lock = threading.Lock()
+
+    @property
+    def store(self) -> LocalCodeStore:
+        # SQLAlchemy и БД — только при первом использовании, не при импорте shorteners
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    from urlcutter.db.repo.local_codes import LocalCodeStore  # noqa: PLC0415
+
+                    self._store = LocalCodeStore()
+        return self._store
+
+    def shorten(self, url: str, timeout: float | None = None) -> str:
+        from urlcutter.db.repo.errors import StorageError  # noqa: PLC0415
+
+        try:
+            store = self.store
+        except ValueError as e:
+            # кривой URLCUTTER_LOCAL_BASE_URL — ошибка настройки, а не ввода: роутер должен уйти на другого
+            raise ProviderUnavailableError(f"local provider misconfigured: {e}", provider=self.name) from e
+        try:
+            return store.shorten(url).short_url
+        except StorageError as e:
+            raise ProviderUnavailableError(f"local store error: {e}", provider=self.name) from e
+
+
+_providers: dict[str, Provider] = {"tinyurl": TinyURLProvider(), "local": LocalProvider()}
+_providers.update({b: PyshortenersProvider(b) for b in KEYLESS_PYSHORTENERS})
+
+
+def register_provider(provider: Provider) -> None:
+    """Add or replace a provider in the process-wide registry (keyed by `provider.name`)."""
+    _providers[provider.name] = provider
+
+
+def get_provider(name: str) -> Provider:
+    try:
+        return _providers[name]
+    except KeyError:
+        raise ValueError(f"unknown shortening provider: {name!r}") from None
+
+
+def available_providers() -> list[str]:
+    return list(_providers)
+
+
+def hedge_percentile_from_env(env: dict[str, str] | None = None) -> float | None:
+    """Hedging percentile from URLCUTTER_HEDGE_PERCENTILE ("0.95" / "95"), None when unset."""
+    raw = (env if env is not None else os.environ).get(HEDGE_ENV, "").strip()
+    if not raw:
+        return None
+    try:
+        q = float(raw.rstrip("%").lstrip("pP"))
+    except ValueError:
+        raise ValueError(f"{HEDGE_ENV} must be a percentile like 0.95 or 95, got {raw!r}") from None
+    q = q / 100 if q > 1 else q
+    if not 0 < q < 1:
+        raise ValueError(f"{HEDGE_ENV} must be between 0 and 100, got {raw!r}")
+    return q
+
+
+def providers_from_env(env: dict[str, str] | None = None) -> list[Provider]:
+    """Providers listed in URLCUTTER_PROVIDERS (e.g. "tinyurl,isgd"), default: tinyurl only."""
+    raw = (env if env is not None else os.environ).get(PROVIDERS_ENV, "")
+    names = [n.strip().lower() for n in raw.split(",") if n.strip()] or list(DEFAULT_PROVIDERS)
+    return [get_provider(n) for n in dict.fromkeys(names)]
+
+
+class _ProviderStats:
+    __slots__ = ("latency", "errors", "last_used", "cool_until", "breaker", "samples")
+
+    def __init__(self, breaker: CircuitBreaker) -> None:
+        self.latency: float | None = None  # EWMA, сек; None — ещё не мерили
+        self.errors = 0.0  # EWMA доли ошибок
+        self.last_used = 0.0
+        self.cool_until = 0.0  # Retry-After от провайдера
+        self.breaker = breaker
+        self.samples: deque[float] = deque(maxlen=LATENCY_WINDOW)  # последние латентности для перцентиля
+
+
+class _HedgedCall:
+    """One hedged `ProviderRouter.shorten` call: primary, a hedge after its pN latency, failover on errors."""
+
+    def __init__(self, router: ProviderRouter, url: str, timeout: float | None) -> None:
+        self.router = router
+        self.url = url
+        self.timeout = timeout
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.queue = iter(router.ranked())
+        self.running: dict[Future, tuple[Provider, float]] = {}
+        self.primary: Provider | None = None
+        self.hedge_at = 0.0
+        self.hedged = False
+        # срок хеджа прошёл: дальше ждём только дедлайн, даже если запустить было некого
+        self.hedge_tried = False
+        self.last: Exception | None = None
+
+    def _left(self) -> float | None:
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def _launch(self) -> Provider | None:
+        """Start the next provider whose breaker lets us in."""
+        for p in self.queue:
+            if self.router._stats[p.name].breaker.allow():
+                fut = _get_hedge_pool().submit(p.shorten, self.url, self._left())
+                self.running[fut] = (p, time.monotonic())
+                return p
+        return None
+
+    def _drop_running(self) -> None:
+        # проигравших не ждём: отменяем/бросаем, а цензурированную латентность учитываем
+        for fut, (p, t0) in self.running.items():
+            _abandon(fut, _hedges)
+            self.router._observe(p.name, time.monotonic() - t0)
+        self.running.clear()
+
+    def _wait_for(self) -> float | None:
+        left = self._left()
+        if self.hedge_tried:
+            return left
+        until_hedge = max(0.0, self.hedge_at - time.monotonic())
+        return until_hedge if left is None else min(left, until_hedge)
+
+    def _start_primary(self) -> bool:
+        self.primary = self._launch()
+        if self.primary is None:
+            return False
+        self.hedge_at = time.monotonic() + self.router.hedge_delay(self.primary.name)
+        return True
+
+    def _finish(self, fut: Future) -> tuple[str, str] | None:
+        p, t0 = self.running.pop(fut)
+        try:
+            short = fut.result()
+        except ValueError:
+            self.router._stats[p.name].breaker.record_success()  # провайдер жив, виноват ввод
+            self._drop_running()
+            raise
+        except Exception as e:
+            self.router._record(p.name, time.monotonic() - t0, e)
+            self.last = e
+            return None
+        self.router._record(p.name, time.monotonic() - t0, None)
+        self._drop_running()
+        if self.hedged and p is not self.primary:
+            self.router._count_hedge(won=True)
+        return short, p.name
+
+    def run(self) -> tuple[str, str]:
+        self.router._count_hedge(requests=True)
+        self._start_primary()
+        timed_out = False
+        while self.running:
+            left = self._left()
+            if left is not None and left <= 0:
+                timed_out = True
+                break
+            done, _ = wait(list(self.running), timeout=self._wait_for(), return_when=FIRST_COMPLETED)
+            for fut in done:
+                result = self._finish(fut)
+                if result is not None:
+                    return result
+            if not self.running:
+                # все запущенные упали — обычный failover на следующего
+                self._start_primary()
+            elif not self.hedge_tried and time.monotonic() >= self.hedge_at:
+                # некого запустить (breaker открыт, очередь исчерпана) — всё равно больше не пытаемся,
+                # иначе _wait_for() вернёт 0 и цикл закрутится вхолостую
+                self.hedge_tried = True
+                if self._launch() is not None:
+                    # считаем в момент запуска: хедж, который потом упал или не успел, тоже хедж
+                    self.hedged = True
+                    self.router._count_hedge(hedged=True)
+        self._drop_running()
+        if timed_out:
+            # общий дедлайн важнее ошибки провайдера, упавшего раньше
+            raise TimeoutError(f"no provider answered in {self.timeout}s") from self.last
+        if self.last is not None:
+            raise self.last
+        raise ProviderUnavailableError("all shortening providers are cooling down", provider="router")
+
+
+class ProviderRouter:
+    """
+    Routes each request to the fastest healthy provider and fails over to the next one.
+
+    Per provider it keeps an EWMA of latency and of the error rate, its own
+    CircuitBreaker and the Retry-After pause of the last 429. The order is:
+    not yet measured providers first (to learn their latency), then by latency EWMA.
+    Providers above `max_error_rate` go to the end. Every `explore_every`-th request
+    the least recently used healthy provider goes first, so the estimate of a
+    provider that was slow once does not go stale.
+
+    Bad input (ValueError) is raised at once: another provider would reject it too.
+
+    With `hedge_percentile` set (opt-in), a request that the primary provider has not
+    answered within that percentile of its recent latencies is also sent to the next
+    provider. The first valid answer wins and the loser is cancelled. See hedge_metrics().
+    Hedging runs on real (monotonic) time, whatever `clock` is.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        providers: Iterable[Provider],
+        *,
+        alpha: float = ROUTER_EWMA_ALPHA,
+        max_error_rate: float = ROUTER_MAX_ERROR_RATE,
+        explore_every: int = ROUTER_EXPLORE_EVERY,
+        breaker_factory: Callable[[], CircuitBreaker] = CircuitBreaker,
+        clock: Callable[[], float] = time.monotonic,
+        hedge_percentile: float | None = None,
+        hedge_default_delay: float = HEDGE_DEFAULT_DELAY_SEC,
+    ) -> None:
+        self.providers = list(providers)
+        if not self.providers:
+            raise ValueError("router needs at least one provider")
+        self.alpha = alpha
+        self.max_error_rate = max_error_rate
+        self.explore_every = explore_every
+        self.clock = clock
+        self._stats = {p.name: _ProviderStats(breaker_factory()) for p in self.providers}
+        self._requests = 0
+        self._lock = threading.Lock()
+        if hedge_percentile is not None and not 0 < hedge_percentile < 1:
+            raise ValueError("hedge_percentile must be in (0, 1)")
+        self.hedge_percentile = hedge_percentile
+        self.hedge_default_delay = hedge_default_delay
+        self._hedge = {"requests": 0, "hedged": 0, "hedge_wins": 0}
+
+    def stats(self, name: str) -> dict:
+        st = self._stats[name]
+        return {"latency": st.latency, "error_rate": st.errors, "breaker": st.breaker.state()}
+
+    def ranked(self) -> list[Provider]:
+        """Providers in the order the next request would try them."""
+        now = self.clock()
+        with self._lock:
+            self._requests += 1
+            explore = self.explore_every > 0 and self._requests % self.explore_every == 0
+            order = {p.name: i for i, p in enumerate(self.providers)}
+
+            def key(p: Provider) -> tuple:
+                st = self._stats[p.name]
+                unhealthy = st.errors > self.max_error_rate or now < st.cool_until
+                latency = -1.0 if st.latency is None else st.latency
+                return (unhealthy, latency, order[p.name])
+
+            ranked = sorted(self.providers, key=key)
+            if explore and len(ranked) > 1:
+                healthy = [p for p in ranked if key(p)[0] is False] or ranked
+                stale = min(healthy, key=lambda p: self._stats[p.name].last_used)
+                ranked.remove(stale)
+                ranked.insert(0, stale)
+            return ranked
+
+    def _observe(self, name: str, elapsed: float) -> None:
+        """Latency sample without an outcome (e.g. a cancelled hedge loser: a lower bound)."""
+        with self._lock:
+            st = self._stats[name]
+            st.latency = elapsed if st.latency is None else self.alpha * elapsed + (1 - self.alpha) * st.latency
+            st.samples.append(elapsed)
+
+    def hedge_delay(self, name: str) -> float:
+        """How long to wait for `name` before hedging: its latency percentile over the recent window."""
+        with self._lock:
+            samples = sorted(self._stats[name].samples)
+        if self.hedge_percentile is None or len(samples) < HEDGE_MIN_SAMPLES:
+            return self.hedge_default_delay
+        idx = min(len(samples) - 1, max(0, math.ceil(self.hedge_percentile * len(samples)) - 1))
+        return max(HEDGE_MIN_DELAY_SEC, samples[idx])
+
+    def _count_hedge(self, *, requests: bool = False, hedged: bool = False, won: bool = False) -> None:
+        with self._lock:
+            self._hedge["requests"] += requests
+            self._hedge["hedged"] += hedged
+            self._hedge["hedge_wins"] += won
+
+    def hedge_metrics(self) -> dict:
+        """Hedged-mode counters: how often hedges fire and how often the hedge beats the primary."""
+        with self._lock:
+            m = dict(self._hedge)
+        m["fire_rate"] = m["hedged"] / m["requests"] if m["requests"] else 0.0
+        m["win_rate"] = m["hedge_wins"] / m["hedged"] if m["hedged"] else 0.0
+        return m
+
+    def _record(self, name: str, elapsed: float, error: Exception | None) -> None:
+        now = self.clock()
+        with self._lock:
+            st = self._stats[name]
+            a = self.alpha
+            st.latency = elapsed if st.latency is None else a * elapsed + (1 - a) * st.latency
+            if error is None:
+                st.samples.append(elapsed)
+            st.errors = a * (1.0 if error is not None else 0.0) + (1 - a) * st.errors
+            st.last_used = now
+            if isinstance(error, RateLimitedError) and error.retry_after:
+                st.cool_until = now + error.retry_after
+        if error is None:
+            st.breaker.record_success()
+        else:
+            st.breaker.record_failure()
+
+    def shorten(self, url: str, timeout: float | None = None) -> tuple[str, str]:
+        """Return `(short_url, provider_name)`; raise the last provider error if all of them fail.
+
+        `timeout` bounds the whole call: a failover gets only what is left of it.
+        """
+        if self.hedge_percentile is not None and len(self.providers) > 1:
+            return _HedgedCall(self, url, timeout).run()
+        last: Exception | None = None
+        deadline = None if timeout is None else self.clock() + timeout
+        for provider in self.ranked():
+            st = self._stats[provider.name]
+            left = None if deadline is None else deadline - self.clock()
+            if left is not None and left <= 0:
+                break
+            if not st.breaker.allow():
+                continue
+            t0 = self.clock()
+            try:
+                short = provider.shorten(url, left)
+            except ValueError:
+                st.breaker.record_success()  # провайдер жив, виноват ввод; отпускаем слот пробы
+                raise
+            except Exception as e:
+                self._record(provider.name, self.clock() - t0, e)
+                last = e
+                continue
+            self._record(provider.name, self.clock() - t0, None)
+            return short, provider.name
+        if deadline is not None and self.clock() >= deadline:
+            # как в hedged-режиме: общий дедлайн важнее ошибки провайдера, упавшего раньше
+            raise TimeoutError(f"no provider answered in {timeout}s") from last
+        if last is not None:
+            raise last
+        raise ProviderUnavailableError("all shortening providers are cooling down", provider="router")
+
+
+# ---------- Batch mode ----------
+
+
+def _get_batch_pool() -> ThreadPoolExecutor:
+    """Return the process-wide worker pool used by `shorten_many` (lazy, thread-safe)."""
+    pool = _batch["pool"]
+    if pool is None:
+        with _batch_lock:
+            pool = _batch["pool"]
+            if pool is None:
+                pool = ThreadPoolExecutor(max_workers=BATCH_POOL_MAX_WORKERS, thread_name_prefix="urlcutter-batch")
+                _batch["pool"] = pool
+    return pool
+
+
+def _batch_worker(
+    timeout: float | None,
+    *,
+    _get: Callable[..., object] | None,
+    _shortener_factory: Callable[[], object] | None,
+) -> Callable[[str], str]:
+    """Build the per-item callable for `shorten_many` (one Shortener per batch)."""
+    if _get is not None:
+        # прямой HTTP: таймаут уходит в сам запрос
+        return partial(shorten_via_tinyurl_core, timeout=timeout, _get=_get)
+
+    if _shortener_factory is None:
+        return partial(shorten_via_tinyurl_core, timeout=timeout, _get=get_http_session().get)
+
+    # как у одиночного вызова: таймаут и в сокет Shortener, не только в ожидание future
+    shortener = _make_shortener(_shortener_factory, timeout)
+    return partial(shorten_via_tinyurl_core, _shortener_factory=lambda: shortener)
+
+
+def _batch_result(fut: Future) -> str | Exception:
+    """Result of a finished batch item, or its error mapped to the documented types."""
+    try:
+        return fut.result()
+    except (ValueError, TimeoutError, RuntimeError) as e:
+        return e
+    except Exception as e:
+        return RuntimeError(f"TinyURL provider error: {e}")
+
+
+def shorten_many(
+    urls: Iterable[str],
+    concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    timeout: float | None = None,
+    *,
+    _get: Callable[..., object] | None = None,
+    _shortener_factory: Callable[[], object] | None = None,
+    _pool: ThreadPoolExecutor | None = None,
+    breaker: CircuitBreaker | None = None,
+) -> Iterator[tuple[str, str | Exception]]:
+    """Shorten many URLs, yielding `(input, short_url | error)` in completion order.
+
+    Behavior:
+      - At most `concurrency` URLs are in flight; the rest are pulled lazily from `urls`.
+      - Work runs on one long-lived pool (see `_get_batch_pool`); no pool per call.
+      - An injected Shortener factory is called once for the whole batch.
+      - `timeout` is a per-item deadline counted from submission; an item that misses
+        it is reported as `TimeoutError` and its slot is given to the next URL.
+      - With a `breaker` (e.g. `breaker_for("tinyurl")`), provider failures and timeouts
+        are recorded on it, and while it is open the remaining URLs are reported as
+        `RuntimeError` without hitting the provider. In half-open it admits only its probes.
+
+    Per-item errors are yielded, not raised, with the same types as
+    `shorten_via_tinyurl_core`: ValueError / TimeoutError / RuntimeError.
+
+    Raises:
+      ValueError — `concurrency` < 1 (at call time, not on the first `next()`).
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be >= 1")
+    return _shorten_many_iter(
+        urls,
+        min(concurrency, BATCH_POOL_MAX_WORKERS),
+        timeout,
+        _get=_get,
+        _shortener_factory=_shortener_factory,
+        _pool=_pool,
+        breaker=breaker,
+    )
+
+
+def _shorten_many_iter(  # noqa: PLR0913
+    urls: Iterable[str],
+    concurrency: int,
+    timeout: float | None,
+    *,
+    _get: Callable[..., object] | None,
+    _shortener_factory: Callable[[], object] | None,
+    _pool: ThreadPoolExecutor | None,
+    breaker: CircuitBreaker | None,
+) -> Iterator[tuple[str, str | Exception]]:
+    pool = _pool or _get_batch_pool()
+
+    one = _batch_worker(timeout, _get=_get, _shortener_factory=_shortener_factory)
+
+    pending = iter(urls)
+    inflight: dict[Future, tuple[str, float | None]] = {}
+    rejected: list[str] = []  # предохранитель не пустил — в сеть не ходили
+
+    def _fill() -> None:
+        while len(inflight) < concurrency:
+            try:
+                u = next(pending)
+            except StopIteration:
+                return
+            if breaker is not None and not breaker.allow():
+                rejected.append(u)
+                if len(rejected) >= concurrency:
+                    return  # отдадим отказы потребителю, не вычитывая весь вход разом
+                continue
+            deadline = None if timeout is None else time.monotonic() + timeout
+            inflight[pool.submit(one, u)] = (u, deadline)
+
+    def _outcome(u: str, res: str | Exception) -> tuple[str, str | Exception]:
+        if breaker is not None:
+            if isinstance(res, str | ValueError):
+                # ValueError — виноват ввод, провайдер жив: как в ProviderRouter, проба считается завершённой
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+        return u, res
+
+    try:
+        _fill()
+        while inflight or rejected:
+            while rejected:
+                yield rejected.pop(0), RuntimeError("TinyURL circuit open: request skipped")
+            if not inflight:
+                _fill()
+                continue
+            deadlines = [d for _, d in inflight.values() if d is not None]
+            wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            done, _ = wait(list(inflight), timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for fut in done:
+                u, _ = inflight.pop(fut)
+                yield _outcome(u, _batch_result(fut))
+
+            now = time.monotonic()
+            for fut, (u, deadline) in list(inflight.items()):
+                if deadline is not None and now >= deadline:
+                    # не ждём зависший вызов: отдаём слот следующему URL, а поток учитываем в abandoned_calls()
+                    _abandon(fut)
+                    del inflight[fut]
+                    yield _outcome(u, TimeoutError(f"TinyURL did not respond in {timeout}s"))
+
+            _fill()
+    finally:
+        # потребитель мог прервать итерацию — хвост из очереди снимаем, запущенные учитываем
+        for fut in inflight:
+            _abandon(fut)
+
+
+# ---------- Asyncio mode ----------
+
+
+def get_async_client():
+    """
+    Return the shared `httpx.AsyncClient` for the running event loop (created on first use).
+
+    All coroutines on the loop share one connection pool sized like the sync session.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        try:
+            import httpx  # noqa: PLC0415
+        except ImportError as e:
+            raise RuntimeError("httpx is required for async shortening but is not installed.") from e
+
+        limits = httpx.Limits(max_connections=_http["pool_size"], max_keepalive_connections=_http["pool_size"])
+        transport = httpx.AsyncHTTPTransport(limits=limits, retries=_http["retries"])
+        client = httpx.AsyncClient(transport=transport, timeout=DEFAULT_HTTP_TIMEOUT)
+        _async_clients[loop] = client
+    return client
+
+
+async def aclose_async_client() -> None:
+    """Close the shared client of the running loop (call before the loop shuts down)."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _is_httpx_timeout(e: Exception) -> bool:
+    httpx = sys.modules.get("httpx")
+    return httpx is not None and isinstance(e, httpx.TimeoutException)
+
+
+async def ashorten(url: str, timeout: float | None = None, *, client: object | None = None) -> str:
+    """Async counterpart of the direct TinyURL path.
+
+    `timeout` is a hard per-request deadline: the request is cancelled when it expires.
+    `client` is anything with `await client.get(url, timeout=...)` (httpx-like); the
+    shared loop client is used by default.
+
+    Raises:
+      ValueError   — bad input, or provider returned non-URL payload.
+      TimeoutError — the deadline expired.
+      RuntimeError — network/provider errors.
+    """
+    norm = _normalize_input(url)
+    client = client or get_async_client()
+    limit = timeout or DEFAULT_HTTP_TIMEOUT
+
+    try:
+        resp = await asyncio.wait_for(client.get(_tinyurl_api(norm), timeout=limit), timeout=limit)
+    except asyncio.TimeoutError as e:  # noqa: UP041 — на 3.10 это не встроенный TimeoutError
+        raise TimeoutError(f"TinyURL did not respond in {limit}s") from e
+    except Exception as e:
+        # таймаут самого httpx — тоже TimeoutError, остальное → RuntimeError
+        if _is_httpx_timeout(e):
+            raise TimeoutError(f"TinyURL did not respond in {limit}s") from e
+        raise ProviderUnavailableError(f"TinyURL request failed: {e}") from e
+    return _parse_tinyurl_response(resp)
+
+
+def ashorten_many(
+    urls: Iterable[str],
+    concurrency: int = DEFAULT_BATCH_CONCURRENCY,
+    timeout: float | None = None,
+    *,
+    client: object | None = None,
+) -> AsyncIterator[tuple[str, str | Exception]]:
+    """Async batch: yield `(input, short_url | error)` in completion order.
+
+    Up to `concurrency` requests are in flight on the current loop; each one has its own
+    `timeout` deadline. Closing the generator early cancels whatever is still running.
+
+    Raises:
+      ValueError — `concurrency` < 1 (at call time, not on the first `__anext__()`).
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be >= 1")
+    return _ashorten_many_iter(urls, concurrency, timeout, client)
+
+
+async def _ashorten_many_iter(
+    urls: Iterable[str],
+    concurrency: int,
+    timeout: float | None,
+    client: object | None,
+) -> AsyncIterator[tuple[str, str | Exception]]:
+    client = client or get_async_client()
+
+    pending = iter(urls)
+    inflight: dict[asyncio.Task, str] = {}
+
+    def _fill() -> None:
+        for u in pending:
+            inflight[asyncio.ensure_future(ashorten(u, timeout, client=client))] = u
+            if len(inflight) >= concurrency:
+                return
+
+    try:
+        _fill()
+        while inflight:
+            done, _ = await asyncio.wait(list(inflight), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                u = inflight.pop(task)
+                try:
+                    yield u, task.result()
+                except (ValueError, TimeoutError, RuntimeError) as e:
+                    yield u, e
+            _fill()
+    finally:
+        for task in inflight:
+            task.cancel()
+        # дожидаемся отмены: иначе «Task was destroyed but it is pending» и недоделанные запросы клиента
+        await asyncio.gather(*inflight, return_exceptions=True)
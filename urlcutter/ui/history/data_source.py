@@ -0,0 +1,89 @@
+"""Lazy data source for the History screen.
+
+Экран не держит выборку в памяти: каждая страница — это один вызов
+`HistoryService.list()` с фильтрами, сортировкой и размером страницы.
+Соседние страницы листаются keyset-курсорами (CursorSpec), номера страниц,
+до которых ещё не дошли курсором, читаются обычным PageSpec.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Iterator
+from datetime import datetime
+
+from urlcutter.db.repo.history_service import HistoryService
+from urlcutter.db.repo.schemas import CursorSpec, HistoryFilters, LinkRecord, PageSpec, SortSpec
+
+# Размер пачки при выгрузке всей выборки (экспорт)
+EXPORT_CHUNK_SIZE = 500
+
+
+def _default_fmt(dt: datetime | None) -> str:
+    return dt.strftime("%Y-%m-%d %H:%M") if dt else "—"
+
+
+class HistoryDataSource:
+    """Страницы истории по запросу; текущие фильтры и курсоры живут здесь, а не во view."""
+
+    def __init__(
+        self,
+        service: HistoryService,
+        *,
+        fmt_dt: Callable[[datetime | None], str] | None = None,
+        sort: SortSpec | None = None,
+    ) -> None:
+        self.service = service
+        self.sort = sort or SortSpec(field="created_at", direction="desc")
+        self.filters = HistoryFilters()
+        self.total = 0  # total последней прочитанной страницы
+        self._fmt_dt = fmt_dt or _default_fmt
+        self._page_size: int | None = None
+        self._cursors: dict[int, str | None] = {1: None}  # page_idx -> after-токен
+
+    def set_filters(self, filters: HistoryFilters) -> None:
+        self.filters = filters
+        self._cursors = {1: None}
+
+    def _row(self, r: LinkRecord) -> dict:
+        def safe(v, default="—"):
+            return v if (v is not None and v != "") else default
+
+        return {
+            "id": r.id,
+            "created_at_local": self._fmt_dt(r.created_at_utc),
+            "service": safe(r.service),
+            "long_url": safe(r.long_url),
+            "short_url": safe(r.short_url),
+        }
+
+    def fetch(self, page_idx: int, page_size: int) -> tuple[list[dict], int]:
+        """Строки страницы `page_idx` (1-based) и общее число записей по фильтрам."""
+        if page_size != self._page_size:
+            self._page_size = page_size
+            self._cursors = {1: None}
+
+        if page_idx in self._cursors:
+            spec = CursorSpec(after=self._cursors[page_idx], page_size=page_size)
+            hp = self.service.list(self.filters, self.sort, spec)
+            if hp.next_cursor:
+                self._cursors[page_idx + 1] = hp.next_cursor
+        else:
+            hp = self.service.list(self.filters, self.sort, PageSpec(page=page_idx, page_size=page_size))
+
+        self.total = hp.total
+        return [self._row(r) for r in hp.items], hp.total
+
+    def services(self) -> list[str]:
+        return self.service.distinct_services()
+
+    def iter_rows(self, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[dict]:
+        """Вся выборка по текущим фильтрам, пачками по keyset-курсору."""
+        cursor = None
+        while True:
+            spec = CursorSpec(after=cursor, page_size=chunk_size, total="skip")
+            hp = self.service.list(self.filters, self.sort, spec)
+            for r in hp.items:
+                yield self._row(r)
+            if not hp.next_cursor:
+                return
+            cursor = hp.next_cursor
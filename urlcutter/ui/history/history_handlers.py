@@ -8,6 +8,8 @@ from datetime import datetime, timedelta
 
 import flet as ft
 
+from urlcutter.db.repo.schemas import HistoryFilters
+
 
 @dataclass
 class HistoryContext:
@@ -22,13 +24,15 @@ class HistoryContext:
     _build_service_options: callable
     page_state: dict  # 👈 словарь с page_idx и page_size_val
     table_column_ref: ft.Ref[ft.Column]
+    source: object | None = None  # HistoryDataSource: фильтры/страницы считает БД
 
 
 _snack = ft.SnackBar(content=ft.Text(""), open=False)
 
 
 # Экспорт в CSV
-def on_export(e: ft.ControlEvent, data: list[dict], EXPORT_FIELDS: list[tuple[str, str]]):
+def on_export(e: ft.ControlEvent, data, EXPORT_FIELDS: list[tuple[str, str]]):
+    """`data` — список строк или callable, отдающий итератор строк (читается только при сохранении)."""
     if not data:
         _toast(e.page, "Nothing to export")
         return
@@ -39,9 +43,11 @@ def on_export(e: ft.ControlEvent, data: list[dict], EXPORT_FIELDS: list[tuple[st
                 with open(ev.path, "w", newline="", encoding="utf-8-sig") as f:
                     w = csv.writer(f, delimiter=";")
                     w.writerow([header for _, header in EXPORT_FIELDS])
-                    for it in data:
+                    n = 0
+                    for it in data() if callable(data) else data:
                         w.writerow([it.get(field) or "" for field, _ in EXPORT_FIELDS])
-                _toast(e.page, f"Exported lines: {len(data)}")
+                        n += 1
+                _toast(e.page, f"Exported lines: {n}")
             except Exception as ex:
                 _toast(e.page, f"Export error: {ex}")
 
@@ -68,6 +74,15 @@ def _toast(page: ft.Page, msg: str):
     page.update()
 
 
+def _parse_ymd(s: str | None) -> datetime | None:
+    if not s:
+        return None
+    try:
+        return datetime.strptime(s.strip(), "%Y-%m-%d")
+    except Exception:
+        return None
+
+
 def apply_filters(e: ft.ControlEvent | None, ctx: HistoryContext):
     # сброс ошибок на полях
     ctx.date_from_ref.current.border_color = None
@@ -78,14 +93,6 @@ def apply_filters(e: ft.ControlEvent | None, ctx: HistoryContext):
     q = (ctx.search_ref.current.value or "").strip().lower()
     svc = ctx.service_ref.current.value or "ALL"
 
-    def _parse_ymd(s: str | None) -> datetime | None:
-        if not s:
-            return None
-        try:
-            return datetime.strptime(s.strip(), "%Y-%m-%d")
-        except Exception:
-            return None
-
     d_from = _parse_ymd(ctx.date_from_ref.current.value)
     d_to = _parse_ymd(ctx.date_to_ref.current.value)
 
@@ -97,6 +104,21 @@ def apply_filters(e: ft.ControlEvent | None, ctx: HistoryContext):
         ctx.date_to_ref.current.update()
         return
 
+    if ctx.source is not None:
+        # серверный режим: фильтрация и пагинация — запросом в БД; поиск через FTS5 (короткие запросы — LIKE)
+        ctx.source.set_filters(
+            HistoryFilters(
+                query=q or None,
+                search_mode="fts",
+                date_from_local=d_from.date() if d_from else None,
+                date_to_local=d_to.date() if d_to else None,
+                service=svc,
+            )
+        )
+        ctx.page_state["page_idx"] = 1
+        ctx.render_table()
+        return
+
     if d_to:
         d_to = d_to + timedelta(days=1)
 
@@ -138,7 +160,11 @@ def reset_filters(e: ft.ControlEvent | None, ctx: HistoryContext):
     ctx.service_ref.current.options = ctx._build_service_options()
     ctx.service_ref.current.value = "ALL"
 
-    ctx.set_filtered(list(ctx.raw_items))
+    if ctx.source is not None:
+        ctx.source.set_filters(HistoryFilters())
+        ctx.page_state["page_idx"] = 1
+    else:
+        ctx.set_filtered(list(ctx.raw_items))
 
     ctx.search_ref.current.update()
     ctx.date_from_ref.current.update()
@@ -1,7 +1,7 @@
-"""History screen (pure layout, no data/logic yet).
+"""History screen: layout plus table/pager rendering over a list or a HistoryDataSource.
 
-- Без запросов к БД и сервисам.
-- Только разметка и заглушки обработчиков (print).
+- Без `source`: фильтрует и листает переданный список `items` в памяти.
+- С `source` (HistoryDataSource): фильтры и страницы запрашиваются у БД, в памяти только видимая страница.
 - I18n: принимает функцию `t(key: str) -> str`, по умолчанию возвращает ключ.
 """
 
@@ -29,6 +29,7 @@ def make_history_screen(  # noqa: PLR0915
     *,
     items: list[dict] | None = None,
     on_back: callable | None = None,
+    source=None,
 ) -> ft.Container:
     # ---- Compact constants for narrow window ----
     HEADING_H = 36
@@ -78,25 +79,36 @@ def make_history_screen(  # noqa: PLR0915
         filtered_items = new_items
 
     def _build_service_options():
-        services = sorted({it.get("service", "") for it in raw_items if it.get("service")})
+        if source is not None:
+            services = source.services()
+        else:
+            services = sorted({it.get("service", "") for it in raw_items if it.get("service")})
         return [ft.dropdown.Option("ALL", "ALL")] + [ft.dropdown.Option(s, s) for s in services]
 
-    def render_table():  # noqa: PLR0912
-        # считаем страницы
-        total = len(filtered_items)
-        total_pages = max(1, math.ceil(total / ctx.page_state["page_size_val"])) if total > 0 else 1
+    def _page_slice() -> tuple[list, int]:
+        """Видимые строки текущей страницы и total; page_idx приводится к допустимому диапазону."""
+        size = page_state["page_size_val"]
+        page_state["page_idx"] = max(page_state["page_idx"], 1)
 
-        # приводим page_idx к допустимому диапазону
-        if total == 0:
-            ctx.page_state["page_idx"] = 1
-        else:
-            ctx.page_state["page_idx"] = max(ctx.page_state["page_idx"], 1)
-            ctx.page_state["page_idx"] = min(ctx.page_state["page_idx"], total_pages)
+        if source is not None:
+            visible, total = source.fetch(page_state["page_idx"], size)
+            last = max(1, math.ceil(total / size))
+            if page_state["page_idx"] > last:  # выборка сузилась — идём на последнюю страницу
+                page_state["page_idx"] = last
+                visible, total = source.fetch(last, size)
+            return visible, total
 
-        # слайс видимых строк
-        start = 0 if total == 0 else (ctx.page_state["page_idx"] - 1) * ctx.page_state["page_size_val"]
-        end = start + ctx.page_state["page_size_val"]
-        visible = filtered_items[start:end] if total > 0 else []
+        total = len(filtered_items)
+        if total == 0:
+            page_state["page_idx"] = 1
+            return [], 0
+        page_state["page_idx"] = min(page_state["page_idx"], math.ceil(total / size))
+        start = (page_state["page_idx"] - 1) * size
+        return filtered_items[start : start + size], total
+
+    def render_table():
+        visible, total = _page_slice()
+        total_pages = max(1, math.ceil(total / ctx.page_state["page_size_val"])) if total > 0 else 1
 
         # таблица
         table_ref.current.rows = [make_row(it) for it in visible]
@@ -151,8 +163,14 @@ def make_history_screen(  # noqa: PLR0915
         _build_service_options=_build_service_options,
         page_state=page_state,
         table_column_ref=table_column_ref,
+        source=source,
     )
 
+    def _export_data():
+        if source is None:
+            return filtered_items
+        return source.iter_rows if source.total else []
+
     def build_filters():
         search = ft.TextField(
             label="Search",
@@ -193,7 +211,7 @@ def make_history_screen(  # noqa: PLR0915
         btn_export = ft.ElevatedButton(
             "Export CSV",
             ref=btn_export_ref,
-            on_click=lambda e: on_export(e, filtered_items, EXPORT_FIELDS),
+            on_click=lambda e: on_export(e, _export_data(), EXPORT_FIELDS),
             tooltip="Export current selection",
             color=ft.Colors.WHITE,
             bgcolor="#EB244E",
@@ -283,14 +301,9 @@ def make_history_screen(  # noqa: PLR0915
         )
 
     # Первичная выборка для UI до первых update()
-    initial_total = len(filtered_items)
+    initial_visible, initial_total = _page_slice()
     initial_total_pages = max(1, math.ceil(initial_total / ctx.page_state["page_size_val"])) if initial_total > 0 else 1
 
-    # какие строки видны на старте
-    _initial_start = 0 if initial_total == 0 else (ctx.page_state["page_idx"] - 1) * ctx.page_state["page_size_val"]
-    _initial_end = _initial_start + ctx.page_state["page_size_val"]
-    initial_visible = filtered_items[_initial_start:_initial_end] if initial_total > 0 else []
-
     # что положить в таблицу и хинт
     initial_rows = [make_row(it) for it in initial_visible]
     initial_empty_text = (